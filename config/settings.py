@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'patients.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,11 +64,21 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Persistent connections: every thread serving requests (and every query
+# pool worker) keeps its connection for DB_CONN_MAX_AGE seconds, checked
+# before reuse by CONN_HEALTH_CHECKS; 0 opens one per request
+DATABASE_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+
+# Prepare the fixed tick and detail-page queries once per connection
+# (patients/prepared.py); turn off behind a transaction-mode pgbouncer
+DATABASE_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '1') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -79,6 +90,8 @@ DATABASES = {
         'OPTIONS': {
             'options': f"-c search_path={os.getenv('DB_SCHEMA', 'mimiciv_derived')},public"
         },
+        'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
@@ -120,6 +133,64 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+
+# Simulation clock
+
+# Seconds between ticks when auto-play is started without an explicit interval
+SIMULATION_TICK_INTERVAL = float(os.getenv('SIMULATION_TICK_INTERVAL', '5'))
+
+# Database-free replay from files written by `manage.py exportcolumnar`
+# (unset = read the materialized views in PostgreSQL)
+SIMULATION_COLUMNAR_DIR = os.getenv('SIMULATION_COLUMNAR_DIR') or None
+
+# Read vitals and procedure events from the packed fisi9t_stay_hour_summary
+# view (scripts/10) instead of the two wide hourly views; create it first
+SIMULATION_HOUR_SUMMARY = os.getenv('SIMULATION_HOUR_SUMMARY', '0') == '1'
+
+# Worker threads (one database connection each) running a day-store load's
+# or a detail page's independent queries side by side; 0 runs them in turn
+QUERY_POOL_SIZE = int(os.getenv('QUERY_POOL_SIZE', '4'))
+
+# Threads (one persistent database connection each) running the bodies of
+# the async views: ticks, seeks and detail pages
+REQUEST_POOL_SIZE = int(os.getenv('REQUEST_POOL_SIZE', '8'))
+
+# Where simulation sessions (clock, cohort, simulated date) are shared between
+# worker processes: the simulation_session table, or locked JSON files on
+# a single host (patients.simulation.FileSessionBackend, the default for
+# database-free runs)
+SIMULATION_SESSION_BACKEND = os.getenv(
+    'SIMULATION_SESSION_BACKEND',
+    'patients.simulation.FileSessionBackend' if SIMULATION_COLUMNAR_DIR
+    else 'patients.simulation.DatabaseSessionBackend'
+)
+SIMULATION_SESSION_DIR = os.getenv('SIMULATION_SESSION_DIR', str(BASE_DIR / 'var' / 'simulations'))
+
+# `manage.py prunesimulations` deletes sessions unused for this many days
+SIMULATION_SESSION_TTL_DAYS = float(os.getenv('SIMULATION_SESSION_TTL_DAYS', '7'))
+
+if SIMULATION_COLUMNAR_DIR:
+    # Keep browser sessions out of the database too
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+# Detail page cache (patients/detailcache.py): chart payloads and procedure
+# logs per (stay, hour), in an in-process LRU in front of CACHES[alias]
+DETAIL_CACHE_SIZE = int(os.getenv('DETAIL_CACHE_SIZE', '2048'))
+DETAIL_CACHE_ALIAS = 'default'
+DETAIL_CACHE_TIMEOUT = None  # entries only go stale on reload_data
+
+# Next-tick prefetch (patients/tickprefetch.py): payloads built in the
+# background right after each advance, per (session, hour); 0 turns it off
+TICK_PREFETCH_SIZE = int(os.getenv('TICK_PREFETCH_SIZE', '256'))
+
+# Request instrumentation: Server-Timing headers and GET /metrics
+# (patients/instrumentation.py); off by default
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', '0') == '1'
+
+# Clients (REMOTE_ADDR) sent Server-Timing headers and allowed to scrape
+# /metrics; behind a proxy, list the proxy or scraper addresses
+INSTRUMENTATION_INTERNAL_IPS = os.getenv('INSTRUMENTATION_INTERNAL_IPS', '127.0.0.1,::1').split(',')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
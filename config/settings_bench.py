@@ -0,0 +1,51 @@
+"""
+Django settings for the synthetic benchmark database.
+
+Used by `manage.py seedsynthetic` and `manage.py benchload`:
+
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py seedsynthetic --stays 500
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py benchload --clients 8
+
+SQLite (var/bench.sqlite3) by default. Set BENCH_DB_ENGINE=postgresql and
+BENCH_DB_NAME / BENCH_DB_USER / BENCH_DB_PASSWORD / BENCH_DB_HOST /
+BENCH_DB_PORT to use a scratch PostgreSQL database instead. DB_CONN_MAX_AGE
+and DB_PREPARED_STATEMENTS apply as in settings.py. Never point it at
+the MIMIC-IV database: seeding creates plain tables named like the views.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASE_CONN_MAX_AGE, os
+
+
+# Allows seedsynthetic to create and overwrite the source tables
+BENCHMARK_DATABASE = True
+
+if os.getenv('BENCH_DB_ENGINE') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('BENCH_DB_NAME', 'sepsis_bench'),
+            'USER': os.getenv('BENCH_DB_USER', 'postgres'),
+            'PASSWORD': os.getenv('BENCH_DB_PASSWORD', ''),
+            'HOST': os.getenv('BENCH_DB_HOST', 'localhost'),
+            'PORT': os.getenv('BENCH_DB_PORT', '5432'),
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    os.makedirs(BASE_DIR / 'var', exist_ok=True)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'var' / 'bench.sqlite3',
+            'OPTIONS': {'timeout': 30},
+            'CONN_MAX_AGE': DATABASE_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Always read the database, never a columnar export
+SIMULATION_COLUMNAR_DIR = None
+SIMULATION_SESSION_BACKEND = 'patients.simulation.DatabaseSessionBackend'
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
@@ -5,8 +5,11 @@ URL configuration for ICU Sepsis Decision Support System.
 from django.contrib import admin
 from django.urls import path, include
 
+from patients.instrumentation import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path('patients/', include('patients.urls')),
     path('', include('patients.urls')),  # Root URL goes to patients
 ]
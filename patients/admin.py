@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UniquePatientProfile
+from .models import SimulationSession, UniquePatientProfile
 
 
 @admin.register(UniquePatientProfile)
@@ -7,3 +7,9 @@ class UniquePatientProfileAdmin(admin.ModelAdmin):
     list_display = ('subject_id', 'stay_id', 'hadm_id', 'anchor_age', 'gender', 'first_careunit')
     list_filter = ('gender', 'first_careunit')
     search_fields = ('subject_id', 'stay_id', 'hadm_id')
+
+
+@admin.register(SimulationSession)
+class SimulationSessionAdmin(admin.ModelAdmin):
+    list_display = ('key', 'cohort', 'sim_date', 'current_hour', 'version', 'created_at')
+    search_fields = ('key',)
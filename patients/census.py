@@ -0,0 +1,160 @@
+"""
+Interval index of a timeline's ICU stays, for census questions per tick.
+
+Every stay of the cohort admitted during the timeline is one interval of
+timeline hours (counted from the first midnight, as the session clock is):
+
+    admit      hour of intime
+    discharge  hour of outtime, the last hour the stay is in the ICU
+               (None if it is still there when the timeline ends)
+
+The index keeps the admissions and the discharges as two sorted event
+lists, so the stays admitted or discharged during a tick are two bisections
+plus the k stays returned — O(log n + k) however long the timeline has run —
+and the census at any hour is a difference of two bisections. For the
+stays present during a day it also keeps a snapshot of the stays in the
+ICU at each midnight, taken in one sweep when the index is built; the day
+stores load rows for those stays only, never for stays already discharged.
+
+Built once per (cohort, timeline) from one profile query and shared by
+every session replaying that timeline (see daystore.get_census_index).
+"""
+
+import datetime
+from bisect import bisect_left, bisect_right
+
+from .timewindow import stay_frame, timeline_day, utc_rows
+
+
+HOURS_PER_DAY = 24
+ONE_HOUR = datetime.timedelta(hours=1)
+
+
+class CensusIndex:
+    """
+    Admissions and discharges of the stays admitted during a timeline.
+
+        profiles[stay_id]   profile row (in `fields` order)
+        frames[stay_id]     midnight starting the timeline in the stay's own
+                            shifted year (see timewindow.stay_frame)
+        admit[stay_id]      admission hour on the timeline
+        discharge[stay_id]  last hour in the ICU, or None past the timeline
+    """
+
+    def __init__(self, rows, fields, sim_dates):
+        self.fields = fields
+        self.span_days = len(sim_dates)
+        self.last_hour = self.span_days * HOURS_PER_DAY - 1
+        self.profiles = {}
+        self.frames = {}
+        self.admit = {}
+        self.discharge = {}
+
+        stay_idx = fields.index('stay_id')
+        intime_idx = fields.index('intime')
+        outtime_idx = fields.index('outtime')
+        for row in utc_rows(rows, fields):
+            intime, outtime = row[intime_idx], row[outtime_idx]
+            day = timeline_day(intime, sim_dates)
+            if day is None:
+                continue
+            stay_id = row[stay_idx]
+            frame = stay_frame(intime, day)
+            admit = day * HOURS_PER_DAY + intime.hour
+            discharge = None
+            if outtime is not None:
+                discharge = max((outtime - frame) // ONE_HOUR, admit)
+                if discharge > self.last_hour:
+                    discharge = None
+            self.profiles[stay_id] = row
+            self.frames[stay_id] = frame
+            self.admit[stay_id] = admit
+            self.discharge[stay_id] = discharge
+
+        # Event lists, sorted by (hour, stay_id); hours and stays kept apart
+        # so bisect works on plain ints
+        admissions = sorted((hour, stay_id) for stay_id, hour in self.admit.items())
+        discharges = sorted(
+            (hour, stay_id) for stay_id, hour in self.discharge.items() if hour is not None
+        )
+        self._admit_hours = [hour for hour, _ in admissions]
+        self._admit_stays = [stay_id for _, stay_id in admissions]
+        self._discharge_hours = [hour for hour, _ in discharges]
+        self._discharge_stays = [stay_id for _, stay_id in discharges]
+
+        self._midnights = self._sweep_midnights()
+
+    def _sweep_midnights(self):
+        """{day: frozenset of stay_ids in the ICU at its hour 0}, in one pass."""
+        present = set()
+        snapshots = {}
+        a = d = 0
+        for day in range(self.span_days):
+            midnight = day * HOURS_PER_DAY
+            # Admitted at or before midnight; discharged before it (the
+            # discharge hour itself still counts as present)
+            b = bisect_right(self._admit_hours, midnight, a)
+            present.update(self._admit_stays[a:b])
+            a = b
+            e = bisect_left(self._discharge_hours, midnight, d)
+            present.difference_update(self._discharge_stays[d:e])
+            d = e
+            snapshots[day] = frozenset(present)
+        return snapshots
+
+    def __len__(self):
+        return len(self.profiles)
+
+    # -------------------------------------------------------------------------
+    # Queries, hours inclusive
+    # -------------------------------------------------------------------------
+
+    def admitted(self, first_hour, last_hour):
+        """stay_ids admitted during hours first_hour..last_hour, in hour order."""
+        return self._slice(self._admit_hours, self._admit_stays, first_hour, last_hour)
+
+    def discharged(self, first_hour, last_hour):
+        """stay_ids discharged during hours first_hour..last_hour, in hour order."""
+        return self._slice(self._discharge_hours, self._discharge_stays, first_hour, last_hour)
+
+    @staticmethod
+    def _slice(hours, stays, first_hour, last_hour):
+        return stays[bisect_left(hours, first_hour):bisect_right(hours, last_hour)]
+
+    def census(self, hour):
+        """Number of stays in the ICU at this hour."""
+        if hour < 0:
+            return 0
+        return bisect_right(self._admit_hours, hour) - bisect_left(self._discharge_hours, hour)
+
+    def counts(self, hour):
+        """Admissions and discharges so far, and the census, at this hour."""
+        if hour < 0:
+            return {'admitted': 0, 'discharged': 0, 'census': 0}
+        admitted = bisect_right(self._admit_hours, hour)
+        return {
+            'admitted': admitted,
+            'discharged': bisect_right(self._discharge_hours, hour),
+            'census': admitted - bisect_left(self._discharge_hours, hour),
+        }
+
+    def present_at(self, hour):
+        """stay_ids in the ICU at this hour: that day's midnight snapshot, rolled forward."""
+        if hour < 0:
+            return set()
+        day = min(hour // HOURS_PER_DAY, self.span_days - 1)
+        midnight = day * HOURS_PER_DAY
+        present = set(self._midnights[day])
+        present.update(self.admitted(midnight + 1, hour))
+        present.difference_update(self.discharged(midnight, hour - 1))
+        return present
+
+    def present_during(self, first_hour, last_hour):
+        """stay_ids in the ICU at any hour of first_hour..last_hour."""
+        present = self.present_at(first_hour)
+        present.update(self.admitted(first_hour + 1, last_hour))
+        return present
+
+    def day_start(self, stay_id, day_index):
+        """Midnight starting day day_index of the timeline in the stay's own year."""
+        return self.frames[stay_id] + datetime.timedelta(days=day_index)
@@ -3,6 +3,10 @@ Daily Patient Cohort Configuration
 
 Edit this file to define which patients appear in your daily patient list.
 You can filter by subject_id, stay_id, or (subject_id, stay_id, hadm_id) tuples.
+
+Larger cohorts, or cohorts for other days, are built into the cohort_stay
+table with `python manage.py buildcohort` instead (see cohort_engine.py);
+a 'default' cohort there replaces this file.
 """
 
 # =============================================================================
@@ -0,0 +1,231 @@
+"""
+Cohort engine - compiles a cohort into one set-based SQL predicate that is
+shared by every view.
+
+A cohort is either a named cohort in the cohort_stay table, written by
+`manage.py buildcohort` and semi-joined through its index, or the default
+cohort in cohort.py (used while the table holds no 'default' cohort).
+
+Filtering on (subject_id, stay_id, hadm_id) tuples with one OR'ed Q per tuple
+makes the SQL (and the planner's work) grow linearly with the cohort. Instead
+the whole tuple list is sent as a single row-value predicate, and the shape
+is chosen by cohort size:
+
+    <= ROW_IN_MAX_STAYS   (subject_id, stay_id, hadm_id) IN ((..), (..), ...)
+    <= VALUES_MAX_STAYS   (subject_id, stay_id, hadm_id) IN (VALUES (..), ...)
+                          -> planned as a hash semi-join over a VALUES scan
+    larger                rows are loaded once per connection into an indexed
+                          temporary table (one COPY on PostgreSQL, multi-row
+                          INSERTs elsewhere) and semi-joined against it
+"""
+
+import io
+import re
+import threading
+
+from django.db import connection
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+
+from .cohort import get_cohort_filter
+from .models import CohortStay, UniquePatientProfile
+from .timewindow import DEFAULT_SIM_DATE, admitted_on_sim_days
+
+
+# Name of the cohort defined in cohort.py
+DEFAULT_COHORT = 'default'
+
+# Cohort names; they also name directories of columnar exports (columnar.py)
+COHORT_NAME = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]{0,63}')
+
+ROW_IN_MAX_STAYS = 1000
+VALUES_MAX_STAYS = 5000
+
+TEMP_TABLE = 'cohort_stays'
+
+# Rows per INSERT when loading the temporary table without COPY
+INSERT_BATCH_STAYS = 1000
+KEY_COLUMNS = ('subject_id', 'stay_id', 'hadm_id')
+
+
+class CohortPredicate:
+    """
+    A compiled cohort filter. Build once, then apply() to any queryset over a
+    model that has subject_id / stay_id / hadm_id columns. cohort is
+    {'type': 'tuples' | 'subject_ids', 'values': [...]}, {'type': 'table',
+    'values': name} for a cohort of the cohort_stay table, or None for all
+    stays.
+    """
+
+    def __init__(self, cohort, row_in_max=ROW_IN_MAX_STAYS, values_max=VALUES_MAX_STAYS):
+        self.type = cohort['type'] if cohort else None
+        if self.type == 'table':
+            self.name = cohort['values']
+            self.values = []
+        else:
+            self.values = list(cohort['values']) if cohort else []
+
+        if self.type == 'table':
+            self.strategy = 'table'
+        elif self.type == 'tuples':
+            if len(self.values) <= row_in_max:
+                self.strategy = 'row_in'
+            elif len(self.values) <= values_max:
+                self.strategy = 'values'
+            else:
+                self.strategy = 'temp_table'
+        elif self.type == 'subject_ids':
+            self.strategy = 'subject_ids'
+        else:
+            self.strategy = 'all'
+
+        # Flattened tuple parameters are built once and reused by every query
+        self._params = tuple(v for stay in self.values for v in stay) if self.type == 'tuples' else ()
+        self._row_placeholders = ', '.join(['(%s, %s, %s)'] * len(self.values))
+        self._copy_data = None  # COPY text of the tuples, built on the first temp-table load
+
+    def __len__(self):
+        return len(self.values)
+
+    def apply(self, queryset):
+        """Restrict queryset to the cohort."""
+        if self.strategy == 'all':
+            return queryset
+        if self.strategy == 'subject_ids':
+            return queryset.filter(subject_id__in=self.values)
+        if self.strategy == 'table':
+            sql, params = self._table_sql(queryset.model)
+            return queryset.filter(RawSQL(sql, params, output_field=BooleanField()))
+        if not self.values:
+            return queryset.none()
+        sql, params = self._tuple_sql(queryset.model)
+        return queryset.filter(RawSQL(sql, params, output_field=BooleanField()))
+
+    @staticmethod
+    def _key_columns(model):
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        return ', '.join(f'{table}.{qn(col)}' for col in KEY_COLUMNS)
+
+    def _table_sql(self, model):
+        """Semi-join on the cohort_stay index (cohort, calendar_day, keys)."""
+        key_list = ', '.join(KEY_COLUMNS)
+        cohort_table = connection.ops.quote_name(CohortStay._meta.db_table)
+        return (
+            f'({self._key_columns(model)}) IN (SELECT {key_list} FROM {cohort_table} WHERE cohort = %s)',
+            (self.name,),
+        )
+
+    def _tuple_sql(self, model):
+        columns = self._key_columns(model)
+
+        if self.strategy == 'row_in':
+            return f'({columns}) IN ({self._row_placeholders})', self._params
+        if self.strategy == 'values':
+            return f'({columns}) IN (VALUES {self._row_placeholders})', self._params
+
+        self._ensure_temp_table()
+        key_list = ', '.join(KEY_COLUMNS)
+        return f'({columns}) IN (SELECT {key_list} FROM {TEMP_TABLE})', ()
+
+    def _ensure_temp_table(self):
+        """
+        Load the cohort into a temporary table on the current connection.
+
+        Temporary tables live as long as the database connection, so the load
+        happens once per connection (once per request with CONN_MAX_AGE=0).
+        """
+        connection.ensure_connection()
+        raw = connection.connection
+        if getattr(connection, '_cohort_temp_table', None) == (raw, id(self)):
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {TEMP_TABLE}')
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {TEMP_TABLE} ('
+                'subject_id integer NOT NULL, '
+                'stay_id integer NOT NULL, '
+                'hadm_id integer NOT NULL, '
+                'PRIMARY KEY (subject_id, stay_id, hadm_id))'
+            )
+            self._load_temp_table(cursor)
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'ANALYZE {TEMP_TABLE}')
+        connection._cohort_temp_table = (raw, id(self))
+
+    def _load_temp_table(self, cursor):
+        """Insert the tuples: one COPY on PostgreSQL, INSERT_BATCH_STAYS rows per INSERT elsewhere."""
+        if connection.vendor == 'postgresql':
+            if self._copy_data is None:
+                self._copy_data = ''.join(f'{s}\t{t}\t{h}\n' for s, t, h in self.values)
+            cursor.copy_from(io.StringIO(self._copy_data), TEMP_TABLE, columns=KEY_COLUMNS)
+            return
+        key_list = ', '.join(KEY_COLUMNS)
+        for start in range(0, len(self.values), INSERT_BATCH_STAYS):
+            batch = self.values[start:start + INSERT_BATCH_STAYS]
+            cursor.execute(
+                f"INSERT INTO {TEMP_TABLE} ({key_list}) VALUES {', '.join(['(%s, %s, %s)'] * len(batch))}",
+                self._params[3 * start:3 * (start + len(batch))],
+            )
+
+
+# =============================================================================
+# Shared predicate
+# =============================================================================
+_predicates = {}  # cohort name -> CohortPredicate
+_predicate_lock = threading.Lock()
+
+
+def check_cohort_name(cohort):
+    """Raise ValueError unless cohort is a valid name: letters, digits, '_' and '-'."""
+    if not isinstance(cohort, str) or not COHORT_NAME.fullmatch(cohort):
+        raise ValueError(f'Invalid cohort name: {cohort!r}')
+
+
+def get_cohort_predicate(cohort=DEFAULT_COHORT):
+    """
+    Return the process-wide compiled predicate for a cohort: the cohort_stay
+    table's cohort of that name, else (for DEFAULT_COHORT) cohort.py.
+    Raises ValueError for an invalid or unknown cohort.
+    """
+    predicate = _predicates.get(cohort)
+    if predicate is None:
+        with _predicate_lock:
+            predicate = _predicates.get(cohort)
+            if predicate is None:
+                check_cohort_name(cohort)
+                predicate = _predicates[cohort] = CohortPredicate(_cohort_filter(cohort))
+    return predicate
+
+
+def cohort_patients(cohort=DEFAULT_COHORT, sim_dates=(DEFAULT_SIM_DATE,)):
+    """
+    UniquePatientProfile queryset of the cohort's stays admitted on any of
+    sim_dates (any year), through the shared predicate and the index-backed
+    admission day (see timewindow.py).
+    """
+    patients = get_cohort_predicate(cohort).apply(UniquePatientProfile.objects.all())
+    return admitted_on_sim_days(patients, sim_dates)
+
+
+def _cohort_filter(cohort):
+    if CohortStay.objects.filter(cohort=cohort).exists():
+        return {'type': 'table', 'values': cohort}
+    if cohort == DEFAULT_COHORT:
+        return get_cohort_filter()
+    raise ValueError(f'Unknown cohort: {cohort!r}')
+
+
+def reset_cohort_predicate(cohort_filter=None):
+    """
+    Recompile the shared predicates: the default one from cohort_filter
+    (same shape as get_cohort_filter()) when given, e.g. for a synthetic
+    benchmark cohort, the others from the cohort table and cohort.py again
+    on their next use. Drop the day stores afterwards.
+    """
+    with _predicate_lock:
+        _predicates.clear()
+        if cohort_filter:
+            _predicates[DEFAULT_COHORT] = CohortPredicate(cohort_filter)
+    return get_cohort_predicate()
@@ -0,0 +1,258 @@
+"""
+Local columnar copy of the simulation's source views, for database-free runs.
+
+`manage.py exportcolumnar` writes the cohort's slice of each view for one
+simulated day into its own directory:
+
+    <SIMULATION_COLUMNAR_DIR>/<cohort>/<MM-DD>/
+        index.json                    tables, row counts, column encodings
+        <table>.<column>.npy          column values
+        <table>.<column>.nulls.npy    null mask (only if the column has nulls)
+        <table>.<column>.dict.npy     dictionary of a string column
+        <table>.<column>.scale.npy    decimal places of a decimal column
+
+Every .npy file is opened with mmap_mode='r': opening a day costs a few file
+opens, and pages are read only when rows are decoded.
+
+Encodings, by Django field type:
+    integer    int64
+    float      float64, NaN = NULL
+    decimal    float64 plus an int8 scale, rebuilt as the original Decimal
+    string     int32 codes into a sorted dictionary, -1 = NULL
+    datetime   int64 microseconds since the Unix epoch (UTC)
+
+With settings.SIMULATION_COLUMNAR_DIR set, the day store and the risk scorer
+read these files instead of PostgreSQL, and the list and detail pages are
+served from the day store (see views.py).
+"""
+
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from .cohort_engine import check_cohort_name
+from .timewindow import as_utc
+
+
+FORMAT_VERSION = 1
+INDEX_FILE = 'index.json'
+
+FIELD_KINDS = {
+    'AutoField': 'integer',
+    'BigAutoField': 'integer',
+    'IntegerField': 'integer',
+    'SmallIntegerField': 'integer',
+    'BigIntegerField': 'integer',
+    'FloatField': 'float',
+    'DecimalField': 'decimal',
+    'CharField': 'string',
+    'TextField': 'string',
+    'DateTimeField': 'datetime',
+}
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class ColumnarDayMissing(LookupError):
+    """No export exists for the requested cohort and day."""
+
+
+def day_path(root, cohort, sim_date):
+    """Directory of one exported day. Raises ValueError for an invalid cohort name."""
+    check_cohort_name(cohort)
+    return os.path.join(root, cohort, f'{sim_date:%m-%d}')
+
+
+# =============================================================================
+# Encoding
+# =============================================================================
+
+def _encode(kind, values):
+    """Return {suffix: array} for one column; suffix '' is the values file."""
+    nulls = np.fromiter((value is None for value in values), bool, len(values))
+    arrays = {}
+
+    if kind == 'integer':
+        arrays[''] = np.array([0 if value is None else value for value in values], dtype=np.int64)
+    elif kind == 'float':
+        arrays[''] = np.array(values, dtype=np.float64)
+        nulls = None  # NaN already marks NULL
+    elif kind == 'decimal':
+        arrays[''] = np.array(values, dtype=np.float64)
+        arrays['scale'] = np.array(
+            [0 if value is None else max(-value.as_tuple().exponent, 0) for value in values],
+            dtype=np.int8,
+        )
+        nulls = None
+    elif kind == 'string':
+        dictionary = sorted({value for value in values if value is not None})
+        codes = {value: code for code, value in enumerate(dictionary)}
+        arrays[''] = np.array([codes.get(value, -1) for value in values], dtype=np.int32)
+        arrays['dict'] = np.array(dictionary, dtype=str)
+        nulls = None  # code -1 marks NULL
+    elif kind == 'datetime':
+        arrays[''] = np.array([
+            0 if value is None else (as_utc(value) - EPOCH) // MICROSECOND
+            for value in values
+        ], dtype=np.int64)
+    else:
+        raise ValueError(f'Unsupported column kind: {kind}')
+
+    if nulls is not None and nulls.any():
+        arrays['nulls'] = nulls
+    return arrays
+
+
+def _decode(kind, arrays):
+    """Python values of one column, as the ORM would return them (timestamps aware UTC)."""
+    values = arrays['']
+    if kind == 'integer':
+        decoded = values.tolist()
+    elif kind == 'float':
+        decoded = [None if value != value else value for value in values.tolist()]
+    elif kind == 'decimal':
+        decoded = [
+            None if value != value else Decimal(f'{value:.{scale}f}')
+            for value, scale in zip(values.tolist(), arrays['scale'].tolist())
+        ]
+    elif kind == 'string':
+        dictionary = arrays['dict'].tolist()
+        decoded = [None if code < 0 else dictionary[code] for code in values.tolist()]
+    elif kind == 'datetime':
+        decoded = [EPOCH + value * MICROSECOND for value in values.tolist()]
+    else:
+        raise ValueError(f'Unsupported column kind: {kind}')
+
+    nulls = arrays.get('nulls')
+    if nulls is not None:
+        decoded = [None if null else value for value, null in zip(decoded, nulls.tolist())]
+    return decoded
+
+
+# =============================================================================
+# Writing
+# =============================================================================
+
+def write_day(root, cohort, sim_date, tables):
+    """
+    Write one day. tables maps name -> (model, fields, rows), rows being
+    values_list() tuples in `fields` order. The directory is written under
+    a temporary name and swapped in, so readers never see a partial export.
+    Returns the day's directory.
+    """
+    path = day_path(root, cohort, sim_date)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    index = {
+        'format_version': FORMAT_VERSION,
+        'cohort': cohort,
+        'sim_date': sim_date.isoformat(),
+        'exported_at': time.time(),
+        'tables': {},
+    }
+    for name, (model, fields, rows) in tables.items():
+        columns = {}
+        for position, field_name in enumerate(fields):
+            kind = FIELD_KINDS[model._meta.get_field(field_name).get_internal_type()]
+            arrays = _encode(kind, [row[position] for row in rows])
+            for suffix, array in arrays.items():
+                filename = '.'.join(filter(None, (name, field_name, suffix, 'npy')))
+                np.save(os.path.join(tmp_path, filename), array, allow_pickle=False)
+            columns[field_name] = {'kind': kind, 'files': sorted(arrays)}
+        index['tables'][name] = {'rows': len(rows), 'columns': columns}
+
+    with open(os.path.join(tmp_path, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    old_path = f'{path}.{os.getpid()}.old'
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+
+# =============================================================================
+# Reading
+# =============================================================================
+
+class ColumnarDay:
+    """One exported day, memory-mapped."""
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(os.path.join(path, INDEX_FILE)) as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            raise ColumnarDayMissing(
+                f'No columnar export at {path}; run `manage.py exportcolumnar` first.'
+            ) from None
+        if self.index['format_version'] != FORMAT_VERSION:
+            raise ColumnarDayMissing(
+                f'{path} has format {self.index["format_version"]}, expected {FORMAT_VERSION}; re-export it.'
+            )
+
+    def rows(self, table, fields):
+        """values_list()-style tuples of `fields` for every row of `table`."""
+        columns = self.index['tables'][table]['columns']
+        decoded = []
+        for field_name in fields:
+            column = columns[field_name]
+            arrays = {
+                suffix: np.load(
+                    os.path.join(self.path, '.'.join(filter(None, (table, field_name, suffix, 'npy')))),
+                    mmap_mode='r', allow_pickle=False,
+                )
+                for suffix in column['files']
+            }
+            decoded.append(_decode(column['kind'], arrays))
+        return list(zip(*decoded))
+
+
+class ColumnarSource:
+    """Root directory of exported days, one ColumnarDay per (cohort, day)."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def day(self, cohort, sim_date):
+        return ColumnarDay(day_path(self.root, cohort, sim_date))
+
+    def has_day(self, cohort, sim_date):
+        """Whether that day of the cohort was exported (False for an invalid cohort name)."""
+        try:
+            path = day_path(self.root, cohort, sim_date)
+        except ValueError:
+            return False
+        return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+
+_source = None
+_source_lock = threading.Lock()
+
+
+def get_columnar_source():
+    """The configured source, or None when reading from the database."""
+    global _source
+    root = getattr(settings, 'SIMULATION_COLUMNAR_DIR', None)
+    if not root:
+        return None
+    if _source is None or _source.root != root:
+        with _source_lock:
+            _source = ColumnarSource(root)
+    return _source
+
+
+def columnar_enabled():
+    return get_columnar_source() is not None
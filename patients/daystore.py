@@ -0,0 +1,618 @@
+"""
+In-memory simulation-day store.
+
+A simulated day (March 13 by default) is fixed data: the cohort, its vitals, labs
+and procedure events never change while the simulation runs. Instead of querying
+PostgreSQL on every tick, the store loads the cohort's full 24-hour slice once
+when the simulation starts and keeps it in hour-indexed buckets, so each tick
+is answered from memory with no database round trip.
+
+A multi-day timeline has one store per day. Day d holds the stays in the
+ICU at any hour of it — admitted on it, or earlier in the timeline and not
+yet discharged (outtime) — as found by the timeline's CensusIndex (see
+census.py); prefetch_day_store() loads the next day in the background while
+the clock is still on the current one.
+
+With settings.SIMULATION_HOUR_SUMMARY set, vitals and procedure events are
+read from the packed fisi9t_stay_hour_summary view (scripts/10) in one
+query instead of the two wide hourly views. With
+settings.SIMULATION_COLUMNAR_DIR set, the day is read from a local
+columnar export instead (see columnar.py) and no database is needed.
+
+Call reload_day_store() after the materialized views have been refreshed.
+"""
+
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q, Value
+
+from .census import CensusIndex
+from .columnar import get_columnar_source
+from .models import (
+    VitalsignHourly, ProcedureeventsHourly, ChemistryHourly, CoagulationHourly, StayHourSummary,
+)
+from .cohort_engine import DEFAULT_COHORT
+from .prepared import prepared
+from .querypool import pool_enabled, run_concurrently
+from .timewindow import DEFAULT_SIM_DATE, as_utc, frames_q, utc_rows
+
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_DAY = 24
+
+# Day stores kept per process, least recently used dropped first
+MAX_DAY_STORES = 8
+
+# Columns returned for each row type — kept identical to the advance_time API.
+PATIENT_FIELDS = (
+    'subject_id', 'stay_id', 'hadm_id',
+    'anchor_age', 'gender', 'race',
+    'first_careunit', 'intime', 'outtime', 'los',
+)
+VITALSIGN_FIELDS = (
+    'subject_id', 'stay_id', 'charttime_hour',
+    'heart_rate', 'sbp', 'dbp', 'mbp',
+    'sbp_ni', 'dbp_ni', 'mbp_ni',
+    'resp_rate', 'temperature', 'temperature_site',
+    'spo2', 'glucose',
+)
+LAB_FIELDS = (
+    'subject_id', 'stay_id', 'charttime_hour',
+    # fisi9t_chemistry_hourly
+    'bicarbonate', 'calcium', 'sodium', 'potassium',
+    # fisi9t_coagulation_hourly
+    'd_dimer', 'fibrinogen', 'thrombin', 'inr', 'pt', 'ptt',
+)
+PROCEDURE_FIELDS = (
+    'subject_id', 'stay_id', 'charttime_hour', 'charttime',
+    'itemid', 'item_label', 'item_unitname',
+    'value', 'valueuom',
+    'location', 'locationcategory',
+    'ordercategoryname', 'ordercategorydescription',
+    'statusdescription', 'originalamount', 'originalrate',
+)
+
+
+# Lab views merged into LAB_FIELDS rows (both are on the vitals' hour grid)
+LAB_SOURCES = (
+    ('chemistry', ChemistryHourly),
+    ('coagulation', CoagulationHourly),
+)
+
+# Columns of the combined vitals + labs query: the row's source view, the
+# shared key, then every value column (NULL where the source has none)
+HOURLY_KEY_FIELDS = ('subject_id', 'stay_id', 'charttime_hour')
+HOURLY_VALUE_FIELDS = VITALSIGN_FIELDS[3:] + LAB_FIELDS[3:]
+
+
+HOURLY_SOURCES = (('vitalsigns', VitalsignHourly),) + LAB_SOURCES
+
+
+def _model_fields(model):
+    return {field.attname for field in model._meta.fields}
+
+
+def _output_field(name):
+    """The model field behind a value column, to type its NULL padding."""
+    for _, model in HOURLY_SOURCES:
+        if name in _model_fields(model):
+            return model._meta.get_field(name)
+    raise LookupError(name)
+
+
+def _hourly_part(source, model, time_window):
+    """One view's SELECT of the combined query, padded to every value column."""
+    own = _model_fields(model)
+    columns = {'col_source': Value(source)}
+    for name in HOURLY_KEY_FIELDS + HOURLY_VALUE_FIELDS:
+        columns[f'col_{name}'] = F(name) if name in own else Value(None, output_field=_output_field(name))
+
+    queryset = model.objects.filter(time_window)
+    if model is not VitalsignHourly:
+        # Lab views are NULL-padded onto every hour; only actual draws are sent
+        drawn = Q()
+        for name in LAB_FIELDS[3:]:
+            if name in own:
+                drawn |= Q(**{f'{name}__isnull': False})
+        queryset = queryset.filter(drawn)
+    return queryset.annotate(**columns).values_list(*columns)
+
+
+def hourly_rows_query(time_window, sources=HOURLY_SOURCES):
+    """The UNION ALL queryset load_hourly_rows reads (also checked by checkplans)."""
+    parts = [_hourly_part(source, model, time_window) for source, model in sources]
+    return parts[0].union(*parts[1:], all=True)
+
+
+def procedure_rows_query(time_window):
+    """The procedure events queryset load_day_rows reads."""
+    return ProcedureeventsHourly.objects.filter(time_window).values_list(*PROCEDURE_FIELDS)
+
+
+def summary_rows_query(time_window):
+    """The fisi9t_stay_hour_summary queryset load_summary_rows reads."""
+    return StayHourSummary.objects.filter(time_window).values_list(
+        *VITALSIGN_FIELDS, 'procedure_count', 'procedure_events',
+    )
+
+
+def load_hourly_rows(time_window, sources=HOURLY_SOURCES):
+    """
+    Vitals and labs for the rows selected by time_window, in one UNION ALL
+    query over the three hourly views keyed by (stay_id, charttime_hour)
+    (or only the given sources). Returns (vitals rows in VITALSIGN_FIELDS
+    order, lab rows in LAB_FIELDS order), one lab row per stay and hour
+    that had any draw.
+    """
+    rows = hourly_rows_query(time_window, sources)
+
+    vitals_slice = slice(1, 1 + len(VITALSIGN_FIELDS))
+    key_slice = slice(1, 1 + len(HOURLY_KEY_FIELDS))
+    lab_slice = slice(1 + len(VITALSIGN_FIELDS), None)
+    vitals = []
+    labs = {}
+    for row in rows:
+        if row[0] == 'vitalsigns':
+            vitals.append(row[vitals_slice])
+        else:
+            _merge_lab(labs, row[key_slice], row[lab_slice])
+    return vitals, list(labs.values())
+
+
+def load_summary_rows(time_window):
+    """
+    Vitals and procedure events for the rows selected by time_window, in
+    one query over fisi9t_stay_hour_summary. Returns (vitals rows in
+    VITALSIGN_FIELDS order, procedure rows in PROCEDURE_FIELDS order); an
+    hour without events adds one all-NULL procedure row, as the hour grid
+    of fisi9t_procedureevents_hourly does.
+    """
+    vitals = []
+    procedures = []
+    rows = summary_rows_query(time_window)
+    padding = (None,) * (len(PROCEDURE_FIELDS) - 3)
+    for row in rows:
+        vitals.append(row[:-2])
+        key = row[:3]
+        if not row[-2]:
+            procedures.append(key + padding)
+            continue
+        for event in row[-1]:
+            procedures.append(key + (_event_time(event['charttime']),) + tuple(
+                event[name] for name in PROCEDURE_FIELDS[4:]
+            ))
+    return vitals, procedures
+
+
+def _event_time(value):
+    """A charttime packed into JSON (ISO text, UTC), as an aware datetime."""
+    return as_utc(datetime.datetime.fromisoformat(value))
+
+
+def load_day_rows(time_window, prepare=False):
+    """
+    (vitals rows, lab rows, procedure rows) selected by time_window: from
+    the summary view and the lab views with SIMULATION_HOUR_SUMMARY, from
+    the three hourly views and the procedure view otherwise.
+
+    The queries are independent and run side by side on the query pool
+    (see querypool.py); there, vitals and labs are fetched apart rather
+    than as one UNION ALL, so the load takes as long as the slowest. With
+    prepare, for a time_window of a fixed shape, they run as prepared
+    statements (see prepared.py). Timestamps are returned aware (see
+    timewindow.utc_rows).
+    """
+    def procedures():
+        return list(procedure_rows_query(time_window))
+
+    def labs():
+        return load_hourly_rows(time_window, LAB_SOURCES)[1]
+
+    if settings.SIMULATION_HOUR_SUMMARY:
+        calls = (lambda: load_summary_rows(time_window), labs)
+    elif pool_enabled():
+        calls = (lambda: load_hourly_rows(time_window, HOURLY_SOURCES[:1]), labs, procedures)
+    else:
+        calls = (lambda: load_hourly_rows(time_window), procedures)
+    if prepare:
+        calls = tuple(_prepared_call(call) for call in calls)
+    results = run_concurrently(*calls)
+
+    if settings.SIMULATION_HOUR_SUMMARY:
+        (vitalsigns, procedureevents), labs = results
+    elif pool_enabled():
+        (vitalsigns, _), labs, procedureevents = results
+    else:
+        (vitalsigns, labs), procedureevents = results
+    return (
+        utc_rows(vitalsigns, VITALSIGN_FIELDS),
+        utc_rows(labs, LAB_FIELDS),
+        utc_rows(procedureevents, PROCEDURE_FIELDS),
+    )
+
+
+def _prepared_call(call):
+    def run():
+        with prepared():
+            return call()
+    return run
+
+
+def _merge_lab(labs, key, values):
+    """Fold one source's lab values into the (stay_id, hour) row."""
+    lab_key = (key[1], key[2])
+    current = labs.get(lab_key)
+    if current is None:
+        labs[lab_key] = key + tuple(values)
+    else:
+        labs[lab_key] = key + tuple(
+            new if new is not None else old for old, new in zip(current[3:], values)
+        )
+
+
+def _columnar_labs(day):
+    """LAB_FIELDS rows from a columnar export's lab tables."""
+    labs = {}
+    for table, model in LAB_SOURCES:
+        own = _model_fields(model)
+        fields = [name for name in LAB_FIELDS if name in own]
+        positions = [LAB_FIELDS.index(name) - 3 for name in fields[3:]]
+        for row in day.rows(table, fields):
+            if all(value is None for value in row[3:]):
+                continue
+            values = [None] * (len(LAB_FIELDS) - 3)
+            for position, value in zip(positions, row[3:]):
+                values[position] = value
+            _merge_lab(labs, row[:3], values)
+    return list(labs.values())
+
+
+def day_frames(census, day_index=0):
+    """
+    ({stay_id: the day's midnight in the stay's year}, {midnight: [stay_id, ...]})
+    for the stays the census index has in the ICU on day day_index of the
+    timeline, in stay_id order: the frames the day store loads rows for.
+    """
+    first_hour = day_index * HOURS_PER_DAY
+    stay_ids = sorted(census.present_during(first_hour, first_hour + HOURS_PER_DAY - 1))
+    day_starts = {stay_id: census.day_start(stay_id, day_index) for stay_id in stay_ids}
+    stay_frames = defaultdict(list)  # this day's midnight -> stay_ids
+    for stay_id, day_start in day_starts.items():
+        stay_frames[day_start].append(stay_id)
+    return day_starts, dict(stay_frames)
+
+
+class SimulationDayStore:
+    """
+    Hour-indexed snapshot of one simulated day for the active cohort.
+
+    Rows are stored as plain tuples (in the *_FIELDS column order) bucketed
+    by hour, so a tick only touches the rows of its own hour:
+
+        new_patients[h]    -> stays admitted at hour h
+        discharges[h]      -> stays discharged during hour h (present until then)
+        vitalsigns[h]      -> vitals charted at hour h for admitted stays
+        labs[h]            -> chemistry + coagulation draws at hour h
+        procedureevents[h] -> procedure rows at hour h for admitted stays
+        admitted_counts[h] -> number of stays admitted at or before hour h
+        census_counts[h]   -> number of stays in the ICU at hour h
+
+    day_starts maps stay_id to the midnight starting this day in the stay's
+    own shifted year (default: its intime's midnight, i.e. admitted today).
+    A stay whose midnight is later than its intime was admitted on an
+    earlier day of the timeline: it is carried over, present from hour 0,
+    and not listed as a new patient.
+    """
+
+    def __init__(self, patients, vitalsigns, procedureevents, labs=(), columnar_day=None, day_starts=None):
+        self.new_patients = [[] for _ in range(HOURS_PER_DAY)]
+        self.discharges = [[] for _ in range(HOURS_PER_DAY)]
+        self.vitalsigns = [[] for _ in range(HOURS_PER_DAY)]
+        self.labs = [[] for _ in range(HOURS_PER_DAY)]
+        self.procedureevents = [[] for _ in range(HOURS_PER_DAY)]
+        self.admitted_counts = [0] * HOURS_PER_DAY
+        self.census_counts = [0] * HOURS_PER_DAY
+        self.admit_hour = {}      # stay_id -> admission hour on the simulated day (0 if carried over)
+        self.discharge_hour = {}  # stay_id -> discharge hour, for stays leaving on the simulated day
+        self.profiles = {}        # stay_id -> profile row
+        self.carried_over = set()  # stay_ids admitted on an earlier day of the timeline
+        self._census_keys = {}    # hour -> sorted (subject_id, stay_id), built on demand
+        self.feature_cube = None  # risk-scoring features, built by scoring.py
+        self.columnar_day = columnar_day  # source ColumnarDay, None for the database
+
+        stay_idx = PATIENT_FIELDS.index('stay_id')
+        intime_idx = PATIENT_FIELDS.index('intime')
+        outtime_idx = PATIENT_FIELDS.index('outtime')
+        for row in utc_rows(patients, PATIENT_FIELDS):
+            stay_id, intime, outtime = row[stay_idx], row[intime_idx], row[outtime_idx]
+            midnight = intime.replace(hour=0, minute=0, second=0, microsecond=0)
+            day_start = day_starts.get(stay_id, midnight) if day_starts else midnight
+            if day_start > midnight:
+                hour = 0
+                self.carried_over.add(stay_id)
+            else:
+                hour = intime.hour
+                self.new_patients[hour].append(row)
+            self.admit_hour[stay_id] = hour
+            self.profiles[stay_id] = row
+
+            if outtime is not None and outtime < day_start + datetime.timedelta(hours=HOURS_PER_DAY):
+                leave = max((outtime - day_start) // datetime.timedelta(hours=1), hour)
+                self.discharge_hour[stay_id] = leave
+                self.discharges[leave].append(row)
+
+        running = len(self.carried_over)
+        discharged = 0
+        for hour in range(HOURS_PER_DAY):
+            running += len(self.new_patients[hour])
+            self.admitted_counts[hour] = running
+            self.census_counts[hour] = running - discharged
+            discharged += len(self.discharges[hour])
+
+        self._bucket(vitalsigns, VITALSIGN_FIELDS, self.vitalsigns)
+        self._bucket(labs, LAB_FIELDS, self.labs)
+        self._bucket(procedureevents, PROCEDURE_FIELDS, self.procedureevents)
+
+        self.loaded_at = time.time()
+
+    def _bucket(self, rows, fields, buckets):
+        """Place rows into hour buckets, keeping only stays in the ICU at that hour."""
+        stay_idx = fields.index('stay_id')
+        hour_idx = fields.index('charttime_hour')
+        for row in utc_rows(rows, fields):
+            hour = row[hour_idx].hour
+            stay_id = row[stay_idx]
+            admit_hour = self.admit_hour.get(stay_id)
+            if admit_hour is not None and admit_hour <= hour <= self.discharge_hour.get(stay_id, hour):
+                buckets[hour].append(row)
+
+    @classmethod
+    def load(cls, census, sim_date=DEFAULT_SIM_DATE, cohort=DEFAULT_COHORT, day_index=0):
+        """
+        Build the store for day day_index of the timeline starting on
+        sim_date with two queries covering the whole simulated day — vitals
+        and labs together (see load_hourly_rows), procedure events; or the
+        summary view and the labs (see load_day_rows) — for
+        the stays the census index has in the ICU that day, or from the
+        day's columnar export when one is configured (census is unused;
+        columnar exports hold single days, so day_index must be 0).
+        """
+        source = get_columnar_source()
+        if source is not None:
+            if day_index:
+                raise ValueError('Columnar exports replay single days only.')
+            day = source.day(cohort, sim_date)
+            return cls(
+                day.rows('patients', PATIENT_FIELDS),
+                day.rows('vitalsigns', VITALSIGN_FIELDS),
+                day.rows('procedureevents', PROCEDURE_FIELDS),
+                _columnar_labs(day),
+                columnar_day=day,
+            )
+
+        day_starts, stay_frames = day_frames(census, day_index)
+        patients = [census.profiles[stay_id] for stay_id in day_starts]
+
+        vitalsigns = []
+        labs = []
+        procedureevents = []
+        if stay_frames:
+            vitalsigns, labs, procedureevents = load_day_rows(frames_q(stay_frames))
+
+        return cls(patients, vitalsigns, procedureevents, labs, day_starts=day_starts)
+
+    # -------------------------------------------------------------------------
+    # Tick lookups
+    # -------------------------------------------------------------------------
+
+    def new_patients_at(self, hour):
+        """Profiles of stays admitted at exactly this hour."""
+        return [dict(zip(PATIENT_FIELDS, row)) for row in self.new_patients[hour]]
+
+    def vitalsigns_at(self, hour):
+        """Vitals rows at this hour for every admitted stay."""
+        return [dict(zip(VITALSIGN_FIELDS, row)) for row in self.vitalsigns[hour]]
+
+    def labs_at(self, hour):
+        """Lab draws at this hour for every admitted stay."""
+        return [dict(zip(LAB_FIELDS, row)) for row in self.labs[hour]]
+
+    def procedureevents_at(self, hour):
+        """Procedure rows at this hour for every admitted stay."""
+        return [dict(zip(PROCEDURE_FIELDS, row)) for row in self.procedureevents[hour]]
+
+    def in_icu(self, stay_id, hour):
+        """Whether the stay is admitted and not yet discharged at this hour."""
+        admit_hour = self.admit_hour.get(stay_id)
+        return admit_hour is not None and admit_hour <= hour <= self.discharge_hour.get(stay_id, hour)
+
+    def census_keys(self, hour):
+        """Sorted (subject_id, stay_id) of the stays in the ICU at this hour."""
+        hour = min(hour, HOURS_PER_DAY - 1)
+        keys = self._census_keys.get(hour)
+        if keys is None:
+            subject_idx = PATIENT_FIELDS.index('subject_id')
+            keys = sorted(
+                (row[subject_idx], stay_id)
+                for stay_id, row in self.profiles.items()
+                if self.in_icu(stay_id, hour)
+            )
+            self._census_keys[hour] = keys
+        return keys
+
+    def stay_vitalsigns(self, stay_id, last_hour):
+        """One stay's vitals rows for hours 0..last_hour, in hour order."""
+        return self._stay_rows(self.vitalsigns, VITALSIGN_FIELDS, stay_id, last_hour)
+
+    def stay_labs(self, stay_id, last_hour):
+        """One stay's lab draws for hours 0..last_hour, in hour order."""
+        return self._stay_rows(self.labs, LAB_FIELDS, stay_id, last_hour)
+
+    def stay_procedureevents(self, stay_id, last_hour):
+        """One stay's procedure rows for hours 0..last_hour, in hour order."""
+        return self._stay_rows(self.procedureevents, PROCEDURE_FIELDS, stay_id, last_hour)
+
+    @staticmethod
+    def _stay_rows(buckets, fields, stay_id, last_hour):
+        stay_idx = fields.index('stay_id')
+        return [
+            dict(zip(fields, row))
+            for hour in range(min(last_hour, HOURS_PER_DAY - 1) + 1)
+            for row in buckets[hour]
+            if row[stay_idx] == stay_id
+        ]
+
+    def total_admitted(self, hour):
+        """Number of stays admitted (or carried over) at or before this hour."""
+        if hour < 0:
+            return 0
+        return self.admitted_counts[min(hour, HOURS_PER_DAY - 1)]
+
+    def census(self, hour):
+        """Number of stays in the ICU at this hour."""
+        if hour < 0:
+            return 0
+        return self.census_counts[min(hour, HOURS_PER_DAY - 1)]
+
+    def admitted_at(self, hour):
+        """Number of stays admitted at exactly this hour."""
+        if hour < 0:
+            return 0
+        return len(self.new_patients[min(hour, HOURS_PER_DAY - 1)])
+
+
+# =============================================================================
+# Process-wide stores, one per (cohort, timeline start, day of the timeline),
+# and census indexes, one per (cohort, timeline)
+# =============================================================================
+_stores = OrderedDict()
+_indexes = OrderedDict()
+_store_lock = threading.Lock()
+_load_locks = defaultdict(threading.Lock)  # one per key, so loads of different days overlap
+_generation = 0  # bumped by reload_day_store(); loads begun earlier are not kept
+_prefetching = set()
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='daystore-prefetch')
+
+
+def _store_key(cohort, sim_date, day_index=0):
+    return (cohort, sim_date.month, sim_date.day, day_index)
+
+
+def _index_key(cohort, sim_date, span_days=1):
+    return ('census', cohort, sim_date.month, sim_date.day, span_days)
+
+
+def _cached(cache, key):
+    with _store_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _remember(cache, key, value, generation):
+    with _store_lock:
+        if generation != _generation:
+            return
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > MAX_DAY_STORES:
+            cache.popitem(last=False)
+
+
+def _load_once(cache, key, load):
+    value = _cached(cache, key)
+    if value is None:
+        with _load_locks[key]:
+            value = _cached(cache, key)
+            if value is None:
+                generation = _generation
+                value = load()
+                _remember(cache, key, value, generation)
+    return value
+
+
+def get_census_index(cohort_patients, sim_date=DEFAULT_SIM_DATE, cohort=DEFAULT_COHORT, span_days=1):
+    """
+    The CensusIndex of the cohort's stays admitted during the timeline of
+    span_days days starting on sim_date, built from one profile query on
+    first use. cohort_patients must be those stays (None when reading a
+    columnar export, which holds the profiles of its single day).
+    """
+    def load():
+        sim_dates = [sim_date + datetime.timedelta(days=day) for day in range(span_days)]
+        source = get_columnar_source()
+        if source is not None:
+            rows = source.day(cohort, sim_date).rows('patients', PATIENT_FIELDS)
+        else:
+            rows = cohort_patients.values_list(*PATIENT_FIELDS)
+        return CensusIndex(rows, PATIENT_FIELDS, sim_dates)
+
+    return _load_once(_indexes, _index_key(cohort, sim_date, span_days), load)
+
+
+def get_day_store(cohort_patients, sim_date=DEFAULT_SIM_DATE, cohort=DEFAULT_COHORT, day_index=0, span_days=1):
+    """
+    Return the loaded store for this cohort and day of the timeline starting
+    on sim_date, loading it on first use (or waiting for a prefetch already
+    loading it). cohort_patients must be the cohort's stays admitted during
+    the timeline's span_days days (None when reading a columnar export); it
+    is only evaluated when the census index has to be built.
+    Sessions replaying the same day share one store.
+    """
+    def load():
+        census = get_census_index(cohort_patients, sim_date, cohort, span_days)
+        return SimulationDayStore.load(census, sim_date, cohort, day_index)
+
+    return _load_once(_stores, _store_key(cohort, sim_date, day_index), load)
+
+
+def prefetch_day_store(cohort_patients, sim_date=DEFAULT_SIM_DATE, cohort=DEFAULT_COHORT, day_index=0, span_days=1):
+    """
+    Start loading a day store on a background thread, so the tick that
+    reaches that day finds it in memory. Does nothing if the day is
+    already loaded or being prefetched.
+    """
+    key = _store_key(cohort, sim_date, day_index)
+    with _store_lock:
+        if key in _stores or key in _prefetching:
+            return
+        _prefetching.add(key)
+    _prefetcher.submit(_prefetch, key, cohort_patients, sim_date, cohort, day_index, span_days)
+
+
+def _prefetch(key, cohort_patients, sim_date, cohort, day_index, span_days):
+    try:
+        get_day_store(cohort_patients, sim_date, cohort, day_index, span_days)
+    except Exception:
+        logger.exception('Prefetching day store %s failed', key)
+    finally:
+        with _store_lock:
+            _prefetching.discard(key)
+        # The prefetch thread's own connection
+        connection.close()
+
+
+def reload_day_store(cohort_patients=None, sim_date=DEFAULT_SIM_DATE, cohort=DEFAULT_COHORT, day_index=0, span_days=1):
+    """
+    Reload hook — drop every cached day and census index so each is rebuilt
+    from the (refreshed) materialized views on its next tick. With a
+    queryset, the store for (cohort, sim_date, day_index) is rebuilt
+    immediately and returned.
+    """
+    global _generation
+    with _store_lock:
+        _generation += 1
+        _stores.clear()
+        _indexes.clear()
+    if cohort_patients is None:
+        return None
+    return get_day_store(cohort_patients, sim_date, cohort, day_index, span_days)
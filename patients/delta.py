@@ -0,0 +1,120 @@
+"""
+Incremental delta protocol for the simulation dashboards.
+
+Instead of reloading a page (and re-serializing every earlier hour) after
+each tick, a client sends the last hour it already has and receives only the
+rows charted after it, for the stays it is showing. Hours are timeline
+hours, counted from the first midnight of the session's timeline, so a
+delta may span days (and day stores). Payloads are columnar:
+
+    {
+      "version": 1,
+      "since": 4,                 # last hour the client had
+      "current_hour": 5,          # hour the client has after applying
+      "current_time": "March 13, 2025 06:00",
+      "patients": {"35475449": {"subject_id": 10021666, "hadm_id": 22756440}},
+      "vitalsigns": {"stay_id": [...], "hour": [...], "heart_rate": [...], ...},
+      "labs": {"stay_id": [...], "hour": [...], "bicarbonate": [...], ...},
+      "procedureevents": {"stay_id": [...], "hour": [...], "item_label": [...], ...}
+    }
+
+Patient identity is sent once per stay, never per row, and each tick costs
+the same whatever the simulated hour because rows come straight from the
+hour buckets of the day stores.
+"""
+
+from decimal import Decimal
+
+from .daystore import HOURS_PER_DAY, LAB_FIELDS, PATIENT_FIELDS, VITALSIGN_FIELDS, PROCEDURE_FIELDS
+
+
+DELTA_PROTOCOL_VERSION = 1
+
+# Columns shipped for each row type (beyond stay_id / hour)
+DELTA_VITALSIGN_COLUMNS = (
+    'heart_rate', 'sbp', 'dbp', 'mbp',
+    'resp_rate', 'temperature', 'spo2', 'glucose',
+)
+DELTA_LAB_COLUMNS = LAB_FIELDS[3:]
+DELTA_PROCEDURE_COLUMNS = (
+    'item_label', 'value', 'valueuom',
+    'ordercategoryname', 'statusdescription',
+)
+
+
+def _empty_columns(columns):
+    out = {'stay_id': [], 'hour': []}
+    out.update({col: [] for col in columns})
+    return out
+
+
+def _columnar(out, buckets, fields, columns, stay_ids, first_hour, last_hour, offset=0):
+    """
+    Append hour buckets first_hour..last_hour to a column-per-key dict,
+    labelled with their timeline hour (offset + hour of the day).
+    """
+    stay_idx = fields.index('stay_id')
+    col_idx = [fields.index(col) for col in columns]
+    value_lists = [out[col] for col in columns]
+
+    for hour in range(first_hour, last_hour + 1):
+        for row in buckets[hour]:
+            stay_id = row[stay_idx]
+            if stay_id not in stay_ids:
+                continue
+            out['stay_id'].append(stay_id)
+            out['hour'].append(offset + hour)
+            for values, idx in zip(value_lists, col_idx):
+                value = row[idx]
+                values.append(float(value) if isinstance(value, Decimal) else value)
+    return out
+
+
+def build_delta(day_store, stay_ids, since_hour, current_hour):
+    """
+    Rows for `stay_ids` charted in timeline hours since_hour+1 .. current_hour,
+    read from day_store(d), the store of day d of the timeline, for every day
+    the range touches.
+    """
+    stay_ids = set(stay_ids)
+    first_hour = max(since_hour + 1, 0)
+
+    subject_idx = PATIENT_FIELDS.index('subject_id')
+    hadm_idx = PATIENT_FIELDS.index('hadm_id')
+    patients = {}
+    vitalsigns = _empty_columns(DELTA_VITALSIGN_COLUMNS)
+    labs = _empty_columns(DELTA_LAB_COLUMNS)
+    procedureevents = _empty_columns(DELTA_PROCEDURE_COLUMNS)
+
+    for day_index in range(first_hour // HOURS_PER_DAY, current_hour // HOURS_PER_DAY + 1):
+        store = day_store(day_index)
+        offset = day_index * HOURS_PER_DAY
+        first = max(first_hour - offset, 0)
+        last = min(current_hour - offset, HOURS_PER_DAY - 1)
+
+        for stay_id in stay_ids:
+            admit_hour = store.admit_hour.get(stay_id)
+            if admit_hour is None or admit_hour > last:
+                continue
+            profile = store.profiles[stay_id]
+            patients[str(stay_id)] = {
+                'subject_id': profile[subject_idx],
+                'hadm_id': profile[hadm_idx],
+            }
+
+        _columnar(vitalsigns, store.vitalsigns, VITALSIGN_FIELDS, DELTA_VITALSIGN_COLUMNS,
+                  stay_ids, first, last, offset)
+        _columnar(labs, store.labs, LAB_FIELDS, DELTA_LAB_COLUMNS,
+                  stay_ids, first, last, offset)
+        _columnar(procedureevents, store.procedureevents, PROCEDURE_FIELDS, DELTA_PROCEDURE_COLUMNS,
+                  stay_ids, first, last, offset)
+
+    return {
+        'version': DELTA_PROTOCOL_VERSION,
+        'since': since_hour,
+        'current_hour': current_hour,
+        'patients': patients,
+        'vitalsigns': vitalsigns,
+        'labs': labs,
+        'procedureevents': procedureevents,
+    }
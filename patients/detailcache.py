@@ -0,0 +1,142 @@
+"""
+Two-level cache of the patient detail page's heavy parts.
+
+For a given stay and simulated hour the detail page's vitals chart payload
+and procedure log never change: the source views are fixed data. Both are
+cached, keyed by (cohort, simulated start day, the stay's day index on the
+timeline, subject_id, stay_id, hadm_id, hour):
+
+    level 1   an in-process LRU of DETAIL_CACHE_SIZE entries
+    level 2   Django's cache framework (CACHES[DETAIL_CACHE_ALIAS]); with a
+              shared backend such as Redis or memcached, one worker's render
+              serves every worker
+
+so a detail view repeated by other clinicians costs one dictionary lookup.
+
+reload_data invalidates both levels by bumping a generation number, used
+as the cache version in level 2. Other processes notice the new generation
+within GENERATION_POLL_SECONDS and drop their own LRU.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.safestring import mark_safe
+
+
+# How often a process checks the shared cache for an invalidation
+GENERATION_POLL_SECONDS = 1.0
+
+GENERATION_KEY = 'patients:detail:generation'
+
+
+class LRUCache:
+    """A thread-safe mapping holding at most maxsize entries, least recently used out first."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DetailCache:
+    """Chart payloads and procedure-log fragments, per (stay, hour)."""
+
+    def __init__(self, maxsize, alias='default', timeout=None):
+        self.local = LRUCache(maxsize)
+        self.alias = alias
+        self.timeout = timeout
+        self.generation = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get_or_build(self, key, build):
+        """
+        The cached {'vitalsigns_json', 'procedure_log_html', 'procedures_count',
+        'lab_table_html', 'labs_count'} for key, calling build() to make and
+        store it on a miss. The rendered '*_html' fragments come back marked
+        safe (the shared cache stores them as plain strings). The result
+        is stored under the generation current when the lookup started, so a
+        render racing an invalidation is never kept.
+        """
+        generation = self._current_generation()
+        value = self.local.get((generation, key))
+        if value is None:
+            shared_key = self._shared_key(key)
+            value = self.shared.get(shared_key, version=generation)
+            if value is None:
+                value = build()
+                self.shared.set(shared_key, value, self.timeout, version=generation)
+            self.local.set((generation, key), value)
+        return {
+            name: mark_safe(part) if name.endswith('_html') else part
+            for name, part in value.items()
+        }
+
+    def invalidate(self):
+        """Drop every entry, in this process now and in the others at their next poll."""
+        shared = self.shared
+        shared.add(GENERATION_KEY, 1, None)
+        try:
+            generation = shared.incr(GENERATION_KEY)
+        except ValueError:
+            # Evicted between add() and incr()
+            generation = 1
+            shared.set(GENERATION_KEY, generation, None)
+        with self._lock:
+            self.generation = generation
+            self._checked_at = time.monotonic()
+            self.local.clear()
+
+    def _current_generation(self):
+        now = time.monotonic()
+        if self.generation is not None and now - self._checked_at < GENERATION_POLL_SECONDS:
+            return self.generation
+        with self._lock:
+            generation = self.shared.get(GENERATION_KEY, 1)
+            if generation != self.generation:
+                # Entries of older generations can never be hit again
+                self.local.clear()
+                self.generation = generation
+            self._checked_at = now
+            return generation
+
+    @staticmethod
+    def _shared_key(key):
+        cohort, sim_date, day_index, subject_id, stay_id, hadm_id, hour = key
+        return f'patients:detail:{cohort}:{sim_date:%m-%d}:{day_index}:{subject_id}:{stay_id}:{hadm_id}:{hour}'
+
+
+detail_cache = DetailCache(
+    settings.DETAIL_CACHE_SIZE,
+    alias=settings.DETAIL_CACHE_ALIAS,
+    timeout=settings.DETAIL_CACHE_TIMEOUT,
+)
@@ -0,0 +1,143 @@
+"""
+Bulk export of a cohort's simulated day, streamed.
+
+For model training and offline review: every stay of a cohort admitted by
+the last requested hour, with its vitals and procedure rows for a range of
+hours, as one streamed response instead of one rendered detail page per
+stay. Two encodings, both newline-delimited JSON:
+
+    ndjson    one object per row, tagged with its table
+              {"table": "vitalsigns", "subject_id": ..., "heart_rate": ...}
+    columnar  one object per chunk of up to CHUNK_SIZE rows of one table
+              {"table": "vitalsigns", "rows": 2000, "columns": {"heart_rate": [...], ...}}
+
+Memory stays flat however large the cohort: stays are read in batches of
+STAYS_PER_BATCH, and each batch's rows come through server-side cursors
+(QuerySet.iterator) and leave as soon as they are encoded. As in the day
+store, a row is exported only once its stay has been admitted.
+
+Under ASGI the response must be an async iterator: Django drains a sync
+one into a list before sending the first byte. aiter_chunks fetches and
+encodes one batch per sync_to_async call, so the sync thread is held for
+one batch at a time rather than for the whole export.
+"""
+
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .daystore import PATIENT_FIELDS, VITALSIGN_FIELDS, PROCEDURE_FIELDS
+from .models import UniquePatientProfile, VitalsignHourly, ProcedureeventsHourly
+from .timewindow import admitted_on_sim_day, stays_by_year, window_q
+
+
+EXPORT_FORMATS = ('ndjson', 'columnar')
+
+# Rows fetched per server-side cursor round trip, and per columnar chunk
+CHUNK_SIZE = 2000
+
+# Stays whose rows are fetched together (bounds the window predicate size)
+STAYS_PER_BATCH = 500
+
+ROW_TABLES = (
+    ('vitalsigns', VitalsignHourly, VITALSIGN_FIELDS),
+    ('procedureevents', ProcedureeventsHourly, PROCEDURE_FIELDS),
+)
+
+
+def _dumps(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+def _json_value(value):
+    # Decimal columns (temperature) go out as numbers, as in the delta API
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def export_rows(predicate, sim_date, first_hour, last_hour):
+    """
+    Yield (table, fields, rows) batches: each batch of stays' profiles,
+    then their vitals and procedure rows for hours first_hour..last_hour.
+    """
+    patients = admitted_on_sim_day(
+        predicate.apply(UniquePatientProfile.objects.all()), sim_date,
+    ).filter(intime_hour__lte=last_hour).order_by('subject_id', 'stay_id')
+
+    batch = []
+    for row in patients.values_list(*PATIENT_FIELDS).iterator(chunk_size=CHUNK_SIZE):
+        batch.append(row)
+        if len(batch) == STAYS_PER_BATCH:
+            yield from _batch_rows(batch, sim_date, first_hour, last_hour)
+            batch = []
+    if batch:
+        yield from _batch_rows(batch, sim_date, first_hour, last_hour)
+
+
+def _batch_rows(patients, sim_date, first_hour, last_hour):
+    stay_idx = PATIENT_FIELDS.index('stay_id')
+    intime_idx = PATIENT_FIELDS.index('intime')
+    admit_hour = {row[stay_idx]: row[intime_idx].hour for row in patients}
+    yield 'patients', PATIENT_FIELDS, patients
+
+    stay_years = stays_by_year((row[stay_idx], row[intime_idx]) for row in patients)
+    time_window = window_q(stay_years, first_hour, last_hour, sim_date=sim_date)
+    for table, model, fields in ROW_TABLES:
+        row_stay_idx = fields.index('stay_id')
+        hour_idx = fields.index('charttime_hour')
+        chunk = []
+        rows = model.objects.filter(time_window).order_by('stay_id', 'charttime_hour')
+        for row in rows.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+            if row[hour_idx].hour < admit_hour[row[row_stay_idx]]:
+                continue
+            chunk.append(row)
+            if len(chunk) == CHUNK_SIZE:
+                yield table, fields, chunk
+                chunk = []
+        if chunk:
+            yield table, fields, chunk
+
+
+def encode_ndjson(batches):
+    for table, fields, rows in batches:
+        for row in rows:
+            record = {'table': table}
+            record.update(zip(fields, map(_json_value, row)))
+            yield _dumps(record)
+
+
+def encode_columnar(batches):
+    for table, fields, rows in batches:
+        columns = {
+            field: [_json_value(value) for value in values]
+            for field, values in zip(fields, zip(*rows))
+        }
+        yield _dumps({'table': table, 'rows': len(rows), 'columns': columns})
+
+
+ENCODERS = {'ndjson': encode_ndjson, 'columnar': encode_columnar}
+
+
+def encode_chunks(batches, export_format):
+    """Yield one string per batch: all of its encoded lines."""
+    encode = ENCODERS[export_format]
+    for batch in batches:
+        yield ''.join(encode([batch]))
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator over a sync chunk generator. Each chunk is produced on
+    the thread-sensitive sync thread, where the generator's server-side
+    cursor lives; the generator is closed there too if the client leaves.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
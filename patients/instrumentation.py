@@ -0,0 +1,326 @@
+"""
+Per-request timing and SQL instrumentation.
+
+With INSTRUMENTATION_ENABLED, InstrumentationMiddleware records for every
+request the view that served it, the number of SQL statements and the time
+spent in them, the slowest statements, and the time spent in spans the views
+mark with timed() ('serialize', 'render'). Each response then carries a
+Server-Timing header, which browser dev tools show per request:
+
+    Server-Timing: total;dur=41.2, db;dur=12.8;desc="5 queries",
+                   serialize;dur=3.1, render;dur=0, sql-1;dur=9.7;desc="SELECT ..."
+
+and the totals are aggregated per view for GET /metrics, in the Prometheus
+text format. Metrics are per process; scrape every worker.
+
+The header names SQL statements and /metrics exposes the app's traffic, so
+both are only served to clients in INSTRUMENTATION_INTERNAL_IPS; every
+request is still recorded.
+
+Statements are timed by a hook on each database connection that records
+into the current request's recorder, a context variable. The variable
+follows the request into sync_to_async threads and the query pools, so
+the middleware runs natively under ASGI (async views keep their
+concurrency) as well as under WSGI.
+
+Disabled (the default), the middleware removes itself at startup
+(MiddlewareNotUsed), timed() is a context-variable lookup, and /metrics
+answers 404.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+
+# Statements listed in Server-Timing, slowest first
+SLOWEST_STATEMENTS = 3
+
+# Characters of SQL kept in a Server-Timing description
+STATEMENT_PREVIEW = 80
+
+# Upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the queries-per-request histogram
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+SPANS = ('serialize', 'render')
+
+_recorder = contextvars.ContextVar('instrumentation_recorder', default=None)
+
+
+def instrumentation_enabled():
+    return getattr(settings, 'INSTRUMENTATION_ENABLED', False)
+
+
+def internal_client(request):
+    """True for requests from INSTRUMENTATION_INTERNAL_IPS."""
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'INSTRUMENTATION_INTERNAL_IPS', ())
+
+
+# =============================================================================
+# Per-request recording
+# =============================================================================
+
+class RequestRecorder:
+    """What one request spent its time on."""
+
+    __slots__ = ('statements', 'spans')
+
+    def __init__(self):
+        self.statements = []  # (seconds, sql)
+        self.spans = dict.fromkeys(SPANS, 0.0)
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: time one statement."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append((time.perf_counter() - start, sql))
+
+    @property
+    def sql_seconds(self):
+        return sum(seconds for seconds, _ in self.statements)
+
+    def slowest(self, n=SLOWEST_STATEMENTS):
+        return sorted(self.statements, key=lambda statement: statement[0], reverse=True)[:n]
+
+
+@contextmanager
+def timed(span):
+    """Add the time spent in the block to the current request's span."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.spans[span] += time.perf_counter() - start
+
+
+def _record_statement(execute, sql, params, many, context):
+    """connection.execute_wrapper hook: time the statement into the current request."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _hook_connection(sender=None, connection=connection, **kwargs):
+    """Install _record_statement on a connection (connection_created receiver)."""
+    if _record_statement not in connection.execute_wrappers:
+        # First, so that it times the other wrappers' work too
+        connection.execute_wrappers.insert(0, _record_statement)
+
+
+@contextmanager
+def recording(recorder):
+    """
+    Make recorder the current request's: it records the statements run in
+    the block, and those of worker threads under recording_queries().
+    """
+    token = _recorder.set(recorder)
+    try:
+        _hook_connection()
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+@contextmanager
+def recording_queries():
+    """
+    Record the statements this thread runs into the current request, for
+    worker threads that run part of a request's queries (see querypool.py).
+    """
+    if _recorder.get() is not None:
+        _hook_connection()
+    yield
+
+
+def _server_timing(recorder, total):
+    entries = [
+        f'total;dur={total * 1000:.1f}',
+        f'db;dur={recorder.sql_seconds * 1000:.1f};desc="{len(recorder.statements)} queries"',
+    ]
+    entries += [f'{span};dur={seconds * 1000:.1f}' for span, seconds in recorder.spans.items()]
+    for rank, (seconds, sql) in enumerate(recorder.slowest(), 1):
+        preview = ' '.join(sql.split())[:STATEMENT_PREVIEW].replace('\\', '').replace('"', "'")
+        entries.append(f'sql-{rank};dur={seconds * 1000:.1f};desc="{preview}"')
+    return ', '.join(entries)
+
+
+class InstrumentationMiddleware:
+    """Records each request and adds its Server-Timing header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not instrumentation_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened from now on, in any thread, record statements
+        connection_created.connect(_hook_connection, dispatch_uid='patients.instrumentation')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = RequestRecorder()
+        start = time.perf_counter()
+        with recording(recorder):
+            response = self.get_response(request)
+        return self._finish(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = RequestRecorder()
+        start = time.perf_counter()
+        token = _recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self._finish(request, response, recorder, time.perf_counter() - start)
+
+    @staticmethod
+    def _finish(request, response, recorder, total):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if view != 'metrics':
+            registry.observe(view, response.status_code, total, recorder)
+        if internal_client(request):
+            # Streaming responses are timed up to their first byte
+            response['Server-Timing'] = _server_timing(recorder, total)
+        return response
+
+
+# =============================================================================
+# Aggregation and /metrics
+# =============================================================================
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        for bound, count in zip(self.buckets, self.counts):
+            yield f'{name}_bucket{{{labels},le="{bound:g}"}} {count}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.total:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class _ViewMetrics:
+    __slots__ = ('responses', 'duration', 'queries', 'sql_seconds', 'spans', 'slowest_statement')
+
+    def __init__(self):
+        self.responses = {}  # status code -> count
+        self.duration = _Histogram(DURATION_BUCKETS)
+        self.queries = _Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.spans = dict.fromkeys(SPANS, 0.0)
+        self.slowest_statement = 0.0
+
+
+class MetricsRegistry:
+    """Process-wide totals per view name."""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, status, seconds, recorder):
+        slowest = recorder.slowest(1)
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = _ViewMetrics()
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+            metrics.duration.observe(seconds)
+            metrics.queries.observe(len(recorder.statements))
+            metrics.sql_seconds += recorder.sql_seconds
+            for span, spent in recorder.spans.items():
+                metrics.spans[span] += spent
+            if slowest:
+                metrics.slowest_statement = max(metrics.slowest_statement, slowest[0][0])
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        families = {
+            'patients_requests_total': ('counter', 'Responses by view and status code.', []),
+            'patients_request_duration_seconds': ('histogram', 'Time to first response byte.', []),
+            'patients_sql_queries_per_request': ('histogram', 'SQL statements per request.', []),
+            'patients_sql_seconds_total': ('counter', 'Time spent in SQL statements.', []),
+            'patients_span_seconds_total': ('counter', 'Time spent serializing and rendering.', []),
+            'patients_sql_slowest_statement_seconds': ('gauge', 'Slowest single SQL statement.', []),
+        }
+        with self._lock:
+            for view, metrics in sorted(self._views.items()):
+                labels = f'view="{view}"'
+                for status, count in sorted(metrics.responses.items()):
+                    families['patients_requests_total'][2].append(
+                        f'patients_requests_total{{{labels},status="{status}"}} {count}'
+                    )
+                families['patients_request_duration_seconds'][2].extend(
+                    metrics.duration.lines('patients_request_duration_seconds', labels)
+                )
+                families['patients_sql_queries_per_request'][2].extend(
+                    metrics.queries.lines('patients_sql_queries_per_request', labels)
+                )
+                families['patients_sql_seconds_total'][2].append(
+                    f'patients_sql_seconds_total{{{labels}}} {metrics.sql_seconds:.6f}'
+                )
+                for span, seconds in metrics.spans.items():
+                    families['patients_span_seconds_total'][2].append(
+                        f'patients_span_seconds_total{{{labels},span="{span}"}} {seconds:.6f}'
+                    )
+                families['patients_sql_slowest_statement_seconds'][2].append(
+                    f'patients_sql_slowest_statement_seconds{{{labels}}} {metrics.slowest_statement:.6f}'
+                )
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', *samples]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint for this process, for
+    INSTRUMENTATION_INTERNAL_IPS only.
+
+    GET /metrics
+    """
+    if not instrumentation_enabled() or not internal_client(request):
+        raise Http404('Instrumentation is disabled.')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
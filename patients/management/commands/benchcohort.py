@@ -0,0 +1,105 @@
+"""
+Benchmark the cohort predicate strategies against the old OR-of-Q filter.
+
+The temp_table strategy also pays for loading the cohort into its temporary
+table once per database connection; that load is timed on its own and
+added to its total.
+
+Usage:
+    python manage.py benchcohort
+    python manage.py benchcohort --sizes 60 1000 10000 --repeat 5
+"""
+
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from patients.cohort_engine import CohortPredicate
+from patients.models import UniquePatientProfile
+
+
+class Command(BaseCommand):
+    help = 'Report planning and execution time of each cohort filter strategy (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[60, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('EXPLAIN ANALYZE timings require PostgreSQL.')
+
+        for size in options['sizes']:
+            stays = self._sample_stays(size)
+            self.stdout.write(f'\nCohort of {size} stays')
+            self.stdout.write(
+                f"  {'strategy':<12} {'planning ms':>12} {'execution ms':>13} {'load ms':>8} "
+                f"{'total ms':>9} {'rows':>7}"
+            )
+
+            rows = [('or_q', self._or_q_queryset(stays), None)]
+            for strategy, kwargs in (
+                ('row_in', {'row_in_max': size, 'values_max': size}),
+                ('values', {'row_in_max': 0, 'values_max': size}),
+                ('temp_table', {'row_in_max': 0, 'values_max': 0}),
+            ):
+                predicate = CohortPredicate({'type': 'tuples', 'values': stays}, **kwargs)
+                rows.append((strategy, predicate.apply(UniquePatientProfile.objects.all()), predicate))
+
+            for name, queryset, predicate in rows:
+                load = 0.0
+                if predicate is not None and predicate.strategy == 'temp_table':
+                    load = self._load(predicate, options['repeat'])
+                planning, execution, count = self._explain(queryset, options['repeat'])
+                self.stdout.write(
+                    f'  {name:<12} {planning:>12.2f} {execution:>13.2f} {load:>8.2f} '
+                    f'{planning + execution + load:>9.2f} {count:>7}'
+                )
+
+    def _sample_stays(self, size):
+        """Real cohort tuples where available, padded with non-matching ones."""
+        stays = list(
+            UniquePatientProfile.objects.order_by('subject_id')
+            .values_list('subject_id', 'stay_id', 'hadm_id')[:size]
+        )
+        pad = size - len(stays)
+        stays.extend((-n, -n, -n) for n in range(1, pad + 1))
+        return stays
+
+    def _or_q_queryset(self, stays):
+        conditions = Q()
+        for subject_id, stay_id, hadm_id in stays:
+            conditions |= Q(subject_id=subject_id, stay_id=stay_id, hadm_id=hadm_id)
+        return UniquePatientProfile.objects.filter(conditions)
+
+    @staticmethod
+    def _load(predicate, repeat):
+        """Median time (ms) to load the cohort's temporary table, as on a new connection."""
+        timings = []
+        for _ in range(repeat):
+            connection._cohort_temp_table = None
+            started = time.perf_counter()
+            predicate._ensure_temp_table()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _explain(self, queryset, repeat):
+        """Median planning / execution time (ms) over `repeat` EXPLAIN ANALYZE runs."""
+        sql, params = queryset.values_list('stay_id').query.sql_with_params()
+        planning, execution = [], []
+        count = 0
+        with connection.cursor() as cursor:
+            for _ in range(repeat):
+                cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]
+                planning.append(plan['Planning Time'])
+                execution.append(plan['Execution Time'])
+                count = plan['Plan']['Actual Rows']
+        return statistics.median(planning), statistics.median(execution), count
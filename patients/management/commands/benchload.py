@@ -0,0 +1,278 @@
+"""
+Load-test the dashboard endpoints against the synthetic benchmark database.
+
+Every simulated client gets its own session and plays a whole timeline
+(one day, or --days days stepped by --step hours): at each tick it loads
+the patient list and the detail page of one admitted stay, then advances
+the clock, after --think seconds (a clinician reading the page; the time
+the next tick is prefetched in). Clients run side by side on threads,
+each with its own database connection, through the full middleware stack
+(django.test.Client, no network).
+
+Per endpoint it reports p50 / p95 / p99 latency, SQL queries per request and
+response bytes, and writes them with the run's settings and git commit to a
+JSON file, so runs on different commits can be compared with --compare.
+It also counts the database connections opened during the run: one per
+request with DB_CONN_MAX_AGE=0, one per thread with persistent connections.
+
+Usage:
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py seedsynthetic --stays 500
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py benchload --clients 8
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py benchload --output after.json --compare before.json
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py benchload --days 7 --step 2
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py benchload --think 0.5
+    DB_CONN_MAX_AGE=0 DB_PREPARED_STATEMENTS=0 DJANGO_SETTINGS_MODULE=config.settings_bench \
+        python manage.py benchload --output per-request.json
+"""
+
+import datetime
+import json
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import defaultdict
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from patients.cohort_engine import reset_cohort_predicate
+from patients.daystore import HOURS_PER_DAY, reload_day_store
+from patients.instrumentation import RequestRecorder, recording
+from patients.models import UniquePatientProfile
+from patients.prepared import prepared_statements_enabled
+from patients.simulation import MAX_SPAN_DAYS
+from patients.timewindow import DEFAULT_SIM_DATE, timeline_day
+
+
+ENDPOINTS = ('patient_list', 'patient_detail', 'advance_time')
+PERCENTILES = (50, 95, 99)
+
+# Statement count in a Server-Timing header (INSTRUMENTATION_ENABLED)
+SERVER_TIMING_QUERIES = re.compile(r'\bdb;dur=[0-9.]+;desc="(\d+) queries"')
+
+
+class Command(BaseCommand):
+    help = 'Replay the simulated day with concurrent clients and report latency per endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=4, help='Concurrent sessions (default 4).')
+        parser.add_argument('--days', type=int, default=1, help='Days in each timeline (default 1).')
+        parser.add_argument('--step', type=int, default=1, help='Hours per advance (default 1).')
+        parser.add_argument(
+            '--think', type=float, default=0.0,
+            help='Seconds each client waits before advancing the clock (default 0).',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--output', default=str(settings.BASE_DIR / 'var' / 'benchload.json'),
+            help='Result file (default var/benchload.json).',
+        )
+        parser.add_argument('--compare', help='Earlier result file to print deltas against.')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'BENCHMARK_DATABASE', False):
+            raise CommandError('Run with DJANGO_SETTINGS_MODULE=config.settings_bench after seedsynthetic.')
+        if not 1 <= options['days'] <= MAX_SPAN_DAYS:
+            raise CommandError(f'--days must be between 1 and {MAX_SPAN_DAYS}.')
+
+        stays = list(UniquePatientProfile.objects.values_list('subject_id', 'stay_id', 'hadm_id', 'intime'))
+        if not stays:
+            raise CommandError('The benchmark database is empty; run `manage.py seedsynthetic` first.')
+
+        # Every seeded stay is in the cohort; start from cold day stores
+        reset_cohort_predicate({'type': 'tuples', 'values': [stay[:3] for stay in stays]})
+        reload_day_store()
+
+        sim_dates = [DEFAULT_SIM_DATE + datetime.timedelta(days=day) for day in range(options['days'])]
+        admitted_by_hour = defaultdict(list)  # timeline hour -> stays
+        for subject_id, stay_id, hadm_id, intime in stays:
+            day = timeline_day(intime, sim_dates)
+            if day is not None:
+                admitted_by_hour[day * HOURS_PER_DAY + intime.hour].append((subject_id, stay_id, hadm_id))
+
+        samples = {endpoint: [] for endpoint in ENDPOINTS}
+        errors = []
+        opened = []
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count_connection, weak=False)
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(
+                target=self._client, name=f'benchload-{n}',
+                args=(random.Random(options['seed'] + n), options, admitted_by_hour, samples, errors),
+            )
+            for n in range(options['clients'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        connection_created.disconnect(count_connection)
+
+        result = {
+            'meta': self._meta(options, len(stays), wall, len(opened)),
+            'endpoints': {endpoint: self._summarize(samples[endpoint]) for endpoint in ENDPOINTS},
+            'errors': errors[:20],
+        }
+        self._report(result)
+
+        with open(options['output'], 'w') as f:
+            json.dump(result, f, indent=2)
+        self.stdout.write(f'\nWrote {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self._compare(json.load(f), result)
+        if errors:
+            raise CommandError(f'{len(errors)} request(s) failed.')
+
+    # -------------------------------------------------------------------------
+    # Clients
+    # -------------------------------------------------------------------------
+
+    def _client(self, rng, options, admitted_by_hour, samples, errors):
+        """One session playing the timeline. Runs on its own thread and connection."""
+        client = Client(HTTP_HOST='localhost')
+        client.post(reverse('patients:new_simulation'), {
+            'sim_date': DEFAULT_SIM_DATE.isoformat(),
+            'span_days': options['days'],
+            'step_hours': options['step'],
+        })
+        last_hour = options['days'] * HOURS_PER_DAY - 1
+        admitted = []
+        hour = -1
+        try:
+            while hour < last_hour:
+                time.sleep(options['think'])
+                self._request(client, 'advance_time', 'post', reverse('patients:advance_time'), samples, errors)
+                next_hour = min(hour + options['step'], last_hour)
+                for h in range(hour + 1, next_hour + 1):
+                    admitted.extend(admitted_by_hour.get(h, ()))
+                hour = next_hour
+                self._request(client, 'patient_list', 'get', reverse('patients:index'), samples, errors)
+                if admitted:
+                    subject_id, stay_id, hadm_id = rng.choice(admitted)
+                    url = reverse('patients:detail', args=(subject_id, stay_id, hadm_id))
+                    self._request(client, 'patient_detail', 'get', url, samples, errors)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _request(client, endpoint, method, url, samples, errors):
+        # The async views run their queries on request-pool threads, which
+        # record into the current request's recorder (see views._off_loop);
+        # with the instrumentation middleware on, that is the middleware's
+        # own, reported in Server-Timing
+        with recording(RequestRecorder()) as recorder:
+            begin = time.perf_counter()
+            response = getattr(client, method)(url)
+            elapsed = time.perf_counter() - begin
+        match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+        queries = int(match.group(1)) if match else len(recorder.statements)
+        if response.status_code != 200:
+            errors.append(f'{method.upper()} {url}: HTTP {response.status_code}')
+        # list.append is atomic, so the client threads share the sample lists
+        samples[endpoint].append((elapsed, queries, len(response.content)))
+
+    # -------------------------------------------------------------------------
+    # Results
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _summarize(endpoint_samples):
+        if not endpoint_samples:
+            return {'requests': 0}
+        latency, queries, size = (np.array(column, dtype=float) for column in zip(*endpoint_samples))
+        summary = {'requests': len(endpoint_samples)}
+        for p, value in zip(PERCENTILES, np.percentile(latency * 1000, PERCENTILES)):
+            summary[f'p{p}_ms'] = round(float(value), 2)
+        summary.update({
+            'mean_ms': round(float(latency.mean() * 1000), 2),
+            'max_ms': round(float(latency.max() * 1000), 2),
+            'queries_mean': round(float(queries.mean()), 2),
+            'queries_max': int(queries.max()),
+            'bytes_mean': int(size.mean()),
+            'bytes_max': int(size.max()),
+        })
+        return summary
+
+    @staticmethod
+    def _meta(options, stays, wall, connections):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'commit': commit,
+            'run_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'stays': stays,
+            'clients': options['clients'],
+            'days': options['days'],
+            'step_hours': options['step'],
+            'think_seconds': options['think'],
+            'tick_prefetch': settings.TICK_PREFETCH_SIZE > 0,
+            'seed': options['seed'],
+            'sim_date': DEFAULT_SIM_DATE.isoformat(),
+            'wall_seconds': round(wall, 2),
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'prepared_statements': prepared_statements_enabled(),
+            'connections_opened': connections,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+    def _report(self, result):
+        meta = result['meta']
+        self.stdout.write(
+            f"{meta['clients']} client(s), {meta['stays']} stays on {meta['database']} "
+            f"at {meta['commit'] or 'unknown commit'}: {meta['wall_seconds']:.1f}s wall\n"
+            f"CONN_MAX_AGE={meta['conn_max_age']}, prepared statements "
+            f"{'on' if meta['prepared_statements'] else 'off'}: "
+            f"{meta['connections_opened']} connection(s) opened\n"
+        )
+        self.stdout.write(
+            f"  {'endpoint':<16} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'queries':>8} {'bytes':>9}"
+        )
+        for endpoint, summary in result['endpoints'].items():
+            if not summary['requests']:
+                continue
+            self.stdout.write(
+                f"  {endpoint:<16} {summary['requests']:>8} {summary['p50_ms']:>8.1f} "
+                f"{summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f} "
+                f"{summary['queries_mean']:>8.1f} {summary['bytes_mean']:>9}"
+            )
+
+    def _compare(self, before, after):
+        self.stdout.write(f"\nAgainst {before['meta'].get('commit') or 'baseline'}:")
+        if 'connections_opened' in before['meta']:
+            self.stdout.write(
+                f"  connections opened {before['meta']['connections_opened']} -> "
+                f"{after['meta']['connections_opened']}"
+            )
+        for endpoint, summary in after['endpoints'].items():
+            old = before['endpoints'].get(endpoint)
+            if not old or not old.get('requests') or not summary['requests']:
+                continue
+            deltas = []
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean', 'bytes_mean'):
+                change = (summary[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                deltas.append(f'{key} {old[key]:g} -> {summary[key]:g} ({change:+.0f}%)')
+            self.stdout.write(f"  {endpoint:<16} {', '.join(deltas)}")
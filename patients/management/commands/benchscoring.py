@@ -0,0 +1,164 @@
+"""
+Benchmark the batched risk scorer against a naive per-patient loop.
+
+Runs on synthetic features (no database needed): random vitals and sparse
+labs for N stays over a 24-hour day, scored at every hour three ways:
+
+    loop         plain-Python restatement of scoring.py, one stay at a time
+    vectorized   score_window() full recompute over each hour's history
+    rolling      RollingFeatureState, updated with one new hour per tick
+
+The run also checks that the loop and the batched scorer agree.
+
+Usage:
+    python manage.py benchscoring
+    python manage.py benchscoring --sizes 60 1000 10000 --repeat 3
+"""
+
+import math
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.daystore import HOURS_PER_DAY
+from patients.scoring import (
+    FEATURES, PREDICTION_HORIZON, RISK_LEVELS, TREND_WINDOW,
+    FeatureCube, RollingFeatureState, score_window,
+)
+
+
+# (mean, sd, fraction of hours charted) per feature
+SYNTHETIC_FEATURES = {
+    'heart_rate': (88, 18, 0.9),
+    'resp_rate': (19, 5, 0.9),
+    'temperature': (37.1, 0.8, 0.5),
+    'sbp': (118, 22, 0.9),
+    'mbp': (80, 14, 0.9),
+    'spo2': (96, 3, 0.9),
+    'bicarbonate': (23, 4, 0.15),
+    'inr': (1.3, 0.4, 0.1),
+    'ptt': (35, 15, 0.1),
+}
+
+
+def synthetic_cube(rng, size):
+    """A FeatureCube of `size` stays with random admissions and features."""
+    cube = FeatureCube(np.arange(1, size + 1), rng.integers(0, HOURS_PER_DAY, size))
+    shape = (size, HOURS_PER_DAY)
+    for name, (mean, sd, charted) in SYNTHETIC_FEATURES.items():
+        values = rng.normal(mean, sd, shape)
+        values[rng.random(shape) > charted] = np.nan
+        values[np.arange(HOURS_PER_DAY) < cube.admit_hours[:, None]] = np.nan
+        cube.values[FEATURES.index(name)] = values
+    return cube
+
+
+class Command(BaseCommand):
+    help = 'Compare vectorized risk scoring with a per-patient loop on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[60, 1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        self.stdout.write(
+            f"{'stays':>7} {'loop ms':>10} {'vectorized ms':>14} {'rolling ms':>11} {'speedup':>8}"
+        )
+
+        for size in options['sizes']:
+            cube = synthetic_cube(rng, size)
+            loop = self._time(lambda: self._score_loop(cube), options['repeat'])
+            vectorized = self._time(lambda: self._score_vectorized(cube), options['repeat'])
+            rolling = self._time(lambda: self._score_rolling(cube), options['repeat'])
+
+            if self._score_vectorized(cube) != self._score_loop(cube):
+                raise CommandError(f'Vectorized and per-patient scores differ for {size} stays.')
+
+            self.stdout.write(
+                f'{size:>7} {loop * 1000:>10.1f} {vectorized * 1000:>14.1f} '
+                f'{rolling * 1000:>11.1f} {loop / rolling:>7.1f}x'
+            )
+
+    @staticmethod
+    def _time(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    @staticmethod
+    def _score_vectorized(cube):
+        """Every hour of the day, one batched pass over the full history."""
+        results = []
+        for hour in range(HOURS_PER_DAY):
+            admitted = cube.admit_hours <= hour
+            scores = score_window(cube.stay_ids[admitted], cube.values[:, admitted, :hour + 1])
+            results.append(list(zip(
+                scores.stay_ids.tolist(), scores.score.tolist(),
+                [RISK_LEVELS[level] for level in scores.level.tolist()],
+                scores.alert_6h.tolist(),
+            )))
+        return results
+
+    @staticmethod
+    def _score_rolling(cube):
+        """Every hour of the day, one incremental update per tick."""
+        state = RollingFeatureState(len(cube.stay_ids))
+        for hour in range(HOURS_PER_DAY):
+            state.update(cube.values[:, :, hour])
+            state.scores(cube.stay_ids, cube.admit_hours <= hour)
+
+    @classmethod
+    def _score_loop(cls, cube):
+        """The same scores computed one stay and one feature at a time."""
+        results = []
+        for hour in range(HOURS_PER_DAY):
+            hour_results = []
+            for s, stay_id in enumerate(cube.stay_ids.tolist()):
+                if cube.admit_hours[s] > hour:
+                    continue
+                current, ahead = {}, {}
+                for f, name in enumerate(FEATURES):
+                    series = cube.values[f, s, :hour + 1].tolist()
+                    latest = next((v for v in reversed(series) if not math.isnan(v)), math.nan)
+                    slope = cls._slope(series)
+                    current[name] = latest
+                    ahead[name] = latest + slope * PREDICTION_HORIZON
+                hour_results.append(cls._classify(stay_id, current, ahead))
+            results.append(hour_results)
+        return results
+
+    @staticmethod
+    def _slope(series):
+        start = max(len(series) - TREND_WINDOW, 0)
+        points = [(t, v) for t, v in enumerate(series) if t >= start and not math.isnan(v)]
+        if len(points) < 2:
+            return 0.0
+        t_mean = sum(t for t, _ in points) / len(points)
+        y_mean = sum(v for _, v in points) / len(points)
+        variance = sum((t - t_mean) ** 2 for t, _ in points)
+        if variance == 0:
+            return 0.0
+        return sum((t - t_mean) * (v - y_mean) for t, v in points) / variance
+
+    @staticmethod
+    def _classify(stay_id, current, ahead):
+        def sirs(f):
+            return (f['heart_rate'] > 90) + (f['resp_rate'] > 20) + (
+                f['temperature'] > 38 or f['temperature'] < 36)
+
+        def qsofa(f):
+            return (f['resp_rate'] >= 22) + (f['sbp'] <= 100)
+
+        labs = (current['bicarbonate'] < 22) + (current['inr'] > 1.5) + (current['ptt'] > 60)
+        now_sirs, now_qsofa = sirs(current), qsofa(current)
+        high = now_qsofa >= 2 or (now_sirs >= 2 and labs >= 1)
+        alert = not high and (qsofa(ahead) >= 2 or (sirs(ahead) >= 2 and now_sirs < 2))
+        level = 'high' if high else 'rising' if alert else 'low'
+        return (stay_id, now_sirs + now_qsofa + labs, level, alert)
@@ -0,0 +1,158 @@
+"""
+Build a named cohort into the cohort_stay table, from the stays of
+fisi9t_unique_patient_profile admitted on a range of days that meet the
+given criteria.
+
+The range is split into one partition per calendar day (month and day, any
+year, as the simulation matches them). Partitions run side by side on
+--jobs worker threads, one database connection each, closed when the
+worker is done; each reads its day's stays through the profile's
+calendar-day expression index and replaces that day's rows of the cohort
+in one transaction, so rebuilding a day never touches the cohort's others.
+
+Usage:
+    python manage.py buildcohort march --from 2025-03-01 --to 2025-03-31
+    python manage.py buildcohort micu --from 2025-03-13 --careunit MICU --min-age 18 --min-los 1
+    python manage.py buildcohort default --from 2025-03-13 --per-day 60 --jobs 8
+    python manage.py buildcohort march --drop
+
+Sessions pick a cohort with POST /patients/simulations/new/ cohort=march.
+A 'default' cohort in the table replaces cohort.py once the workers restart.
+"""
+
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from patients.cohort_engine import KEY_COLUMNS, check_cohort_name
+from patients.models import CohortStay, UniquePatientProfile
+from patients.timewindow import DEFAULT_SIM_DATE, admitted_on_sim_day, calendar_day
+
+
+DEFAULT_JOBS = 4
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Write a named cohort of stays, by admission day and criteria, into the cohort table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Cohort name (sessions select it by this name).')
+        parser.add_argument(
+            '--from', dest='first', type=datetime.date.fromisoformat, default=DEFAULT_SIM_DATE,
+            help=f'First admission day, YYYY-MM-DD; only month and day are matched (default {DEFAULT_SIM_DATE}).',
+        )
+        parser.add_argument(
+            '--to', dest='last', type=datetime.date.fromisoformat,
+            help='Last admission day (default: --from).',
+        )
+        parser.add_argument('--careunit', action='append', help='First care unit (repeatable).')
+        parser.add_argument('--gender', choices=('F', 'M'))
+        parser.add_argument('--min-age', type=int)
+        parser.add_argument('--max-age', type=int)
+        parser.add_argument('--min-los', type=float, help='Minimum ICU length of stay, in days.')
+        parser.add_argument('--max-los', type=float, help='Maximum ICU length of stay, in days.')
+        parser.add_argument(
+            '--per-day', type=int,
+            help='Keep at most this many stays per day (lowest subject_id, stay_id first).',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=DEFAULT_JOBS,
+            help=f'Days built at the same time, one connection each (default {DEFAULT_JOBS}).',
+        )
+        parser.add_argument('--drop', action='store_true', help='Delete the cohort instead of building it.')
+
+    def handle(self, *args, **options):
+        name = options['name']
+        try:
+            check_cohort_name(name)
+        except ValueError as exc:
+            raise CommandError(exc)
+        if options['drop']:
+            deleted, _ = CohortStay.objects.filter(cohort=name).delete()
+            self.stdout.write(f'Dropped cohort {name!r} ({deleted} stays).')
+            return
+
+        days = self._days(options['first'], options['last'] or options['first'])
+        criteria = self._criteria(options)
+        jobs = max(options['jobs'], 1)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='buildcohort') as pool:
+            results = list(pool.map(
+                lambda sim_date: self._build_day(name, sim_date, criteria, options['per_day']),
+                days,
+            ))
+        wall = time.perf_counter() - started
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(CohortStay._meta.db_table)}')
+
+        self.stdout.write(f"\n  {'day':<8} {'stays':>7} {'seconds':>8}")
+        for sim_date, (count, seconds) in zip(days, results):
+            self.stdout.write(f'  {sim_date:%m-%d}    {count:>7} {seconds:>8.2f}')
+        total = sum(count for count, _ in results)
+        work = sum(seconds for _, seconds in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'\n  Cohort {name!r}: {total} stays over {len(days)} day(s), '
+            f'{wall:.1f}s wall for {work:.1f}s of work ({jobs} connection(s))'
+        ))
+
+    @staticmethod
+    def _days(first, last):
+        """One date per distinct calendar day from first to last."""
+        if last < first:
+            raise CommandError('--to is before --from.')
+        days = {}
+        sim_date = first
+        while sim_date <= last and len(days) < 366:
+            days.setdefault(calendar_day(sim_date), sim_date)
+            sim_date += datetime.timedelta(days=1)
+        return list(days.values())
+
+    @staticmethod
+    def _criteria(options):
+        """Profile filter kwargs for the criteria options given."""
+        lookups = {
+            'careunit': 'first_careunit__in',
+            'gender': 'gender',
+            'min_age': 'anchor_age__gte',
+            'max_age': 'anchor_age__lte',
+            'min_los': 'los__gte',
+            'max_los': 'los__lte',
+        }
+        return {
+            lookup: options[option]
+            for option, lookup in lookups.items()
+            if options[option] is not None
+        }
+
+    @staticmethod
+    def _build_day(name, sim_date, criteria, per_day):
+        """
+        Runs on a worker thread, over that thread's own connection. Returns
+        (stays written, seconds).
+        """
+        begin = time.perf_counter()
+        day = calendar_day(sim_date)
+        try:
+            stays = admitted_on_sim_day(
+                UniquePatientProfile.objects.filter(**criteria), sim_date,
+            ).order_by(*KEY_COLUMNS).values_list(*KEY_COLUMNS).distinct()
+            if per_day is not None:
+                stays = stays[:per_day]
+            rows = [
+                CohortStay(cohort=name, calendar_day=day, subject_id=subject_id, stay_id=stay_id, hadm_id=hadm_id)
+                for subject_id, stay_id, hadm_id in stays
+            ]
+            with transaction.atomic():
+                CohortStay.objects.filter(cohort=name, calendar_day=day).delete()
+                CohortStay.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        finally:
+            connection.close()
+        return len(rows), time.perf_counter() - begin
@@ -0,0 +1,132 @@
+"""
+Check the row loaders and the in-memory indexes built from them.
+
+    timestamps   naive profile and hourly rows (as psycopg2 returns the
+                 views' timestamp-without-time-zone columns) index and
+                 bucket exactly like the same rows made aware, and the
+                 detail page's hour labels can be taken from them
+    summary      load_day_rows returns the same vitals, labs and procedure
+                 rows (all-NULL hours included) from the summary view as
+                 from the hourly views
+
+The timestamp fixtures are built in memory. The summary check reads the
+database's rows of the stays admitted on the simulated day, e.g. the
+seeded benchmark database; --memory-only skips it. Exits non-zero on the
+first failure, so it can run in CI.
+
+Usage:
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py checkloaders
+    python manage.py checkloaders --memory-only
+"""
+
+import datetime
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from patients.census import CensusIndex
+from patients.daystore import (
+    HOURS_PER_DAY, PATIENT_FIELDS, VITALSIGN_FIELDS, SimulationDayStore, load_day_rows,
+)
+from patients.models import UniquePatientProfile
+from patients.timewindow import DEFAULT_SIM_DATE, admitted_on_sim_day, as_utc, stays_by_year, window_q
+
+
+ONE_HOUR = datetime.timedelta(hours=1)
+
+SIM_DATES = [DEFAULT_SIM_DATE, DEFAULT_SIM_DATE + datetime.timedelta(days=1)]
+
+
+def naive_fixture():
+    """
+    (profile rows, vitals rows) with naive timestamps: one stay admitted on
+    the first day and discharged on the second, one admitted on the second
+    and still in the ICU, each in its own shifted year.
+    """
+    profiles = [
+        (1, 11, 101, 64, 'F', 'WHITE', 'MICU',
+         datetime.datetime(2150, 3, 13, 8, 30), datetime.datetime(2150, 3, 14, 3, 10), 0.78),
+        (2, 22, 202, 71, 'M', 'BLACK', 'SICU',
+         datetime.datetime(2163, 3, 14, 5, 5), None, None),
+    ]
+    vitals = []
+    for subject_id, stay_id, _, _, _, _, _, intime, _, _ in profiles:
+        first = intime.replace(minute=0)
+        for hour in range(6):
+            vitals.append((subject_id, stay_id, first + hour * ONE_HOUR) + (80.0 + hour,) * 12)
+    return profiles, vitals
+
+
+def aware(rows, fields):
+    positions = [fields.index(name) for name in ('intime', 'outtime', 'charttime_hour') if name in fields]
+    return [tuple(as_utc(value) if i in positions else value for i, value in enumerate(row)) for row in rows]
+
+
+class Command(BaseCommand):
+    help = 'Fail if the loaders or the indexes built from them mishandle their rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--memory-only', action='store_true', help='Skip the checks that read the database.')
+
+    def handle(self, *args, **options):
+        self._check_timestamps()
+        if not options['memory_only']:
+            self._check_summary()
+
+    def _check_timestamps(self):
+        profiles, vitals = naive_fixture()
+        naive_index = CensusIndex(profiles, PATIENT_FIELDS, SIM_DATES)
+        aware_index = CensusIndex(aware(profiles, PATIENT_FIELDS), PATIENT_FIELDS, SIM_DATES)
+        for name in ('frames', 'admit', 'discharge'):
+            if getattr(naive_index, name) != getattr(aware_index, name):
+                raise CommandError(f'timestamps: CensusIndex.{name} differs for naive rows.')
+        if naive_index.admit != {11: 8, 22: 29} or naive_index.discharge != {11: 27, 22: None}:
+            raise CommandError(f'timestamps: wrong stay intervals {naive_index.admit} {naive_index.discharge}.')
+
+        for day in range(len(SIM_DATES)):
+            first_hour = day * HOURS_PER_DAY
+            stay_ids = sorted(naive_index.present_during(first_hour, first_hour + HOURS_PER_DAY - 1))
+            day_starts = {stay_id: naive_index.day_start(stay_id, day) for stay_id in stay_ids}
+            stores = [
+                SimulationDayStore(
+                    [profile for profile in rows if profile[1] in day_starts], hourly, [], day_starts=day_starts,
+                )
+                for rows, hourly in (
+                    (profiles, vitals),
+                    (aware(profiles, PATIENT_FIELDS), aware(vitals, VITALSIGN_FIELDS)),
+                )
+            ]
+            for name in ('admit_hour', 'discharge_hour', 'census_counts', 'vitalsigns'):
+                if getattr(stores[0], name) != getattr(stores[1], name):
+                    raise CommandError(f'timestamps: day {day} SimulationDayStore.{name} differs for naive rows.')
+
+            # The detail page's hour labels: charttime_hour - frame
+            for stay_id in stay_ids:
+                for row in stores[0].stay_vitalsigns(stay_id, HOURS_PER_DAY - 1):
+                    hour = (row['charttime_hour'] - naive_index.frames[stay_id]) // ONE_HOUR
+                    if hour // HOURS_PER_DAY != day:
+                        raise CommandError(f'timestamps: stay {stay_id} row at hour {hour} bucketed on day {day}.')
+
+        self.stdout.write(self.style.SUCCESS('  ✓ timestamps: naive rows index and bucket like aware ones'))
+
+    def _check_summary(self):
+        stays = admitted_on_sim_day(UniquePatientProfile.objects.all()).values_list('stay_id', 'intime')
+        time_window = window_q(stays_by_year(stays))
+        with override_settings(SIMULATION_HOUR_SUMMARY=False):
+            hourly = load_day_rows(time_window)
+        with override_settings(SIMULATION_HOUR_SUMMARY=True):
+            summary = load_day_rows(time_window)
+
+        if not hourly[0]:
+            raise CommandError('summary: no rows on the simulated day; seed the database first.')
+        for name, expected, rows in zip(('vitals', 'labs', 'procedure'), hourly, summary):
+            # Row order within an hour is the views' own; compare as multisets
+            if Counter(rows) != Counter(expected):
+                raise CommandError(
+                    f'summary: {name} rows differ from the hourly views '
+                    f'({len(rows)} from the summary view, {len(expected)} from the hourly views).'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'  ✓ summary: {len(hourly[0])} vitals and {len(hourly[2])} procedure rows match the hourly views'
+        ))
@@ -0,0 +1,127 @@
+"""
+EXPLAIN-based regression check for the per-tick queries.
+
+Every hot query must be answerable by an index scan on the materialized
+views. Planning happens with sequential scans disabled, so the planner only
+falls back to a Seq Scan when no index can serve the predicate — exactly the
+regression this check exists to catch (e.g. an EXTRACT(...) filter creeping
+back in). Exits non-zero when one is found, so it can run in CI.
+
+The queries are the app's own, built by the same helpers: the cohort's
+profile (census) query, then for the day store's frames and for one stay's
+detail page at a few hours, every query load_day_rows may run: the vitals
+and labs UNION ALL over the vitals, chemistry and coagulation views, its
+pooled halves, and the procedure events. With SIMULATION_HOUR_SUMMARY set,
+the summary view's reads are checked too.
+
+Usage:
+    python manage.py checkplans
+    python manage.py checkplans --natural   # keep the planner's own choices
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from patients.census import CensusIndex
+from patients.cohort_engine import cohort_patients
+from patients.daystore import (
+    HOURLY_SOURCES, LAB_SOURCES, PATIENT_FIELDS,
+    day_frames, hourly_rows_query, procedure_rows_query, summary_rows_query,
+)
+from patients.models import (
+    UniquePatientProfile, VitalsignHourly, ProcedureeventsHourly,
+    ChemistryHourly, CoagulationHourly, StayHourSummary,
+)
+from patients.timewindow import DEFAULT_SIM_DATE, frames_q
+
+
+CHECKED_HOURS = (0, 12, 23)
+
+CHECKED_TABLES = {
+    UniquePatientProfile._meta.db_table,
+    VitalsignHourly._meta.db_table,
+    ProcedureeventsHourly._meta.db_table,
+    ChemistryHourly._meta.db_table,
+    CoagulationHourly._meta.db_table,
+    StayHourSummary._meta.db_table,
+}
+
+
+class Command(BaseCommand):
+    help = 'Fail if any per-tick query plans a sequential scan on the hourly views (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--natural', action='store_true',
+            help='Do not disable sequential scans while planning.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('EXPLAIN plan checks require PostgreSQL.')
+
+        failures = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                if not options['natural']:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+                for name, queryset in self._queries():
+                    seq_scans = self._seq_scans(cursor, queryset)
+                    if seq_scans:
+                        failures.append((name, seq_scans))
+                        self.stdout.write(self.style.ERROR(f'  ✗ {name}: Seq Scan on {", ".join(seq_scans)}'))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f'  ✓ {name}'))
+
+        if failures:
+            raise CommandError(f'{len(failures)} query plan(s) fell back to a sequential scan.')
+
+    def _queries(self):
+        """(name, queryset) pairs covering the census, day-store and detail loads."""
+        profiles = cohort_patients().values_list(*PATIENT_FIELDS)
+        yield 'cohort patients', profiles
+
+        census = CensusIndex(profiles, PATIENT_FIELDS, [DEFAULT_SIM_DATE])
+        day_starts, stay_frames = day_frames(census)
+        if not stay_frames:
+            return
+        yield from self._loads('day store', frames_q(stay_frames))
+
+        # The detail page's window: the stay's frame (its day-0 midnight)
+        stay_id, frame = next(iter(day_starts.items()))
+        subject_id = census.profiles[stay_id][PATIENT_FIELDS.index('subject_id')]
+        for hour in CHECKED_HOURS:
+            stay_window = frames_q({frame: [stay_id]}, 0, hour) & Q(subject_id=subject_id)
+            yield from self._loads(f'detail @ {hour:02d}', stay_window)
+
+    @staticmethod
+    def _loads(name, time_window):
+        """Every query load_day_rows runs for time_window, with or without the query pool."""
+        yield f'{name} vitals + labs', hourly_rows_query(time_window)
+        yield f'{name} vitals', hourly_rows_query(time_window, HOURLY_SOURCES[:1])
+        yield f'{name} labs', hourly_rows_query(time_window, LAB_SOURCES)
+        yield f'{name} procedures', procedure_rows_query(time_window)
+        if settings.SIMULATION_HOUR_SUMMARY:
+            yield f'{name} summary', summary_rows_query(time_window)
+
+    def _seq_scans(self, cursor, queryset):
+        """Relations in CHECKED_TABLES that the plan reads with a Seq Scan."""
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        found = []
+        stack = [plan[0]['Plan']]
+        while stack:
+            node = stack.pop()
+            if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in CHECKED_TABLES:
+                found.append(node['Relation Name'])
+            stack.extend(node.get('Plans', []))
+        return found
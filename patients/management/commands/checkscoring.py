@@ -0,0 +1,115 @@
+"""
+Check that the rolling feature state matches a full recompute exactly.
+
+For synthetic cohorts, every hour is scored through FeatureCube.scores_at()
+(the incremental RollingFeatureState, with checkpoint restores) and through
+score_window() (recompute over the whole history), both for ticks in order
+and for random jumps back and forth. Every column must be identical,
+bit for bit. A second day is then checked the same way, its state seeded
+from the first day's final one for the stays carried over, against a
+recompute over both days. Exits non-zero on the first mismatch, so it can
+run in CI.
+
+Usage:
+    python manage.py checkscoring
+    python manage.py checkscoring --sizes 60 1000 --seeks 200
+"""
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.daystore import HOURS_PER_DAY
+from patients.management.commands.benchscoring import synthetic_cube
+from patients.scoring import FEATURES, TREND_FEATURES, FeatureCube, score_window
+
+
+SCORE_ARRAYS = ('stay_ids', 'sirs', 'qsofa', 'lab_flags', 'alert_6h', 'level', 'hours_since_abnormal')
+
+
+class Command(BaseCommand):
+    help = 'Fail if incremental risk scores differ from a full recompute.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1, 60, 1000])
+        parser.add_argument('--seeks', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        for size in options['sizes']:
+            values = synthetic_cube(rng, size)
+
+            # Ticks in order: one update per hour
+            cube = self._fresh(values)
+            for hour in range(HOURS_PER_DAY):
+                self._compare(cube, hour, f'{size} stays, tick {hour:02d}')
+
+            # Jumps: a new memo each time, so every seek goes through the state
+            cube = self._fresh(values)
+            for n, hour in enumerate(rng.integers(0, HOURS_PER_DAY, options['seeks']).tolist()):
+                cube._scores.clear()
+                self._compare(cube, hour, f'{size} stays, seek #{n} to {hour:02d}')
+
+            # A second day, seeded from the first for the stays carried over
+            second_day = self._next_day(rng, values)
+            cube = second_day()
+            for hour in range(HOURS_PER_DAY):
+                self._compare(cube, hour, f'{size} stays, day 2 tick {hour:02d}', cube.history)
+
+            cube = second_day()
+            for n, hour in enumerate(rng.integers(0, HOURS_PER_DAY, options['seeks']).tolist()):
+                cube._scores.clear()
+                self._compare(cube, hour, f'{size} stays, day 2 seek #{n} to {hour:02d}', cube.history)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'  ✓ {size} stays: {HOURS_PER_DAY} ticks and {options["seeks"]} seeks match, on both days'
+            ))
+
+    @staticmethod
+    def _fresh(cube):
+        """A copy of the cube with empty memo, state and checkpoints."""
+        copy = type(cube)(cube.stay_ids, cube.admit_hours, cube.discharge_hours)
+        copy.values[...] = cube.values
+        return copy
+
+    @classmethod
+    def _next_day(cls, rng, first):
+        """
+        Builder of fresh cubes of a second day: half the first day's stays
+        carried over (with gaps to forward-fill across midnight) and as
+        many newly admitted, seeded from the first day's final state. Each
+        cube's history holds the first day's values of its stays.
+        """
+        carried = first.stay_ids[rng.random(len(first.stay_ids)) < 0.5]
+        fresh = synthetic_cube(rng, len(carried) + len(first.stay_ids))
+        stay_ids = np.concatenate([carried, fresh.stay_ids[len(carried):] + first.stay_ids.max()])
+        admit_hours = np.concatenate([np.zeros(len(carried), dtype=np.int64), fresh.admit_hours[len(carried):]])
+        history = np.full((len(FEATURES), len(stay_ids), HOURS_PER_DAY), np.nan)
+        history[:, :len(carried)] = first.values[:, np.searchsorted(first.stay_ids, carried)]
+
+        def build():
+            cube = FeatureCube(stay_ids, admit_hours, seed=cls._fresh(first).carried_state(stay_ids))
+            cube.values[...] = fresh.values
+            cube.history = history
+            return cube
+        return build
+
+    @staticmethod
+    def _compare(cube, hour, label, history=None):
+        incremental = cube.scores_at(hour)
+        present = (cube.admit_hours <= hour) & (hour <= cube.discharge_hours)
+        if history is None:
+            full = score_window(cube.stay_ids[present], cube.values[:, present, :hour + 1])
+        else:
+            window = np.concatenate([history[:, present], cube.values[:, present, :hour + 1]], axis=-1)
+            full = score_window(cube.stay_ids[present], window, first_hour=-HOURS_PER_DAY)
+
+        for name in SCORE_ARRAYS:
+            if not np.array_equal(getattr(incremental, name), getattr(full, name)):
+                raise CommandError(f'{label}: {name} differs from the full recompute.')
+        for group in ('trends', 'rolling_means'):
+            for feature in TREND_FEATURES:
+                if not np.array_equal(
+                    getattr(incremental, group)[feature], getattr(full, group)[feature], equal_nan=True,
+                ):
+                    raise CommandError(f'{label}: {group}[{feature}] differs from the full recompute.')
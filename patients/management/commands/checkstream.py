@@ -0,0 +1,56 @@
+"""
+Check that tick streams release their subscriber.
+
+A stream subscribes to its session's broadcaster when it starts; the
+subscriber must be gone once the consumer stops iterating (the ASGI handler
+closes the iterator) and once the stream reaches the end of its lifetime,
+or every closed dashboard keeps receiving ticks and polling the store.
+Runs on an in-process broadcaster (no database needed). Exits non-zero on
+the first failure, so it can run in CI.
+
+Usage:
+    python manage.py checkstream
+"""
+
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.streaming import TickBroadcaster
+
+
+class Command(BaseCommand):
+    help = 'Fail if a tick stream keeps its subscriber after it ends.'
+
+    def handle(self, *args, **options):
+        asyncio.run(self._check_closed())
+        self.stdout.write(self.style.SUCCESS('  ✓ closed: the subscriber is removed when iteration stops'))
+        asyncio.run(self._check_lifetime())
+        self.stdout.write(self.style.SUCCESS('  ✓ lifetime: the stream ends and removes its subscriber'))
+
+    @staticmethod
+    async def _check_closed():
+        broadcaster = TickBroadcaster('check')
+        stream = broadcaster.stream()
+        await stream.__anext__()  # retry
+        if broadcaster.viewers != 1:
+            raise CommandError(f'closed: {broadcaster.viewers} viewers after the stream started, expected 1.')
+
+        broadcaster.publish({'version': 1, 'current_hour': 0})
+        frame = await asyncio.wait_for(stream.__anext__(), 1)
+        if not frame.startswith(b'event: tick\n'):
+            raise CommandError(f'closed: unexpected frame {frame!r}.')
+
+        await stream.aclose()
+        if broadcaster.viewers:
+            raise CommandError(f'closed: {broadcaster.viewers} viewers left after the consumer stopped.')
+
+    @staticmethod
+    async def _check_lifetime():
+        broadcaster = TickBroadcaster('check')
+        refreshed = []
+        frames = [frame async for frame in broadcaster.stream(refresh=refreshed.append, lifetime=1.5)]
+        if broadcaster.viewers:
+            raise CommandError(f'lifetime: {broadcaster.viewers} viewers left after the stream ended.')
+        if frames != [b'retry: 3000\n\n'] or not refreshed:
+            raise CommandError(f'lifetime: unexpected frames {frames!r} or no refresh.')
@@ -0,0 +1,87 @@
+"""
+Export the cohort's slice of the source views into the local columnar
+format (see patients/columnar.py), so a simulation node can replay those
+days without PostgreSQL.
+
+For each simulated day this writes the cohort's stays admitted on that day
+and their vitals, procedure events, chemistry and coagulation rows for the
+day's 24 hours — exactly what the day store and risk scorer read.
+
+Usage:
+    python manage.py exportcolumnar
+    python manage.py exportcolumnar --date 2025-03-13 --date 2025-03-14 --output var/columnar
+
+Then run with SIMULATION_COLUMNAR_DIR pointing at the output directory.
+"""
+
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.cohort_engine import DEFAULT_COHORT, get_cohort_predicate
+from patients.columnar import write_day
+from patients.daystore import PATIENT_FIELDS, VITALSIGN_FIELDS, PROCEDURE_FIELDS
+from patients.models import (
+    UniquePatientProfile, VitalsignHourly, ProcedureeventsHourly,
+    ChemistryHourly, CoagulationHourly,
+)
+from patients.timewindow import DEFAULT_SIM_DATE, admitted_on_sim_day, stays_by_year, window_q
+
+
+def _lab_fields(model):
+    return tuple(field.attname for field in model._meta.fields if not field.primary_key)
+
+
+# Row tables exported for every stay, keyed by columnar table name
+ROW_TABLES = {
+    'vitalsigns': (VitalsignHourly, VITALSIGN_FIELDS),
+    'procedureevents': (ProcedureeventsHourly, PROCEDURE_FIELDS),
+    'chemistry': (ChemistryHourly, _lab_fields(ChemistryHourly)),
+    'coagulation': (CoagulationHourly, _lab_fields(CoagulationHourly)),
+}
+
+
+class Command(BaseCommand):
+    help = 'Write the cohort slice of the hourly views to memory-mappable columnar files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', action='append', type=datetime.date.fromisoformat, dest='dates',
+            help=f'Simulated day (YYYY-MM-DD, repeatable; default {DEFAULT_SIM_DATE}).',
+        )
+        parser.add_argument('--cohort', default=DEFAULT_COHORT)
+        parser.add_argument(
+            '--output', default=settings.SIMULATION_COLUMNAR_DIR or str(settings.BASE_DIR / 'var' / 'columnar'),
+            help='Root directory (default SIMULATION_COLUMNAR_DIR or var/columnar).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            predicate = get_cohort_predicate(options['cohort'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        for sim_date in options['dates'] or [DEFAULT_SIM_DATE]:
+            started = time.perf_counter()
+            patients_qs = admitted_on_sim_day(
+                predicate.apply(UniquePatientProfile.objects.all()), sim_date,
+            )
+            patients = list(patients_qs.values_list(*PATIENT_FIELDS))
+            stay_years = stays_by_year(
+                (row[PATIENT_FIELDS.index('stay_id')], row[PATIENT_FIELDS.index('intime')])
+                for row in patients
+            )
+
+            tables = {'patients': (UniquePatientProfile, PATIENT_FIELDS, patients)}
+            day_window = window_q(stay_years, sim_date=sim_date)
+            for name, (model, fields) in ROW_TABLES.items():
+                rows = list(model.objects.filter(day_window).values_list(*fields)) if stay_years else []
+                tables[name] = (model, fields, rows)
+
+            path = write_day(options['output'], options['cohort'], sim_date, tables)
+            counts = ', '.join(f'{len(rows)} {name}' for name, (_, _, rows) in tables.items())
+            self.stdout.write(self.style.SUCCESS(
+                f'{sim_date}: {counts} -> {path} ({time.perf_counter() - started:.1f}s)'
+            ))
@@ -0,0 +1,34 @@
+"""
+Delete simulation sessions nobody has used for a while.
+
+Every browser or API client without a session cookie starts a session, so
+the session store only grows unless it is pruned. Run this from cron; a
+pruned session's browser simply starts a fresh one on its next request.
+
+Usage:
+    python manage.py prunesimulations
+    python manage.py prunesimulations --days 1
+"""
+
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from patients.simulation import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Delete simulation sessions unused for longer than SIMULATION_SESSION_TTL_DAYS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=float, default=settings.SIMULATION_SESSION_TTL_DAYS,
+            help=f'Idle days before a session is deleted (default {settings.SIMULATION_SESSION_TTL_DAYS:g}).',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] <= 0:
+            raise CommandError('--days must be positive.')
+        deleted = get_backend().prune(datetime.timedelta(days=options['days']))
+        self.stdout.write(f'Deleted {deleted} simulation session(s) idle for more than {options["days"]:g} day(s).')
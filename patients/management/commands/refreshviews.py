@@ -0,0 +1,197 @@
+"""
+Refresh the scripts/NN_*.sql materialized view chain without taking the
+dashboard offline.
+
+Views are refreshed in dependency order (see patients/matviews.py), each one
+as soon as everything it reads is done, so independent views — the hourly
+views 06-09 all read only 05 — run side by side, one database connection
+per worker. Populated views use REFRESH MATERIALIZED VIEW CONCURRENTLY,
+which keeps them readable throughout; that needs the unique index each
+script creates. Every view is ANALYZEd after its refresh.
+
+--create runs the scripts themselves (DROP ... CASCADE; CREATE ...), for the
+first build or after a script changed. That does take the views offline.
+
+Usage:
+    python manage.py refreshviews
+    python manage.py refreshviews fisi9t_unique_patient_profile   # it and everything downstream
+    python manage.py refreshviews --jobs 4 --dry-run
+    python manage.py refreshviews --create
+
+Afterwards, POST /patients/reload-data/ so running workers reload their
+day stores.
+"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from patients.matviews import downstream, levels, load_view_graph
+
+
+DEFAULT_JOBS = 4
+
+VIEW_STATE_SQL = """
+    SELECT
+        m.matviewname,
+        m.ispopulated,
+        EXISTS (
+            SELECT 1
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relname = m.matviewname
+              AND n.nspname = m.schemaname
+              AND i.indisunique
+              AND i.indpred IS NULL
+              AND i.indexprs IS NULL
+        ) AS has_unique_index
+    FROM pg_matviews m
+    WHERE m.matviewname = ANY(%s)
+      AND m.schemaname = ANY(current_schemas(false))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized view chain concurrently, in dependency order (PostgreSQL only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'views', nargs='*',
+            help='Refresh only these views and the views that depend on them (default: all).',
+        )
+        parser.add_argument(
+            '--jobs', type=int, default=DEFAULT_JOBS,
+            help=f'Views refreshed at the same time, one connection each (default {DEFAULT_JOBS}).',
+        )
+        parser.add_argument(
+            '--create', action='store_true',
+            help='Run the scripts (DROP/CREATE) instead of refreshing. Takes the views offline.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only print the refresh plan.')
+
+    def handle(self, *args, **options):
+        graph = load_view_graph()
+        unknown = set(options['views']) - set(graph)
+        if unknown:
+            raise CommandError(f'Unknown view(s): {", ".join(sorted(unknown))}')
+        selected = downstream(graph, options['views']) if options['views'] else set(graph)
+
+        if options['dry_run']:
+            for number, wave in enumerate(levels(graph, selected), 1):
+                self.stdout.write(f'  wave {number}: {", ".join(wave)}')
+            return
+
+        if connection.vendor != 'postgresql':
+            raise CommandError('Materialized views require PostgreSQL.')
+
+        modes = self._modes(selected, options['create'])
+        timings, failures = self._run(graph, selected, modes, max(options['jobs'], 1))
+        self._report(timings, failures, options['jobs'])
+
+        if failures:
+            raise CommandError(f'{len(failures)} view(s) failed or were skipped.')
+        self.stdout.write('Reload running workers with POST /patients/reload-data/.')
+
+    # -------------------------------------------------------------------------
+    # Planning
+    # -------------------------------------------------------------------------
+
+    def _modes(self, selected, create):
+        """{view: 'create' | 'concurrent' | 'full'} after checking the views exist."""
+        if create:
+            return dict.fromkeys(selected, 'create')
+
+        with connection.cursor() as cursor:
+            cursor.execute(VIEW_STATE_SQL, [sorted(selected)])
+            state = {name: (populated, unique) for name, populated, unique in cursor.fetchall()}
+
+        missing = sorted(selected - set(state))
+        if missing:
+            raise CommandError(f'Not created yet: {", ".join(missing)}. Run with --create first.')
+        no_index = sorted(name for name, (_, unique) in state.items() if not unique)
+        if no_index:
+            raise CommandError(
+                f'No plain unique index on: {", ".join(no_index)}. '
+                'Re-run their scripts (--create) to add the indexes concurrent refresh needs.'
+            )
+        # A never-populated view cannot be refreshed concurrently
+        return {name: 'concurrent' if populated else 'full' for name, (populated, _) in state.items()}
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    def _run(self, graph, selected, modes, jobs):
+        """
+        Start each view once all of its selected dependencies are done.
+        Returns ({view: (mode, start, seconds)}, {view: error}).
+        """
+        started = time.perf_counter()
+        timings, failures = {}, {}
+        pending = set(selected)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='refreshviews') as pool:
+            while pending or running:
+                for name in sorted(pending):
+                    if (graph[name].depends_on & selected) <= set(timings):
+                        running[pool.submit(self._refresh, graph[name], modes[name], started)] = name
+                        pending.discard(name)
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        timings[name] = (modes[name],) + future.result()
+                    except Exception as exc:
+                        failures[name] = exc
+                        self.stderr.write(self.style.ERROR(f'  ✗ {name}: {exc}'))
+                        for skipped in downstream(graph, [name]) & pending:
+                            failures[skipped] = f'skipped: {name} failed'
+                            pending.discard(skipped)
+                    else:
+                        self.stdout.write(f'  ✓ {name} ({timings[name][2]:.1f}s)')
+
+        return timings, failures
+
+    @staticmethod
+    def _refresh(view, mode, started):
+        """
+        Runs on a worker thread. django.db.connection is per thread, so each
+        worker refreshes over its own connection, closed when it is done.
+        """
+        qn = connection.ops.quote_name
+        begin = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                if mode == 'create':
+                    with open(view.script) as f:
+                        cursor.execute(f.read())
+                elif mode == 'concurrent':
+                    cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {qn(view.name)}')
+                else:
+                    cursor.execute(f'REFRESH MATERIALIZED VIEW {qn(view.name)}')
+                cursor.execute(f'ANALYZE {qn(view.name)}')
+        finally:
+            connection.close()
+        end = time.perf_counter()
+        return begin - started, end - begin
+
+    def _report(self, timings, failures, jobs):
+        self.stdout.write(f"\n  {'view':<32} {'mode':<11} {'start s':>8} {'seconds':>8}")
+        for name, (mode, start, seconds) in sorted(timings.items(), key=lambda item: item[1][1]):
+            self.stdout.write(f'  {name:<32} {mode:<11} {start:>8.1f} {seconds:>8.1f}')
+        for name, error in sorted(failures.items(), key=lambda item: item[0]):
+            self.stdout.write(self.style.ERROR(f'  {name:<32} {"failed":<11} {error}'))
+
+        if timings:
+            wall = max(start + seconds for _, start, seconds in timings.values())
+            work = sum(seconds for _, _, seconds in timings.values())
+            self.stdout.write(
+                f'\n  {wall:.1f}s wall for {work:.1f}s of refresh work ({jobs} connection(s))'
+            )
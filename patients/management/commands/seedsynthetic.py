@@ -0,0 +1,181 @@
+"""
+Seed a synthetic, MIMIC-shaped stand-in for the materialized views.
+
+Creates plain tables with the views' names and columns, then fills them
+with `--stays` ICU stays admitted at random hours of the simulated day (or
+of `--days` days from it, in turn; in shifted years, like MIMIC-IV) and
+`--hours` rows each on the same hour grid as the real views: every hour has
+a row, NULL-padded when nothing was charted, and procedure hours can hold
+several events. The packed summary view (scripts/10) is filled from the
+same rows.
+
+Refuses to run unless settings.BENCHMARK_DATABASE is set, i.e. under
+config.settings_bench, so it can never touch the MIMIC-IV database.
+
+Usage:
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py seedsynthetic
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py seedsynthetic --stays 2000 --hours 72
+    DJANGO_SETTINGS_MODULE=config.settings_bench python manage.py seedsynthetic --stays 5000 --days 7
+"""
+
+import datetime
+import random
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from patients.daystore import PROCEDURE_FIELDS
+from patients.models import (
+    UniquePatientProfile, VitalsignHourly, ProcedureeventsHourly,
+    ChemistryHourly, CoagulationHourly, StayHourSummary,
+)
+from patients.timewindow import DEFAULT_SIM_DATE
+
+
+SOURCE_MODELS = (
+    UniquePatientProfile, VitalsignHourly, ProcedureeventsHourly,
+    ChemistryHourly, CoagulationHourly, StayHourSummary,
+)
+
+BATCH_SIZE = 5000
+
+CARE_UNITS = ('MICU', 'SICU', 'CVICU', 'TSICU', 'CCU', 'Neuro SICU')
+RACES = ('WHITE', 'BLACK/AFRICAN AMERICAN', 'HISPANIC/LATINO', 'ASIAN', 'OTHER', 'UNKNOWN')
+PROCEDURE_ITEMS = (
+    (224275, '20 Gauge', 'Peripheral Lines'),
+    (225459, 'Chest X-Ray', 'Imaging'),
+    (224263, 'Multi Lumen', 'Invasive Lines'),
+    (225792, 'Invasive Ventilation', 'Ventilation'),
+    (229351, 'Foley Catheter', 'Procedures'),
+    (225400, 'Dialysis - CRRT', 'Dialysis'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Create and fill synthetic stand-ins for the hourly views (benchmark database only).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stays', type=int, default=500)
+        parser.add_argument('--hours', type=int, default=48, help='Hourly rows per stay.')
+        parser.add_argument(
+            '--date', type=datetime.date.fromisoformat, default=DEFAULT_SIM_DATE,
+            help=f'Simulated day the stays are admitted on (default {DEFAULT_SIM_DATE}).',
+        )
+        parser.add_argument('--days', type=int, default=1, help='Days from --date the admissions are spread over.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'BENCHMARK_DATABASE', False):
+            raise CommandError(
+                'Refusing to create tables outside a benchmark database; '
+                'run with DJANGO_SETTINGS_MODULE=config.settings_bench.'
+            )
+
+        call_command('migrate', verbosity=0)
+        self._create_tables()
+        if connection.vendor == 'sqlite':
+            # Persistent: lets a tick's session write proceed while a
+            # background day-store load is reading
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+
+        rng = random.Random(options['seed'])
+        rows = {model: [] for model in SOURCE_MODELS}
+        for n in range(options['stays']):
+            sim_date = options['date'] + datetime.timedelta(days=n % options['days'])
+            self._stay(rng, n, sim_date, options['hours'], rows)
+
+        with transaction.atomic():
+            for model in SOURCE_MODELS:
+                model.objects.all().delete()
+                model.objects.bulk_create(rows[model], batch_size=BATCH_SIZE)
+
+        counts = ', '.join(f'{len(rows[model])} {model._meta.db_table}' for model in SOURCE_MODELS)
+        self.stdout.write(self.style.SUCCESS(f'Seeded {counts}'))
+
+    def _create_tables(self):
+        existing = set(connection.introspection.table_names())
+        with connection.schema_editor() as editor:
+            for model in SOURCE_MODELS:
+                if model._meta.db_table not in existing:
+                    editor.create_model(model)
+
+    def _stay(self, rng, n, sim_date, hours, rows):
+        subject_id = 10_000_000 + n
+        stay_id = 30_000_000 + n
+        hadm_id = 20_000_000 + n
+        intime = datetime.datetime(
+            2110 + n % 70, sim_date.month, sim_date.day,
+            rng.randrange(24), rng.randrange(60), tzinfo=datetime.timezone.utc,
+        )
+        outtime = intime + datetime.timedelta(hours=hours - 1, minutes=rng.randrange(60))
+        rows[UniquePatientProfile].append(UniquePatientProfile(
+            subject_id=subject_id, stay_id=stay_id, hadm_id=hadm_id,
+            anchor_age=rng.randint(18, 91), gender=rng.choice('MF'), race=rng.choice(RACES),
+            first_careunit=rng.choice(CARE_UNITS), last_careunit=rng.choice(CARE_UNITS),
+            intime=intime, outtime=outtime,
+            los=(outtime - intime).total_seconds() / 86400,
+        ))
+
+        # Patients drift toward (or away from) sepsis over the stay
+        drift = rng.uniform(-0.5, 1.0)
+        start = intime.replace(minute=0)
+        for k in range(hours):
+            hour = start + datetime.timedelta(hours=k)
+            ids = {'subject_id': subject_id, 'stay_id': stay_id, 'charttime_hour': hour}
+            charted = rng.random() < 0.9
+            vitals = {
+                'heart_rate': rng.gauss(85 + drift * k * 0.6, 12),
+                'sbp': rng.gauss(120 - drift * k * 0.5, 15),
+                'dbp': rng.gauss(65, 8),
+                'mbp': rng.gauss(82 - drift * k * 0.3, 9),
+                'resp_rate': rng.gauss(18 + drift * k * 0.15, 3),
+                'temperature': Decimal(f'{rng.gauss(37 + drift * k * 0.02, 0.5):.2f}'),
+                'temperature_site': 'Oral',
+                'spo2': min(rng.gauss(96, 2), 100),
+                'glucose': rng.gauss(130, 30),
+            } if charted else {}
+            rows[VitalsignHourly].append(VitalsignHourly(**ids, **vitals))
+
+            events = []
+            for e in range(rng.choices((0, 1, 2, 3), weights=(60, 25, 10, 5))[0]):
+                itemid, label, category = rng.choice(PROCEDURE_ITEMS)
+                events.append(ProcedureeventsHourly(
+                    **ids, charttime=hour + datetime.timedelta(minutes=rng.randrange(60)),
+                    itemid=itemid, item_label=label, item_unitname='None',
+                    value=1.0, valueuom='None', location=None, locationcategory=None,
+                    orderid=n * 1000 + k * 4 + e, linkorderid=n * 1000 + k * 4 + e,
+                    ordercategoryname=category, ordercategorydescription='Task',
+                    statusdescription=rng.choice(('FinishedRunning', 'Stopped')),
+                    originalamount=1.0, originalrate=0.0,
+                ))
+            rows[ProcedureeventsHourly].extend(events or [ProcedureeventsHourly(**ids)])
+            events.sort(key=lambda event: (event.charttime, event.itemid, event.orderid))
+            rows[StayHourSummary].append(StayHourSummary(
+                **ids, **vitals, procedure_count=len(events),
+                procedure_events=[self._packed_event(event) for event in events],
+            ))
+
+            lab_hour = k % 6 == 0
+            rows[ChemistryHourly].append(ChemistryHourly(**ids, **({
+                'bicarbonate': rng.gauss(24 - drift * k * 0.1, 3),
+                'calcium': rng.gauss(8.6, 0.5),
+                'sodium': rng.gauss(139, 3),
+                'potassium': rng.gauss(4.1, 0.5),
+            } if lab_hour else {})))
+            rows[CoagulationHourly].append(CoagulationHourly(**ids, **({
+                'inr': max(rng.gauss(1.2 + drift * k * 0.02, 0.2), 0.8),
+                'pt': rng.gauss(13, 2),
+                'ptt': rng.gauss(32 + drift * k * 0.4, 6),
+                'fibrinogen': rng.gauss(300, 60),
+            } if k % 12 == 0 else {})))
+
+    @staticmethod
+    def _packed_event(event):
+        """One event of the summary view's JSON array, shaped as PostgreSQL's jsonb_build_object."""
+        packed = {name: getattr(event, name) for name in PROCEDURE_FIELDS[3:]}
+        packed['charttime'] = event.charttime.replace(tzinfo=None).isoformat()
+        return packed
@@ -0,0 +1,95 @@
+"""
+The scripts/NN_*.sql materialized view chain as a dependency graph.
+
+Each script creates one materialized view. A view depends on every other
+view of the chain its script reads from, which is found by scanning the
+script for the other views' names, so a new script is picked up without
+registering it anywhere. Used by `manage.py refreshviews`.
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from django.conf import settings
+
+
+SCRIPTS_DIR = os.path.join(settings.BASE_DIR, 'scripts')
+
+CREATE_RE = re.compile(r'CREATE\s+MATERIALIZED\s+VIEW\s+(\w+)', re.IGNORECASE)
+COMMENT_RE = re.compile(r'--[^\n]*')
+
+MaterializedView = namedtuple('MaterializedView', ['name', 'script', 'depends_on'])
+
+
+def load_view_graph(scripts_dir=SCRIPTS_DIR):
+    """
+    Return {name: MaterializedView} for every script, in script order.
+    depends_on is the set of chain views the script reads.
+    """
+    sources = {}
+    for filename in sorted(os.listdir(scripts_dir)):
+        if not filename.endswith('.sql'):
+            continue
+        path = os.path.join(scripts_dir, filename)
+        with open(path) as f:
+            sql = COMMENT_RE.sub('', f.read())
+        match = CREATE_RE.search(sql)
+        if match:
+            sources[match.group(1)] = (path, sql[match.end():])
+
+    graph = {}
+    for name, (path, body) in sources.items():
+        depends_on = {
+            other for other in sources
+            if other != name and re.search(rf'\b{other}\b', body)
+        }
+        graph[name] = MaterializedView(name, path, frozenset(depends_on))
+
+    _check_acyclic(graph)
+    return graph
+
+
+def _check_acyclic(graph):
+    visiting, done = set(), set()
+
+    def visit(name, path):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f'Materialized view cycle: {" -> ".join(path + [name])}')
+        visiting.add(name)
+        for dependency in graph[name].depends_on:
+            visit(dependency, path + [name])
+        visiting.discard(name)
+        done.add(name)
+
+    for name in graph:
+        visit(name, [])
+
+
+def downstream(graph, names):
+    """names plus every view that depends on them, directly or not."""
+    selected = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for view in graph.values():
+            if view.name not in selected and view.depends_on & selected:
+                selected.add(view.name)
+                changed = True
+    return selected
+
+
+def levels(graph, names=None):
+    """The selected views grouped into waves that can run side by side."""
+    remaining = set(graph if names is None else names)
+    waves = []
+    while remaining:
+        wave = sorted(
+            name for name in remaining
+            if not (graph[name].depends_on & remaining)
+        )
+        waves.append(wave)
+        remaining -= set(wave)
+    return waves
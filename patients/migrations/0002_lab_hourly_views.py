@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChemistryHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject_id', models.IntegerField()),
+                ('stay_id', models.IntegerField()),
+                ('charttime_hour', models.DateTimeField()),
+                ('bicarbonate', models.FloatField(blank=True, null=True)),
+                ('calcium', models.FloatField(blank=True, null=True)),
+                ('sodium', models.FloatField(blank=True, null=True)),
+                ('potassium', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'fisi9t_chemistry_hourly',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='CoagulationHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject_id', models.IntegerField()),
+                ('stay_id', models.IntegerField()),
+                ('charttime_hour', models.DateTimeField()),
+                ('d_dimer', models.FloatField(blank=True, null=True)),
+                ('fibrinogen', models.FloatField(blank=True, null=True)),
+                ('thrombin', models.FloatField(blank=True, null=True)),
+                ('inr', models.FloatField(blank=True, null=True)),
+                ('pt', models.FloatField(blank=True, null=True)),
+                ('ptt', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'fisi9t_coagulation_hourly',
+                'managed': False,
+            },
+        ),
+    ]
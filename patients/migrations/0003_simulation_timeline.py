@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0002_lab_hourly_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationsession',
+            name='span_days',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='simulationsession',
+            name='step_hours',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0003_simulation_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StayHourSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject_id', models.IntegerField()),
+                ('stay_id', models.IntegerField()),
+                ('charttime_hour', models.DateTimeField()),
+                ('heart_rate', models.FloatField(blank=True, null=True)),
+                ('sbp', models.FloatField(blank=True, null=True)),
+                ('dbp', models.FloatField(blank=True, null=True)),
+                ('mbp', models.FloatField(blank=True, null=True)),
+                ('sbp_ni', models.FloatField(blank=True, null=True)),
+                ('dbp_ni', models.FloatField(blank=True, null=True)),
+                ('mbp_ni', models.FloatField(blank=True, null=True)),
+                ('resp_rate', models.FloatField(blank=True, null=True)),
+                ('temperature', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('temperature_site', models.TextField(blank=True, null=True)),
+                ('spo2', models.FloatField(blank=True, null=True)),
+                ('glucose', models.FloatField(blank=True, null=True)),
+                ('procedure_count', models.IntegerField(default=0)),
+                ('procedure_events', models.JSONField(default=list)),
+            ],
+            options={
+                'db_table': 'fisi9t_stay_hour_summary',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0004_stay_hour_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortStay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cohort', models.CharField(max_length=64)),
+                ('calendar_day', models.SmallIntegerField()),
+                ('subject_id', models.IntegerField()),
+                ('stay_id', models.IntegerField()),
+                ('hadm_id', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'cohort_stay',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cohortstay',
+            constraint=models.UniqueConstraint(fields=('cohort', 'calendar_day', 'subject_id', 'stay_id', 'hadm_id'), name='cohort_stay_day_key'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0005_cohort_stay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simulationsession',
+            name='last_used',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
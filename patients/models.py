@@ -2,9 +2,11 @@
 Patient models - mapped to existing MIMIC-IV tables in PostgreSQL.
 
 These models use managed=False since the tables already exist in the database.
+SimulationSession is the exception: it is app state, created by migrate.
 """
 
 from django.db import models
+from django.utils import timezone
 
 
 class UniquePatientProfile(models.Model):
@@ -140,3 +142,150 @@ class ProcedureeventsHourly(models.Model):
 
     def __str__(self):
         return f"Procedure for {self.subject_id} - {self.item_label}"
+
+
+class ChemistryHourly(models.Model):
+    """
+    Maps to fisi9t_chemistry_hourly MATERIALIZED VIEW in mimiciv_derived schema.
+    
+    Contains hourly chemistry lab values for patients (hour grid, NULL when
+    nothing was drawn). Linked to UniquePatientProfile via (subject_id, stay_id).
+    """
+    # === Identifiers ===
+    subject_id = models.IntegerField()   # integer
+    stay_id = models.IntegerField()      # integer
+    charttime_hour = models.DateTimeField()  # timestamp without time zone
+    
+    # === Chemistry ===
+    bicarbonate = models.FloatField(null=True, blank=True)  # double precision (hourly min)
+    calcium = models.FloatField(null=True, blank=True)      # double precision (hourly avg)
+    sodium = models.FloatField(null=True, blank=True)       # double precision (hourly avg)
+    potassium = models.FloatField(null=True, blank=True)    # double precision (hourly max)
+
+    class Meta:
+        managed = False
+        db_table = 'fisi9t_chemistry_hourly'
+
+    def __str__(self):
+        return f"Chemistry for {self.subject_id} at {self.charttime_hour}"
+
+
+class CoagulationHourly(models.Model):
+    """
+    Maps to fisi9t_coagulation_hourly MATERIALIZED VIEW in mimiciv_derived schema.
+    
+    Contains hourly coagulation lab values for patients (hour grid, NULL when
+    nothing was drawn). Linked to UniquePatientProfile via (subject_id, stay_id).
+    """
+    # === Identifiers ===
+    subject_id = models.IntegerField()   # integer
+    stay_id = models.IntegerField()      # integer
+    charttime_hour = models.DateTimeField()  # timestamp without time zone
+    
+    # === Coagulation ===
+    d_dimer = models.FloatField(null=True, blank=True)     # double precision (hourly max)
+    fibrinogen = models.FloatField(null=True, blank=True)  # double precision (hourly min)
+    thrombin = models.FloatField(null=True, blank=True)    # double precision (latest)
+    inr = models.FloatField(null=True, blank=True)         # double precision (latest)
+    pt = models.FloatField(null=True, blank=True)          # double precision (latest)
+    ptt = models.FloatField(null=True, blank=True)         # double precision (latest)
+
+    class Meta:
+        managed = False
+        db_table = 'fisi9t_coagulation_hourly'
+
+    def __str__(self):
+        return f"Coagulation for {self.subject_id} at {self.charttime_hour}"
+
+
+class StayHourSummary(models.Model):
+    """
+    Maps to fisi9t_stay_hour_summary MATERIALIZED VIEW in mimiciv_derived schema.
+
+    One packed row per stay and hour (vitals grid): the dashboard's vitals,
+    the hour's procedure event count and its events as a JSON array.
+    Read instead of the two wide views when SIMULATION_HOUR_SUMMARY is set.
+    """
+    # === Identifiers ===
+    subject_id = models.IntegerField()   # integer
+    stay_id = models.IntegerField()      # integer
+    charttime_hour = models.DateTimeField()  # timestamp without time zone
+
+    # === Vitals (as in fisi9t_vitalsign_hourly) ===
+    heart_rate = models.FloatField(null=True, blank=True)  # double precision
+    sbp = models.FloatField(null=True, blank=True)         # double precision
+    dbp = models.FloatField(null=True, blank=True)         # double precision
+    mbp = models.FloatField(null=True, blank=True)         # double precision
+    sbp_ni = models.FloatField(null=True, blank=True)      # double precision
+    dbp_ni = models.FloatField(null=True, blank=True)      # double precision
+    mbp_ni = models.FloatField(null=True, blank=True)      # double precision
+    resp_rate = models.FloatField(null=True, blank=True)   # double precision
+    temperature = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)  # numeric
+    temperature_site = models.TextField(null=True, blank=True)  # text
+    spo2 = models.FloatField(null=True, blank=True)        # double precision
+    glucose = models.FloatField(null=True, blank=True)     # double precision
+
+    # === Procedure events of the hour ===
+    procedure_count = models.IntegerField(default=0)       # integer
+    procedure_events = models.JSONField(default=list)      # jsonb, one object per event
+
+    class Meta:
+        managed = False
+        db_table = 'fisi9t_stay_hour_summary'
+
+    def __str__(self):
+        return f"Summary for {self.subject_id} at {self.charttime_hour}"
+
+
+class CohortStay(models.Model):
+    """
+    One stay of a named cohort, written by `manage.py buildcohort`.
+
+    Keyed by the calendar day the stay was admitted on (month * 100 + day of
+    intime, any year; see timewindow.calendar_day), so a cohort is built and
+    rebuilt one day at a time. The views semi-join this table through its
+    unique index (see cohort_engine.py).
+
+    Managed by Django (python manage.py migrate creates the table).
+    """
+    cohort = models.CharField(max_length=64)
+    calendar_day = models.SmallIntegerField()  # e.g. 313 for March 13
+    subject_id = models.IntegerField()
+    stay_id = models.IntegerField()
+    hadm_id = models.IntegerField()
+
+    class Meta:
+        db_table = 'cohort_stay'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cohort', 'calendar_day', 'subject_id', 'stay_id', 'hadm_id'],
+                name='cohort_stay_day_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Cohort {self.cohort} @ {self.calendar_day}: stay {self.stay_id}"
+
+
+class SimulationSession(models.Model):
+    """
+    One simulation clock. Shared by every worker process, so any request
+    for the session sees the same hour regardless of which worker serves it.
+
+    Managed by Django (python manage.py migrate creates the table).
+    """
+    key = models.CharField(max_length=32, unique=True)
+    cohort = models.CharField(max_length=64, default='default')
+    sim_date = models.DateField()                      # first simulated day (year is display only)
+    span_days = models.PositiveSmallIntegerField(default=1)   # days in the timeline
+    step_hours = models.PositiveSmallIntegerField(default=1)  # hours per advance
+    current_hour = models.SmallIntegerField(default=-1)  # hours since sim_date 00:00; -1 = not started yet
+    version = models.PositiveIntegerField(default=0)   # bumped by every compare-and-set advance
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)  # see prunesimulations
+
+    class Meta:
+        db_table = 'simulation_session'
+
+    def __str__(self):
+        return f"Simulation {self.key} @ {self.sim_date} hour {self.current_hour}"
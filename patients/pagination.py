@@ -0,0 +1,84 @@
+"""
+Keyset (cursor) pagination of the patient list.
+
+Pages are ordered by (subject_id, stay_id) and addressed by the key of a
+neighbouring row instead of an OFFSET:
+
+    ?after=<subject_id>-<stay_id>    the page after that row   (Next)
+    ?before=<subject_id>-<stay_id>   the page before that row  (Previous)
+    ?last=1                          the final page            (Last)
+    (none)                           the first page            (First)
+
+The sorted keys of the stays in the ICU come from the day store, so a page
+is two bisections and 25 profile lookups in memory, however deep it is, and
+neither the page nor the census costs a query.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+PAGE_SIZE = 25
+
+
+def parse_cursor(value):
+    """(subject_id, stay_id) from a cursor string, or None if malformed."""
+    try:
+        subject_id, stay_id = value.split('-')
+        return int(subject_id), int(stay_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _cursor(row):
+    return f'{row.subject_id}-{row.stay_id}'
+
+
+class KeysetPage:
+    """One page of rows plus the cursors of its neighbours."""
+
+    def __init__(self, rows, has_previous, has_next, start_index=None):
+        self.object_list = rows
+        self.has_previous = has_previous and bool(rows)
+        self.has_next = has_next and bool(rows)
+        # 1-based position of the first row, when known
+        self.start_index = start_index
+        self.end_index = start_index + len(rows) - 1 if start_index is not None else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def previous_cursor(self):
+        return _cursor(self.object_list[0]) if self.object_list else None
+
+    @property
+    def next_cursor(self):
+        return _cursor(self.object_list[-1]) if self.object_list else None
+
+
+def page_request(query_dict):
+    """(after, before, last) from the request's GET parameters."""
+    return (
+        parse_cursor(query_dict.get('after')),
+        parse_cursor(query_dict.get('before')),
+        query_dict.get('last') == '1',
+    )
+
+
+def page_sorted(keys, row_for_key, after=None, before=None, last=False, size=PAGE_SIZE):
+    """
+    One page from memory: keys are the stays' sorted (subject_id, stay_id)
+    and row_for_key builds the row of one key, for the page only.
+    """
+    if before is not None or last:
+        end = bisect_left(keys, before) if before is not None else len(keys)
+        start = max(end - size, 0)
+    else:
+        start = bisect_right(keys, after) if after is not None else 0
+        end = start + size
+    rows = [row_for_key(key) for key in keys[start:end]]
+    return KeysetPage(rows, start > 0, end < len(keys), start + 1)
+
@@ -0,0 +1,114 @@
+"""
+Server-side prepared statements for the fixed queries of the hot paths.
+
+psycopg2 sends every statement as text, so PostgreSQL parses and plans the
+session lookup of each tick, or the profile and hourly queries of each
+detail page, again on every request. Statements run inside prepared() are
+instead prepared on their connection the first time their SQL is seen
+there,
+
+    PREPARE dj_stmt_0 AS SELECT ... WHERE "key" = $1
+
+and later sent as EXECUTE dj_stmt_0 ('...') for as long as the connection
+lives, which with persistent connections (CONN_MAX_AGE) is many requests.
+Only the statements of a fixed shape belong in prepared(): every distinct
+SQL text takes one slot of MAX_PREPARED_STATEMENTS per connection.
+
+A statement PostgreSQL will not prepare (a parameter of undeterminable
+type, say) runs as plain SQL from then on. Other databases, and
+DATABASE_PREPARED_STATEMENTS = False (needed behind a transaction-mode
+pgbouncer), run everything as plain SQL.
+"""
+
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DataError, ProgrammingError, connection
+
+
+# Distinct statements prepared on one connection; later ones run as plain SQL
+MAX_PREPARED_STATEMENTS = 32
+
+# psycopg2 placeholders and escaped percent signs
+_PLACEHOLDER = re.compile(r'%([s%])')
+
+# Marks a statement PostgreSQL refused to prepare
+_UNPREPARABLE = ''
+
+
+def prepared_statements_enabled():
+    return getattr(settings, 'DATABASE_PREPARED_STATEMENTS', False) and connection.vendor == 'postgresql'
+
+
+@contextmanager
+def prepared():
+    """Prepare the statements this thread runs in the block (see module docstring)."""
+    if not prepared_statements_enabled():
+        yield
+        return
+    with connection.execute_wrapper(_execute_prepared):
+        yield
+
+
+def _numbered(sql):
+    """sql with psycopg2's %s placeholders as $1, $2, ..., and the count of them."""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(1) == '%':
+            return '%'
+        count += 1
+        return f'${count}'
+
+    return _PLACEHOLDER.sub(replace, sql), count
+
+
+def _statements(wrapper):
+    """{sql: statement name} of the wrapper's current connection."""
+    raw = wrapper.connection
+    cached = getattr(wrapper, '_prepared_statements', None)
+    if cached is None or cached[0] is not raw:
+        cached = (raw, {})
+        wrapper._prepared_statements = cached
+    return cached[1]
+
+
+def _execute_prepared(execute, sql, params, many, context):
+    wrapper = context['connection']
+    if many or not isinstance(params, (list, tuple)):
+        return execute(sql, params, many, context)
+
+    statements = _statements(wrapper)
+    name = statements.get(sql)
+    if name is None:
+        # PREPARE fails like any statement; outside a transaction that
+        # leaves the connection usable
+        if wrapper.in_atomic_block or len(statements) >= MAX_PREPARED_STATEMENTS:
+            return execute(sql, params, many, context)
+        name = f'dj_stmt_{len(statements)}'
+        numbered, count = _numbered(sql)
+        if count != len(params):
+            name = _UNPREPARABLE
+        else:
+            try:
+                context['cursor'].cursor.execute(f'PREPARE {name} AS {numbered}')
+            except wrapper.Database.Error:
+                name = _UNPREPARABLE
+        statements[sql] = name
+
+    if name == _UNPREPARABLE:
+        return execute(sql, params, many, context)
+
+    arguments = f" ({', '.join(['%s'] * len(params))})" if params else ''
+    try:
+        return execute(f'EXECUTE {name}{arguments}', params, many, context)
+    except (DataError, ProgrammingError):
+        # Arguments the prepared parameter types do not accept: run this
+        # statement as plain SQL from now on
+        if wrapper.in_atomic_block:
+            raise
+        statements[sql] = _UNPREPARABLE
+        context['cursor'].cursor.execute(f'DEALLOCATE {name}')
+        return execute(sql, params, many, context)
@@ -0,0 +1,95 @@
+"""
+Independent ORM queries run side by side.
+
+Django connections are per thread, so each worker of the pool holds its own
+database connection and a batch of independent queries — a day's vitals
+and labs, its procedure events — costs roughly the slowest of them instead
+of their sum. Workers treat connections as request threads do: obsolete or
+broken ones (CONN_MAX_AGE, CONN_HEALTH_CHECKS) are closed before and after
+each task. With QUERY_POOL_SIZE = 0 every batch runs inline, one query
+after the other.
+
+Statements run on a worker are recorded into the submitting request's
+instrumentation (see instrumentation.recording_queries).
+
+The async views run their bodies on a second, separate pool
+(request_executor, REQUEST_POOL_SIZE threads). Its threads live as long as
+the process, so with persistent connections the two pools together are a
+connection pool of REQUEST_POOL_SIZE + QUERY_POOL_SIZE connections at most,
+instead of one new connection per request thread.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .instrumentation import recording_queries
+
+
+THREAD_NAME_PREFIX = 'querypool'
+
+REQUEST_THREAD_NAME_PREFIX = 'requestpool'
+
+_pool = None
+_request_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=settings.QUERY_POOL_SIZE, thread_name_prefix=THREAD_NAME_PREFIX,
+                )
+    return _pool
+
+
+def request_executor():
+    """The executor the async views run their sync bodies on."""
+    global _request_pool
+    if _request_pool is None:
+        with _pool_lock:
+            if _request_pool is None:
+                _request_pool = ThreadPoolExecutor(
+                    max_workers=settings.REQUEST_POOL_SIZE, thread_name_prefix=REQUEST_THREAD_NAME_PREFIX,
+                )
+    return _request_pool
+
+
+def pool_enabled():
+    return settings.QUERY_POOL_SIZE > 0
+
+
+def run_concurrently(*calls):
+    """
+    Call each of calls (no arguments) and return their results in order,
+    on the pool when there are several. The first exception raised is
+    re-raised here, once every call has finished.
+    """
+    inline = (
+        len(calls) < 2
+        or not pool_enabled()
+        # A worker waiting on its own pool could starve it
+        or threading.current_thread().name.startswith(THREAD_NAME_PREFIX)
+    )
+    if inline:
+        return [call() for call in calls]
+
+    pool = _get_pool()
+    futures = [pool.submit(contextvars.copy_context().run, _run, call) for call in calls]
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+def _run(call):
+    close_old_connections()
+    try:
+        with recording_queries():
+            return call()
+    finally:
+        close_old_connections()
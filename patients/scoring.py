@@ -0,0 +1,474 @@
+"""
+Vectorized sepsis risk scoring for every stay in the ICU.
+
+The day's features for the whole cohort are held as one float array of shape
+(features, stays, hours), with NaN where nothing was charted. It is built
+once per day store from the vitals and lab draws it already holds in
+memory (fisi9t_chemistry_hourly and fisi9t_coagulation_hourly). Scoring an
+hour is then a handful of array operations over every admitted stay at once:
+
+    latest value     last observation at or before the hour (carried forward)
+    trend            least-squares slope over the last TREND_WINDOW hours
+    rolling mean     mean of the last ROLLING_WINDOW hours
+    since abnormal   hours since any criterion was last met by a reading
+    projection       latest + slope * PREDICTION_HORIZON (6 hours ahead)
+    sirs             HR > 90, RR > 20, temperature > 38 or < 36        (0-3)
+    qsofa            RR >= 22, SBP <= 100 (no GCS in the feature views) (0-2)
+    lab_flags        bicarbonate < 22, INR > 1.5, PTT > 60              (0-3)
+
+Risk levels:
+    high    qSOFA >= 2, or SIRS >= 2 with at least one lab flag
+    rising  not high yet, but the 6-hour projection reaches qSOFA >= 2 or
+            pushes SIRS up to >= 2
+    low     everything else
+
+Those features are kept in a RollingFeatureState that each tick advances
+with only the new hour's values, so a tick costs the same at 23:00 as at
+01:00. Snapshots taken every CHECKPOINT_EVERY hours let a jump to any hour
+restore a nearby state instead of replaying from hour 0. On a multi-day
+timeline each day's state starts from the previous day's final one, so the
+carried-over stays keep their last values, trends and abnormal readings
+across midnight. score_window() is the full recompute the rolling state
+must match exactly (checked by `manage.py checkscoring`).
+
+The source day never changes, so scores are memoized per hour and shared by
+every session replaying the same day.
+"""
+
+import math
+import threading
+
+import numpy as np
+
+from .daystore import HOURS_PER_DAY, LAB_FIELDS, VITALSIGN_FIELDS
+
+
+VITAL_FEATURES = ('heart_rate', 'resp_rate', 'temperature', 'sbp', 'mbp', 'spo2')
+CHEMISTRY_FEATURES = ('bicarbonate',)
+COAGULATION_FEATURES = ('inr', 'ptt')
+FEATURES = VITAL_FEATURES + CHEMISTRY_FEATURES + COAGULATION_FEATURES
+
+# Features whose slope is reported with each score
+TREND_FEATURES = ('heart_rate', 'resp_rate', 'temperature', 'sbp')
+
+TREND_WINDOW = 6        # hours fitted for the slope
+ROLLING_WINDOW = 3      # hours averaged for the rolling mean
+PREDICTION_HORIZON = 6  # hours ahead for the early-warning projection
+
+# Rolling-state snapshots are kept every CHECKPOINT_EVERY hours for seeks
+CHECKPOINT_EVERY = 4
+
+RISK_LEVELS = ('low', 'rising', 'high')
+
+# last_abnormal of a stay without any abnormal reading (hours before the
+# day's midnight are negative, so -1 is a real hour)
+NEVER = np.iinfo(np.int32).min
+
+
+# =============================================================================
+# Criteria (shared by the current and the projected values)
+# =============================================================================
+
+def sirs_count(f):
+    """SIRS criteria met, from a {feature: array} mapping. NaN never counts."""
+    return (
+        (f['heart_rate'] > 90).astype(np.int8)
+        + (f['resp_rate'] > 20)
+        + ((f['temperature'] > 38) | (f['temperature'] < 36))
+    )
+
+
+def qsofa_count(f):
+    """qSOFA criteria met (respiratory rate and systolic pressure)."""
+    return (f['resp_rate'] >= 22).astype(np.int8) + (f['sbp'] <= 100)
+
+
+def lab_flag_count(f):
+    """Abnormal chemistry / coagulation values."""
+    return (
+        (f['bicarbonate'] < 22).astype(np.int8)
+        + (f['inr'] > 1.5)
+        + (f['ptt'] > 60)
+    )
+
+
+# =============================================================================
+# Feature cube
+# =============================================================================
+
+class FeatureCube:
+    """
+    Hourly features of every stay in a day store.
+
+        values[f, s, h]  feature FEATURES[f] of stay stay_ids[s] at hour h
+        admit_hours[s]      admission hour of stay_ids[s] (0 if carried over
+                            from an earlier day of the timeline)
+        discharge_hours[s]  last hour stay_ids[s] is in the ICU that day
+
+    seed is the state at hour -1 (see carried_state); without it the day
+    starts with no history.
+    """
+
+    def __init__(self, stay_ids, admit_hours, discharge_hours=None, seed=None):
+        self.stay_ids = np.asarray(stay_ids, dtype=np.int64)
+        self.admit_hours = np.asarray(admit_hours, dtype=np.int64)
+        if discharge_hours is None:
+            discharge_hours = np.full(len(self.stay_ids), HOURS_PER_DAY - 1)
+        self.discharge_hours = np.asarray(discharge_hours, dtype=np.int64)
+        self.values = np.full((len(FEATURES), len(self.stay_ids), HOURS_PER_DAY), np.nan)
+        self._index = {int(stay_id): i for i, stay_id in enumerate(self.stay_ids)}
+        self._scores = {}
+        self._state = RollingFeatureState(len(self.stay_ids))
+        if seed is not None:
+            self._state.restore(seed)
+        self._checkpoints = {-1: self._state.snapshot()}  # hour -> RollingFeatureState snapshot
+        self._lock = threading.Lock()
+
+    def fill(self, rows, fields, features):
+        """
+        Scatter (stay_id, charttime_hour, feature...) rows into the cube.
+        Rows of unknown stays, or charted before admission, are ignored.
+        """
+        if not rows:
+            return
+        stay_idx = fields.index('stay_id')
+        hour_idx = fields.index('charttime_hour')
+        feature_idx = [fields.index(name) for name in features]
+
+        stays = np.fromiter((self._index.get(row[stay_idx], -1) for row in rows), np.int64, len(rows))
+        hours = np.fromiter((row[hour_idx].hour for row in rows), np.int64, len(rows))
+        keep = stays >= 0
+        keep[keep] &= hours[keep] >= self.admit_hours[stays[keep]]
+
+        for name, idx in zip(features, feature_idx):
+            # None -> NaN; Decimal -> float
+            column = np.array([row[idx] for row in rows], dtype=float)
+            self.values[FEATURES.index(name), stays[keep], hours[keep]] = column[keep]
+
+    @classmethod
+    def load(cls, store, previous=None):
+        """Vitals and labs from the day store, the state seeded from the previous day's cube."""
+        stay_ids = sorted(store.admit_hour)
+        cube = cls(
+            stay_ids,
+            [store.admit_hour[stay_id] for stay_id in stay_ids],
+            [store.discharge_hour.get(stay_id, HOURS_PER_DAY - 1) for stay_id in stay_ids],
+            previous.carried_state(stay_ids) if previous is not None else None,
+        )
+        for hour_rows in store.vitalsigns:
+            cube.fill(hour_rows, VITALSIGN_FIELDS, VITAL_FEATURES)
+        for hour_rows in store.labs:
+            cube.fill(hour_rows, LAB_FIELDS, CHEMISTRY_FEATURES + COAGULATION_FEATURES)
+        return cube
+
+    # -------------------------------------------------------------------------
+    # Scoring
+    # -------------------------------------------------------------------------
+
+    def scores_at(self, hour):
+        """RiskScores for every stay in the ICU at `hour` (memoized)."""
+        hour = min(hour, HOURS_PER_DAY - 1)
+        scores = self._scores.get(hour)
+        if scores is None:
+            with self._lock:
+                scores = self._scores.get(hour)
+                if scores is None:
+                    present = (self.admit_hours <= hour) & (hour <= self.discharge_hours)
+                    scores = self._state_at(hour).scores(self.stay_ids, present)
+                    self._scores[hour] = scores
+        return scores
+
+    def latest_at(self, hour, features=VITAL_FEATURES):
+        """
+        Last charted value of each feature for every stay in the ICU at
+        `hour`, as JSON-ready columns. Restored from the nearest checkpoint,
+        like a seek.
+        """
+        hour = min(hour, HOURS_PER_DAY - 1)
+        present = (self.admit_hours <= hour) & (hour <= self.discharge_hours)
+        with self._lock:
+            latest = self._state_at(hour).latest[:, present]
+        columns = {'stay_id': self.stay_ids[present].tolist()}
+        columns.update({name: _rounded(latest[FEATURES.index(name)]) for name in features})
+        return columns
+
+    def carried_state(self, stay_ids):
+        """
+        The state at hour -1 of the next day for that day's stay_ids: this
+        day's final state for the stays carried over, with its hours counted
+        from the next midnight; no history for the others.
+        """
+        stay_ids = np.asarray(stay_ids, dtype=np.int64)
+        source = np.fromiter((self._index.get(int(stay_id), -1) for stay_id in stay_ids), np.int64, len(stay_ids))
+        carried = source >= 0
+        with self._lock:
+            final = self._state_at(HOURS_PER_DAY - 1)
+            latest = final.latest[:, source[carried]]
+            recent = final.recent()[:, source[carried]]
+            last_abnormal = final.last_abnormal[source[carried]]
+
+        state = RollingFeatureState(len(stay_ids))
+        state.latest[:, carried] = latest
+        ring = np.empty_like(recent)
+        ring[..., [hour % TREND_WINDOW for hour in range(-TREND_WINDOW, 0)]] = recent
+        state.ring[:, carried] = ring
+        state.last_abnormal[carried] = np.where(last_abnormal == NEVER, NEVER, last_abnormal - HOURS_PER_DAY)
+        return state
+
+    def _state_at(self, hour):
+        """
+        Move the rolling state to `hour`. Ticks in order cost one update;
+        a jump restores the nearest checkpoint at or before `hour` (hour -1
+        being the day's starting state) and rolls forward from there.
+        Caller holds self._lock.
+        """
+        state = self._state
+        base = max(h for h in self._checkpoints if h <= hour)
+        if state.hour > hour or base > state.hour:
+            state.restore(self._checkpoints[base])
+
+        while state.hour < hour:
+            state.update(self.values[:, :, state.hour + 1])
+            if state.hour % CHECKPOINT_EVERY == 0 and state.hour not in self._checkpoints:
+                self._checkpoints[state.hour] = state.snapshot()
+        return state
+
+
+class RollingFeatureState:
+    """
+    Running per-stay features, one row per stay in each array, updated with
+    one hour of raw values at a time:
+
+        latest[f, s]      last observed value (forward fill)
+        ring[f, s, k]     raw values of the last TREND_WINDOW hours, hour h
+                          in column h % TREND_WINDOW
+        last_abnormal[s]  last hour with an abnormal reading (NEVER = none)
+
+    An update touches only the new hour, whatever the stay's history length.
+    """
+
+    __slots__ = ('hour', 'latest', 'ring', 'last_abnormal')
+
+    def __init__(self, n_stays):
+        self.hour = -1
+        self.latest = np.full((len(FEATURES), n_stays), np.nan)
+        self.ring = np.full((len(FEATURES), n_stays, TREND_WINDOW), np.nan)
+        self.last_abnormal = np.full(n_stays, NEVER, dtype=np.int64)
+
+    def reset(self):
+        self.hour = -1
+        self.latest.fill(np.nan)
+        self.ring.fill(np.nan)
+        self.last_abnormal.fill(NEVER)
+
+    def update(self, hour_values):
+        """Apply the raw (features, stays) values of hour self.hour + 1."""
+        hour = self.hour + 1
+        np.copyto(self.latest, hour_values, where=~np.isnan(hour_values))
+        self.ring[..., hour % TREND_WINDOW] = hour_values
+        self.last_abnormal[abnormal_readings(dict(zip(FEATURES, hour_values)))] = hour
+        self.hour = hour
+
+    def recent(self):
+        """The ring in chronological order, oldest hour first."""
+        order = [(self.hour + 1 + k) % TREND_WINDOW for k in range(TREND_WINDOW)]
+        return self.ring[..., order]
+
+    def snapshot(self):
+        """An independent copy of the state."""
+        copy = RollingFeatureState.__new__(RollingFeatureState)
+        copy.hour = self.hour
+        copy.latest = self.latest.copy()
+        copy.ring = self.ring.copy()
+        copy.last_abnormal = self.last_abnormal.copy()
+        return copy
+
+    def restore(self, snapshot):
+        """Return to a state captured with snapshot()."""
+        self.hour = snapshot.hour
+        np.copyto(self.latest, snapshot.latest)
+        np.copyto(self.ring, snapshot.ring)
+        np.copyto(self.last_abnormal, snapshot.last_abnormal)
+
+    def scores(self, stay_ids, admitted):
+        """RiskScores at self.hour for the stays selected by `admitted`."""
+        return _score(
+            stay_ids[admitted], self.hour,
+            self.latest[:, admitted], self.recent()[:, admitted],
+            self.last_abnormal[admitted],
+        )
+
+
+def abnormal_readings(f):
+    """True where any criterion is met by the values charted at that hour."""
+    return (sirs_count(f) + qsofa_count(f) + lab_flag_count(f)) > 0
+
+
+def score_window(stay_ids, window, first_hour=0):
+    """
+    Full recompute: score every stay from its whole history in one pass.
+    window has shape (features, stays, hours) and starts at first_hour
+    (negative for history carried over from earlier days).
+
+    This is the reference the rolling state must match exactly.
+    """
+    hour = first_hour + window.shape[-1] - 1
+    observed = ~np.isnan(window)
+
+    # Last observation: index of the last non-NaN hour (an unobserved feature
+    # picks the final, NaN, hour — so it stays NaN)
+    last_idx = window.shape[-1] - 1 - np.argmax(observed[..., ::-1], axis=-1)
+    latest = np.take_along_axis(window, last_idx[..., None], axis=-1)[..., 0]
+
+    # Trailing window, NaN-padded before its first hour like the rolling ring
+    pad = max(TREND_WINDOW - window.shape[-1], 0)
+    recent = np.pad(window[..., -TREND_WINDOW:], [(0, 0), (0, 0), (pad, 0)], constant_values=np.nan)
+
+    abnormal = abnormal_readings(dict(zip(FEATURES, window)))
+    last_abnormal = np.where(
+        abnormal.any(axis=-1), hour - np.argmax(abnormal[:, ::-1], axis=-1), NEVER,
+    )
+    return _score(stay_ids, hour, latest, recent, last_abnormal)
+
+
+def _score(stay_ids, hour, latest, recent, last_abnormal):
+    """
+    Criteria, trends and the 6-hour projection for every stay at once.
+
+    latest (features, stays); recent (features, stays, TREND_WINDOW) holding
+    hours hour-TREND_WINDOW+1 .. hour; last_abnormal (stays,).
+    """
+    recent_observed = ~np.isnan(recent)
+
+    # Least-squares slope over the observed hours of the trailing window
+    t = np.arange(hour - TREND_WINDOW + 1, hour + 1, dtype=float)
+    count = recent_observed.sum(axis=-1)
+    safe_count = np.maximum(count, 1)
+    t_mean = (recent_observed * t).sum(axis=-1) / safe_count
+    y = np.where(recent_observed, recent, 0.0)
+    y_mean = y.sum(axis=-1) / safe_count
+    dt = np.where(recent_observed, t - t_mean[..., None], 0.0)
+    covariance = (dt * (y - y_mean[..., None])).sum(axis=-1)
+    variance = (dt * dt).sum(axis=-1)
+    slope = np.divide(
+        covariance, variance,
+        out=np.zeros_like(covariance), where=(count >= 2) & (variance > 0),
+    )
+
+    # Rolling mean of the last ROLLING_WINDOW hours (NaN if none charted)
+    rolling_observed = recent_observed[..., -ROLLING_WINDOW:]
+    rolling_count = rolling_observed.sum(axis=-1)
+    rolling_sum = np.where(rolling_observed, recent[..., -ROLLING_WINDOW:], 0.0).sum(axis=-1)
+    rolling_mean = np.divide(
+        rolling_sum, rolling_count,
+        out=np.full_like(rolling_sum, np.nan), where=rolling_count > 0,
+    )
+
+    projected = latest + slope * PREDICTION_HORIZON
+
+    current = dict(zip(FEATURES, latest))
+    ahead = dict(zip(FEATURES, projected))
+    sirs = sirs_count(current)
+    qsofa = qsofa_count(current)
+    lab_flags = lab_flag_count(current)
+
+    high = (qsofa >= 2) | ((sirs >= 2) & (lab_flags >= 1))
+    alert_6h = ~high & (
+        (qsofa_count(ahead) >= 2) | ((sirs_count(ahead) >= 2) & (sirs < 2))
+    )
+    level = np.select([high, alert_6h], [2, 1], default=0)
+
+    return RiskScores(
+        stay_ids=stay_ids,
+        sirs=sirs,
+        qsofa=qsofa,
+        lab_flags=lab_flags,
+        alert_6h=alert_6h,
+        level=level,
+        hours_since_abnormal=np.where(last_abnormal != NEVER, hour - last_abnormal, -1),
+        trends={name: slope[FEATURES.index(name)] for name in TREND_FEATURES},
+        rolling_means={name: rolling_mean[FEATURES.index(name)] for name in TREND_FEATURES},
+    )
+
+
+class RiskScores:
+    """Per-stay scores at one hour, as parallel arrays."""
+
+    def __init__(self, stay_ids, sirs, qsofa, lab_flags, alert_6h, level,
+                 hours_since_abnormal, trends, rolling_means):
+        self.stay_ids = stay_ids
+        self.sirs = sirs
+        self.qsofa = qsofa
+        self.lab_flags = lab_flags
+        self.alert_6h = alert_6h
+        self.level = level
+        self.hours_since_abnormal = hours_since_abnormal
+        self.trends = trends
+        self.rolling_means = rolling_means
+
+    def __len__(self):
+        return len(self.stay_ids)
+
+    @property
+    def score(self):
+        """Total criteria met (0-8)."""
+        return self.sirs + self.qsofa + self.lab_flags
+
+    def summary(self):
+        """Stay counts per risk level."""
+        counts = np.bincount(self.level, minlength=len(RISK_LEVELS))
+        return {name: int(n) for name, n in zip(RISK_LEVELS, counts)}
+
+    def as_columns(self):
+        """JSON-ready columnar form, one list per key."""
+        return {
+            'stay_id': self.stay_ids.tolist(),
+            'score': self.score.tolist(),
+            'sirs': self.sirs.tolist(),
+            'qsofa': self.qsofa.tolist(),
+            'lab_flags': self.lab_flags.tolist(),
+            'alert_6h': self.alert_6h.tolist(),
+            'level': [RISK_LEVELS[level] for level in self.level.tolist()],
+            'hours_since_abnormal': self.hours_since_abnormal.tolist(),
+            'trends': {name: _rounded(values) for name, values in self.trends.items()},
+            'rolling_means': {name: _rounded(values) for name, values in self.rolling_means.items()},
+        }
+
+    def by_stay(self):
+        """{stay_id: {score, sirs, qsofa, ..., hours_since_abnormal}} for templates."""
+        columns = self.as_columns()
+        keys = ('score', 'sirs', 'qsofa', 'lab_flags', 'alert_6h', 'level', 'hours_since_abnormal')
+        return {
+            stay_id: {key: columns[key][i] for key in keys}
+            for i, stay_id in enumerate(columns['stay_id'])
+        }
+
+
+def _rounded(values):
+    """Floats rounded for the wire, NaN as None (JSON has no NaN)."""
+    return [None if math.isnan(value) else value for value in np.round(values, 3).tolist()]
+
+
+# =============================================================================
+# Shared cubes, one per day store
+# =============================================================================
+_cube_lock = threading.Lock()
+
+
+def get_feature_cube(store, previous=None):
+    """
+    The feature cube for a day store, built on first use. It lives on the
+    store, so reload_day_store() discards it along with the store.
+
+    previous, for a day after the first of a timeline, returns the previous
+    day's cube; it is called only if the store has carried-over stays.
+    """
+    cube = store.feature_cube
+    if cube is None:
+        # Outside the lock: the previous cube may have to be built first
+        seed_cube = previous() if previous is not None and store.carried_over else None
+        with _cube_lock:
+            cube = store.feature_cube
+            if cube is None:
+                cube = store.feature_cube = FeatureCube.load(store, seed_cube)
+    return cube
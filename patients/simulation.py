@@ -0,0 +1,376 @@
+"""
+Simulation sessions - one clock per session, in a store shared by every
+worker process.
+
+Each session has its own clock, cohort and timeline: a start date, a span
+of days and the step the clock moves by. current_hour counts hours from
+midnight of the start date (-1 = not started, last = span_days * 24 - 1).
+State lives in a shared backend instead of module memory, so gunicorn can run several workers
+and many trainees can run independent simulations at once. Every advance is
+an atomic compare-and-set on the session's version: two requests racing to
+advance the same session can never skip or repeat a step. A seek moves
+the clock to any hour of the timeline, back or forth, the same way.
+
+Backends (settings.SIMULATION_SESSION_BACKEND):
+    patients.simulation.DatabaseSessionBackend  (default) - SimulationSession table
+    patients.simulation.FileSessionBackend      - JSON files + fcntl locks in
+                                                  settings.SIMULATION_SESSION_DIR,
+                                                  for single-host setups
+
+Every request without a session cookie starts a session, so each one records
+when it was last used (at most once per TOUCH_SECONDS per process, besides
+every advance), and `manage.py prunesimulations` deletes those idle for
+longer than SIMULATION_SESSION_TTL_DAYS.
+"""
+
+import datetime
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .cohort_engine import DEFAULT_COHORT
+from .models import SimulationSession
+from .prepared import prepared
+from .timewindow import DEFAULT_SIM_DATE
+
+
+HOURS_PER_DAY = 24
+
+# Longest timeline a session may replay, and the largest clock step
+MAX_SPAN_DAYS = 14
+MAX_STEP_HOURS = 24
+
+# Retries when another worker advanced the same session between read and write
+MAX_ADVANCE_ATTEMPTS = 5
+
+# Session keys: new_key()'s hex digits
+KEY_LENGTH = 16
+
+# A session read by requests is marked used at most this often per process
+TOUCH_SECONDS = 300
+
+
+class SimulationState(namedtuple(
+    'SimulationState',
+    ['key', 'cohort', 'sim_date', 'current_hour', 'version', 'span_days', 'step_hours'],
+)):
+    """One session's clock. sim_date is the first day of the timeline."""
+
+    __slots__ = ()
+
+    @property
+    def last_hour(self):
+        return self.span_days * HOURS_PER_DAY - 1
+
+    @property
+    def day_index(self):
+        """Day of the timeline the clock is on (0 before the first tick)."""
+        return max(self.current_hour, 0) // HOURS_PER_DAY
+
+    @property
+    def hour_of_day(self):
+        return self.current_hour % HOURS_PER_DAY if self.current_hour >= 0 else self.current_hour
+
+    @property
+    def sim_dates(self):
+        """Every day of the timeline, in order."""
+        return [self.sim_date + datetime.timedelta(days=day) for day in range(self.span_days)]
+
+
+class ClockConflict(Exception):
+    """The session kept changing under us; the advance was not applied."""
+
+
+class SessionNotFound(LookupError):
+    """The session does not exist (it was never created, or was pruned)."""
+
+
+def valid_key(key):
+    """True if key has the shape of a session key (safe as a file name)."""
+    return isinstance(key, str) and len(key) == KEY_LENGTH and key.isalnum()
+
+
+class SessionBackend:
+    """Interface every session backend implements."""
+
+    def create(self, cohort=DEFAULT_COHORT, sim_date=DEFAULT_SIM_DATE, span_days=1, step_hours=1):
+        raise NotImplementedError
+
+    def get(self, key):
+        """Return the SimulationState for key, or None."""
+        raise NotImplementedError
+
+    def touch(self, key):
+        """Record that the session was just used."""
+        raise NotImplementedError
+
+    def prune(self, idle_for):
+        """Delete the sessions unused for longer than the timedelta idle_for; return how many."""
+        raise NotImplementedError
+
+    def compare_and_set(self, state, current_hour):
+        """
+        Set the clock of state's session to current_hour only if the stored
+        version still equals state.version. Returns the state written, or
+        None if it had changed.
+        """
+        raise NotImplementedError
+
+    def advance(self, key, hours=None):
+        """
+        Move the clock forward by hours (default: the session's step, cut
+        short at the end of the timeline), retrying on concurrent advances.
+        Returns (previous_state, new_state); new_state is None if the clock
+        is already at the last hour. Raises SessionNotFound if the
+        session does not exist.
+        """
+        for _ in range(MAX_ADVANCE_ATTEMPTS):
+            state = self._require(key)
+            if state.current_hour >= state.last_hour:
+                return state, None
+            target = min(state.current_hour + (hours or state.step_hours), state.last_hour)
+            new_state = self.compare_and_set(state, target)
+            if new_state is not None:
+                return state, new_state
+        raise ClockConflict(key)
+
+    def seek(self, key, hour):
+        """
+        Move the clock to any hour from -1 (not started) to the last hour,
+        retrying on concurrent changes. Returns (previous_state, new_state);
+        new_state is previous_state when the clock is already there.
+        Raises SessionNotFound if the session does not exist.
+        """
+        for _ in range(MAX_ADVANCE_ATTEMPTS):
+            state = self._require(key)
+            if not -1 <= hour <= state.last_hour:
+                raise ValueError(f'hour must be between -1 and {state.last_hour}')
+            if hour == state.current_hour:
+                return state, state
+            new_state = self.compare_and_set(state, hour)
+            if new_state is not None:
+                return state, new_state
+        raise ClockConflict(key)
+
+    def _require(self, key):
+        state = self.get(key)
+        if state is None:
+            raise SessionNotFound(key)
+        return state
+
+    @staticmethod
+    def new_key():
+        return uuid.uuid4().hex[:KEY_LENGTH]
+
+
+class DatabaseSessionBackend(SessionBackend):
+    """Sessions in the SimulationSession table; CAS via UPDATE ... WHERE version."""
+
+    @staticmethod
+    def _state(row):
+        return SimulationState(
+            row.key, row.cohort, row.sim_date, row.current_hour, row.version,
+            row.span_days, row.step_hours,
+        )
+
+    def create(self, cohort=DEFAULT_COHORT, sim_date=DEFAULT_SIM_DATE, span_days=1, step_hours=1):
+        row = SimulationSession.objects.create(
+            key=self.new_key(), cohort=cohort, sim_date=sim_date,
+            span_days=span_days, step_hours=step_hours,
+        )
+        return self._state(row)
+
+    def get(self, key):
+        with prepared():
+            row = SimulationSession.objects.filter(key=key).first()
+        return self._state(row) if row else None
+
+    def touch(self, key):
+        SimulationSession.objects.filter(key=key).update(last_used=timezone.now())
+
+    def prune(self, idle_for):
+        deleted, _ = SimulationSession.objects.filter(last_used__lt=timezone.now() - idle_for).delete()
+        return deleted
+
+    def compare_and_set(self, state, current_hour):
+        with prepared():
+            updated = SimulationSession.objects.filter(key=state.key, version=state.version).update(
+                current_hour=current_hour,
+                version=F('version') + 1,
+                last_used=timezone.now(),
+            )
+        # Only the clock and the version change after create(); reading the
+        # row back could see a later writer's state instead of this one
+        return state._replace(current_hour=current_hour, version=state.version + 1) if updated else None
+
+
+class FileSessionBackend(SessionBackend):
+    """
+    One JSON file per session. Writes happen under an exclusive fcntl lock on
+    a sibling .lock file, so every process on the host sees atomic advances.
+    A session was last used at its file's modification time.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or settings.SIMULATION_SESSION_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        if not valid_key(key):
+            raise ValueError(f'Invalid simulation session key: {key!r}')
+        return os.path.join(self.directory, f'{key}.json')
+
+    @contextmanager
+    def _locked(self, key):
+        with open(self._path(key) + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, state):
+        path = self._path(state.key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'cohort': state.cohort,
+                'sim_date': state.sim_date.isoformat(),
+                'current_hour': state.current_hour,
+                'version': state.version,
+                'span_days': state.span_days,
+                'step_hours': state.step_hours,
+            }, f)
+        os.replace(tmp_path, path)
+
+    def create(self, cohort=DEFAULT_COHORT, sim_date=DEFAULT_SIM_DATE, span_days=1, step_hours=1):
+        state = SimulationState(self.new_key(), cohort, sim_date, -1, 0, span_days, step_hours)
+        with self._locked(state.key):
+            self._write(state)
+        return state
+
+    def get(self, key):
+        if not valid_key(key):
+            return None
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return SimulationState(
+            key, data['cohort'], datetime.date.fromisoformat(data['sim_date']),
+            data['current_hour'], data['version'],
+            data.get('span_days', 1), data.get('step_hours', 1),
+        )
+
+    def touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, idle_for):
+        cutoff = time.time() - idle_for.total_seconds()
+        deleted = 0
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            key = os.path.basename(path)[:-len('.json')]
+            if not valid_key(key):
+                continue
+            with self._locked(key):
+                try:
+                    if os.path.getmtime(path) >= cutoff:
+                        continue
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+            deleted += 1
+            try:
+                os.remove(self._path(key) + '.lock')
+            except FileNotFoundError:
+                pass
+        return deleted
+
+    def compare_and_set(self, state, current_hour):
+        with self._locked(state.key):
+            stored = self.get(state.key)
+            if stored is None or stored.version != state.version:
+                return None
+            stored = stored._replace(current_hour=current_hour, version=stored.version + 1)
+            self._write(stored)
+        return stored
+
+
+_backend = None
+
+
+def get_backend():
+    """The configured session backend (instantiated once per process)."""
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.SIMULATION_SESSION_BACKEND)()
+    return _backend
+
+
+# =============================================================================
+# Request binding
+# =============================================================================
+SESSION_PARAM = 'sim'                 # explicit ?sim=<key> (API clients, shared sims)
+SESSION_COOKIE_KEY = 'simulation_key'  # key stored in the browser's Django session
+
+# key -> time.monotonic() this process last touched the session
+_touched = {}
+_touched_lock = threading.Lock()
+
+
+def get_simulation(request):
+    """
+    Resolve the simulation for this request: an explicit ?sim=<key> (which
+    the browser then keeps, so a shared link joins that simulation), else
+    the one remembered in the browser's session, else a fresh one.
+    Malformed keys are ignored.
+    """
+    backend = get_backend()
+    key = request.GET.get(SESSION_PARAM) or request.POST.get(SESSION_PARAM)
+    if valid_key(key):
+        state = backend.get(key)
+        if state is not None:
+            request.session[SESSION_COOKIE_KEY] = state.key
+            _touch(backend, state.key)
+            return state
+
+    key = request.session.get(SESSION_COOKIE_KEY)
+    state = backend.get(key) if valid_key(key) else None
+    if state is None:
+        return start_simulation(request)
+    _touch(backend, state.key)
+    return state
+
+
+def _touch(backend, key):
+    now = time.monotonic()
+    with _touched_lock:
+        if now - _touched.get(key, -TOUCH_SECONDS) < TOUCH_SECONDS:
+            return
+        _touched[key] = now
+        # Forget keys not seen for a while, so this map stays small too
+        for stale in [k for k, at in _touched.items() if now - at >= TOUCH_SECONDS]:
+            del _touched[stale]
+    backend.touch(key)
+
+
+def start_simulation(request, cohort=DEFAULT_COHORT, sim_date=DEFAULT_SIM_DATE, span_days=1, step_hours=1):
+    """Create a new session and make it this browser's current simulation."""
+    state = get_backend().create(cohort=cohort, sim_date=sim_date, span_days=span_days, step_hours=step_hours)
+    request.session[SESSION_COOKIE_KEY] = state.key
+    return state
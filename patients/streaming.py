@@ -0,0 +1,256 @@
+"""
+Server-push streaming of simulation ticks (Server-Sent Events).
+
+The clock advances once, the tick payload is serialized once, and the same
+encoded bytes are fanned out to every connected dashboard, so 50 viewers cost
+about the same as one. Ticks come from the +1 button (advance_time) or from
+auto-play, which advances the clock on a fixed interval in one background
+thread.
+
+There is one broadcaster per simulation session. A tick applied by another
+worker process is picked up by polling the shared session store at most once
+per POLL_SECONDS per process, however many viewers are connected.
+
+Each stream ends after STREAM_SECONDS and the browser's EventSource
+reconnects to a fresh one, starting from the latest tick. Django does not
+stop a streaming response when its client goes away, so this bounds how
+long a closed dashboard keeps its subscriber and its poll of the store.
+
+The stream endpoint is an async view: serve the project through the ASGI
+entry point (e.g. `uvicorn config.asgi:application`) to use it.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+# Comment line sent when idle so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+# How often a process checks the shared store for ticks from other workers
+POLL_SECONDS = 1.0
+
+# Lifetime of one stream; the client reconnects after it
+STREAM_SECONDS = 300
+
+# Ticks buffered per viewer; a slow viewer drops its oldest ticks
+SUBSCRIBER_QUEUE_SIZE = 32
+
+# A broadcaster without viewers or auto-play is dropped after this long
+# unused, and idle ones are looked for at most this often
+BROADCASTER_IDLE_SECONDS = 600
+BROADCASTER_SWEEP_SECONDS = 60
+
+
+def encode_event(event, payload, data=None):
+    """Encode one SSE frame (data: the payload's JSON, if already encoded)."""
+    if data is None:
+        data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'event: {event}\ndata: {data}\n\n'.encode()
+
+
+class TickBroadcaster:
+    """
+    Fans out encoded tick events to every subscribed stream.
+
+    publish() may be called from any thread (sync views, the auto-play
+    thread); delivery is handed to each subscriber's own event loop.
+    """
+
+    def __init__(self, key=None):
+        self.key = key
+        self._subscribers = set()  # (loop, asyncio.Queue) pairs
+        self._lock = threading.Lock()
+        self._last_event = None
+        self._last_poll = 0.0
+        self.last_hour = None      # hour of the last tick published here
+        self.last_version = None   # session version of that tick
+        self.last_used = time.monotonic()  # last get_broadcaster() for it
+
+        self._autoplay_thread = None
+        self._autoplay_stop = None
+        self.autoplay_interval = None
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    # -------------------------------------------------------------------------
+    # Publishing
+    # -------------------------------------------------------------------------
+
+    def publish(self, payload, event='tick', data=None):
+        """
+        Serialize the payload once and queue it for every viewer. A tick
+        of a session version not newer than the last one published is
+        dropped, so a tick seen both locally and through the shared-store
+        poll goes out once. Versions, unlike hours, keep increasing when a
+        seek moves the clock back.
+        """
+        frame = encode_event(event, payload, data)
+        with self._lock:
+            if event == 'tick':
+                version = payload.get('version')
+                if self.last_version is not None and version <= self.last_version:
+                    return
+                self._last_event = frame
+                self.last_hour = payload.get('current_hour')
+                self.last_version = version
+            subscribers = list(self._subscribers)
+
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, frame)
+            except RuntimeError:
+                # Loop already closed — the stream is gone
+                self._discard(loop, queue)
+
+    @staticmethod
+    def _offer(queue, frame):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(frame)
+
+    def _discard(self, loop, queue):
+        with self._lock:
+            self._subscribers.discard((loop, queue))
+
+    # -------------------------------------------------------------------------
+    # Streaming
+    # -------------------------------------------------------------------------
+
+    async def stream(self, refresh=None, lifetime=STREAM_SECONDS):
+        """
+        Async iterator of SSE frames for one viewer. Starts with the latest
+        tick so a freshly opened dashboard is immediately in sync, and ends
+        after `lifetime` seconds (the client then reconnects).
+
+        refresh(broadcaster), if given, is a sync callable that publishes any
+        tick this process has missed; it runs at most every POLL_SECONDS.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lifetime
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add((loop, queue))
+            last_event = self._last_event
+
+        try:
+            yield b'retry: 3000\n\n'
+            if last_event is not None:
+                yield last_event
+            idle = 0.0
+            while loop.time() < deadline:
+                try:
+                    yield await asyncio.wait_for(queue.get(), min(POLL_SECONDS, deadline - loop.time()))
+                    idle = 0.0
+                except asyncio.TimeoutError:
+                    if refresh is not None:
+                        await sync_to_async(self._poll)(refresh)
+                    idle += POLL_SECONDS
+                    if idle >= HEARTBEAT_SECONDS:
+                        idle = 0.0
+                        yield b': heartbeat\n\n'
+        finally:
+            self._discard(loop, queue)
+
+    def _poll(self, refresh):
+        """Run refresh() unless another viewer in this process just did."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_poll < POLL_SECONDS:
+                return
+            self._last_poll = now
+        try:
+            refresh(self)
+        finally:
+            close_old_connections()
+
+    # -------------------------------------------------------------------------
+    # Auto-play
+    # -------------------------------------------------------------------------
+
+    def start_autoplay(self, interval, advance):
+        """
+        Advance the clock every `interval` seconds by calling advance(),
+        which must return (payload, status). Stops on the first non-200 tick
+        (e.g. the end of the simulated day).
+        """
+        self.stop_autoplay()
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._autoplay_loop, args=(interval, advance, stop),
+            name='simulation-autoplay', daemon=True,
+        )
+        self._autoplay_stop = stop
+        self._autoplay_thread = thread
+        self.autoplay_interval = interval
+        thread.start()
+
+    def stop_autoplay(self):
+        if self._autoplay_stop is not None:
+            self._autoplay_stop.set()
+        self._autoplay_thread = None
+        self._autoplay_stop = None
+        self.autoplay_interval = None
+
+    @property
+    def autoplaying(self):
+        return self._autoplay_thread is not None
+
+    def _autoplay_loop(self, interval, advance, stop):
+        try:
+            while not stop.wait(interval):
+                close_old_connections()
+                try:
+                    status = advance()[1]
+                except Exception:
+                    logger.exception('Auto-play tick failed')
+                    break
+                if status != 200:
+                    break
+        finally:
+            close_old_connections()
+            if self._autoplay_stop is stop:
+                self.stop_autoplay()
+                self.publish({'autoplay': False}, event='autoplay')
+
+
+_broadcasters = {}
+_broadcasters_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+def get_broadcaster(key):
+    """
+    The broadcaster for one simulation session in this process. Idle ones
+    (no viewers, no auto-play, unused for BROADCASTER_IDLE_SECONDS) are
+    dropped, so sessions started by one-off requests do not pile up; a
+    later request for the session gets a fresh broadcaster.
+    """
+    global _last_sweep
+    now = time.monotonic()
+    with _broadcasters_lock:
+        if now - _last_sweep >= BROADCASTER_SWEEP_SECONDS:
+            _last_sweep = now
+            for idle_key in [
+                other for other, broadcaster in _broadcasters.items()
+                if not broadcaster.viewers and not broadcaster.autoplaying
+                and now - broadcaster.last_used >= BROADCASTER_IDLE_SECONDS
+            ]:
+                del _broadcasters[idle_key]
+        broadcaster = _broadcasters.get(key)
+        if broadcaster is None:
+            broadcaster = _broadcasters[key] = TickBroadcaster(key)
+        broadcaster.last_used = now
+    return broadcaster
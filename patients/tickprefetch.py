@@ -0,0 +1,128 @@
+"""
+Speculative building of each session's next tick.
+
+A session's next tick is known as soon as its clock moves: the same cohort
+and timeline, one step further. Right after every advance (and seek, and
+new session) the payload of that next tick — admissions, discharges,
+vitals, labs, procedures and risk scores — is built and JSON-encoded on a
+background thread and kept under (session key, hour), so the click that
+asks for it is answered from memory:
+
+    advance to h     serve the payload prefetched for h (or build it),
+                     then start building h + step
+    seek to h        drop the session's prefetched ticks, start building
+                     h + step
+    reload_data      drop every prefetched tick
+
+A prefetched tick is served only if the clock moved from the exact state
+it was built from (same version): if another worker advanced or seeked the
+session meanwhile, the tick is built in the request as before. At most
+TICK_PREFETCH_SIZE ticks are kept, oldest out first; 0 turns prefetching
+off.
+"""
+
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+# Ticks built at the same time, across every session of the process
+PREFETCH_WORKERS = 2
+
+_Prefetched = namedtuple('_Prefetched', ['base_version', 'generation', 'future'])
+
+
+class TickPrefetcher:
+    """Next-tick payloads per (session key, hour), built ahead of the click."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='tick-prefetch')
+        return self._executor
+
+    def schedule(self, sim, build):
+        """
+        Start building the tick that follows sim, as build(next_state,
+        since_hour) on a background thread. Does nothing at the end of the
+        timeline, or if that tick is already being built from sim.
+        """
+        if self.maxsize <= 0 or sim.current_hour >= sim.last_hour:
+            return
+        next_state = sim._replace(
+            current_hour=min(sim.current_hour + sim.step_hours, sim.last_hour),
+            version=sim.version + 1,
+        )
+        key = (sim.key, next_state.current_hour)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.base_version == sim.version and entry.generation == self._generation:
+                return
+            future = self._get_executor().submit(self._build, build, next_state, sim.current_hour)
+            self._entries[key] = _Prefetched(sim.version, self._generation, future)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                _, evicted = self._entries.popitem(last=False)
+                evicted.future.cancel()
+
+    def take(self, previous, sim):
+        """
+        What build returned for the tick that moved the clock from previous
+        to sim, or None to build it here: none was prefetched, it
+        was built from another state, it failed, or it has not started yet
+        (building it here is then no slower than waiting).
+        """
+        with self._lock:
+            entry = self._entries.pop((sim.key, sim.current_hour), None)
+            generation = self._generation
+        if entry is None or entry.base_version != previous.version or entry.generation != generation:
+            return None
+        if entry.future.cancel():
+            return None
+        try:
+            return entry.future.result()
+        except Exception:
+            return None
+
+    def discard(self, key):
+        """Drop every prefetched tick of one session (its clock was moved elsewhere)."""
+        with self._lock:
+            for entry_key in [entry_key for entry_key in self._entries if entry_key[0] == key]:
+                self._entries.pop(entry_key).future.cancel()
+
+    def clear(self):
+        """Drop every prefetched tick, including those being built now."""
+        with self._lock:
+            self._generation += 1
+            for entry in self._entries.values():
+                entry.future.cancel()
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _build(build, next_state, since_hour):
+        close_old_connections()
+        try:
+            return build(next_state, since_hour)
+        except Exception:
+            logger.exception('Prefetching tick %s of session %s failed', next_state.current_hour, next_state.key)
+            raise
+        finally:
+            close_old_connections()
+
+
+tick_prefetcher = TickPrefetcher(settings.TICK_PREFETCH_SIZE)
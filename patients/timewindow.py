@@ -0,0 +1,190 @@
+"""
+Sargable time-window predicates for the simulated day (or days).
+
+MIMIC-IV dates are shifted per patient, so "March 13" falls in a different
+year for every stay. Filtering with charttime_hour__month / __day / __hour
+compiles to EXTRACT(... AT TIME ZONE ...) expressions that no index can
+serve. This module turns the simulated day and hour into:
+
+  * plain timestamp ranges per stay, anchored on each stay's own intime year,
+    which the (stay_id, charttime_hour) indexes answer with a range scan;
+  * calendar-day / calendar-hour expressions on intime that match the
+    expression index created in scripts/05_fisi9t_unique_patient_profile.sql.
+"""
+
+import datetime
+from collections import defaultdict
+
+from django.db.models import Func, IntegerField, Q
+
+
+# Timestamp columns of the profile and hourly rows
+TIMESTAMP_FIELDS = ('intime', 'outtime', 'charttime_hour', 'charttime')
+
+# Simulated date when a session does not pick one. Only month and day are
+# matched against the data; the year is what the dashboard displays.
+DEFAULT_SIM_DATE = datetime.date(2025, 3, 13)
+
+
+def calendar_day(sim_date):
+    """month * 100 + day, the value CalendarDay computes in SQL."""
+    return sim_date.month * 100 + sim_date.day
+
+
+class CalendarDay(Func):
+    """
+    month * 100 + day of a timestamp (e.g. 313 for March 13).
+
+    Written without AT TIME ZONE so it stays IMMUTABLE on a
+    timestamp-without-time-zone column and can use the expression index.
+    """
+    template = '((EXTRACT(MONTH FROM %(expressions)s) * 100 + EXTRACT(DAY FROM %(expressions)s))::integer)'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(strftime('%%%%m%%%%d', %(expressions)s) AS INTEGER)",
+            **extra_context
+        )
+
+
+class CalendarHour(Func):
+    """Hour of day of a timestamp, matching the profile expression index."""
+    template = '(EXTRACT(HOUR FROM %(expressions)s)::integer)'
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="CAST(strftime('%%%%H', %(expressions)s) AS INTEGER)",
+            **extra_context
+        )
+
+
+def admitted_on_sim_day(queryset, sim_date=DEFAULT_SIM_DATE):
+    """
+    Restrict a UniquePatientProfile queryset to stays admitted on the
+    simulated day (any year). The queryset gains `intime_day` and
+    `intime_hour` aliases, so callers can go on to filter e.g.
+    intime_hour__lte=h against the same index.
+    """
+    return queryset.alias(
+        intime_day=CalendarDay('intime'),
+        intime_hour=CalendarHour('intime'),
+    ).filter(intime_day=calendar_day(sim_date))
+
+
+def admitted_on_sim_days(queryset, sim_dates):
+    """
+    The same restriction for several simulated days at once (a multi-day
+    timeline): one intime_day IN (...) against the same expression index.
+    """
+    return queryset.alias(
+        intime_day=CalendarDay('intime'),
+        intime_hour=CalendarHour('intime'),
+    ).filter(intime_day__in=[calendar_day(sim_date) for sim_date in sim_dates])
+
+
+def timeline_day(intime, sim_dates):
+    """
+    Index of the simulated day a stay was admitted on, matching intime's
+    month and day against sim_dates (any year), or None.
+    """
+    if intime is None:
+        return None
+    admitted = calendar_day(intime)
+    for index, sim_date in enumerate(sim_dates):
+        if calendar_day(sim_date) == admitted:
+            return index
+    return None
+
+
+def as_utc(moment):
+    """moment as an aware UTC datetime; a naive one is taken to be UTC."""
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc)
+
+
+def utc_rows(rows, fields):
+    """
+    Row tuples in `fields` order with their TIMESTAMP_FIELDS made aware
+    (see as_utc); rows already aware are returned as they are.
+    """
+    positions = [fields.index(name) for name in TIMESTAMP_FIELDS if name in fields]
+    converted = []
+    for row in rows:
+        if any(row[i] is not None and row[i].tzinfo is None for i in positions):
+            row = list(row)
+            for i in positions:
+                row[i] = as_utc(row[i])
+            row = tuple(row)
+        converted.append(row)
+    return converted
+
+
+def stay_frame(intime, day_index):
+    """
+    Midnight starting a stay's timeline in its own shifted year: the
+    timeline's first day, for a stay admitted on day day_index of it.
+    """
+    start = intime.date() - datetime.timedelta(days=day_index)
+    return datetime.datetime(start.year, start.month, start.day, tzinfo=datetime.timezone.utc)
+
+
+def hour_window(year, first_hour=0, last_hour=23, sim_date=DEFAULT_SIM_DATE):
+    """
+    [start, end) timestamps covering hours first_hour..last_hour of the
+    simulated day in the given anchor year.
+    """
+    day = datetime.datetime(year, sim_date.month, sim_date.day, tzinfo=datetime.timezone.utc)
+    return (
+        day + datetime.timedelta(hours=first_hour),
+        day + datetime.timedelta(hours=last_hour + 1),
+    )
+
+
+def stays_by_year(stays):
+    """Group (stay_id, intime) pairs into {anchor_year: [stay_id, ...]}."""
+    grouped = defaultdict(list)
+    for stay_id, intime in stays:
+        grouped[intime.year].append(stay_id)
+    return dict(grouped)
+
+
+def window_q(stay_years, first_hour=0, last_hour=23, field='charttime_hour', sim_date=DEFAULT_SIM_DATE):
+    """
+    Q selecting rows of the given stays whose `field` falls within hours
+    first_hour..last_hour of the simulated day. stay_years is the output of
+    stays_by_year(); one stay_id IN (...) + range term is emitted per anchor
+    year, so the predicate grows with the number of distinct years only.
+    """
+    return frames_q(
+        {
+            datetime.datetime(year, sim_date.month, sim_date.day, tzinfo=datetime.timezone.utc): stay_ids
+            for year, stay_ids in stay_years.items()
+        },
+        first_hour, last_hour, field,
+    )
+
+
+def frames_q(stay_frames, first_hour=0, last_hour=23, field='charttime_hour'):
+    """
+    Like window_q, with the stays grouped by the midnight their hour 0
+    falls on ({midnight: [stay_id, ...]}); last_hour may run past 23 into
+    the following days of a multi-day timeline.
+    """
+    condition = Q()
+    for midnight, stay_ids in sorted(stay_frames.items()):
+        condition |= Q(**{
+            'stay_id__in': stay_ids,
+            f'{field}__gte': midnight + datetime.timedelta(hours=first_hour),
+            f'{field}__lt': midnight + datetime.timedelta(hours=last_hour + 1),
+        })
+    if not condition:
+        # No stays: match nothing rather than everything
+        return Q(pk__in=[])
+    return condition
@@ -10,5 +10,12 @@ app_name = 'patients'
 urlpatterns = [
     path('', views.patient_list, name='index'),
     path('advance-time/', views.advance_time, name='advance_time'),
+    path('seek/', views.seek_time, name='seek_time'),
+    path('stream/', views.tick_stream, name='tick_stream'),
+    path('autoplay/', views.autoplay, name='autoplay'),
+    path('api/v1/delta/', views.tick_delta, name='tick_delta'),
+    path('api/v1/export/', views.bulk_export, name='bulk_export'),
+    path('simulations/new/', views.new_simulation, name='new_simulation'),
+    path('reload-data/', views.reload_data, name='reload_data'),
     path('<int:subject_id>/<int:stay_id>/<int:hadm_id>/', views.patient_detail, name='detail'),
 ]
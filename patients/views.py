@@ -2,76 +2,306 @@
 Patient views - handles patient list, detail pages, and simulation clock API.
 """
 
+import datetime
 import json
+from types import SimpleNamespace
 
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
+from django.template.loader import render_to_string
 from django.core.serializers.json import DjangoJSONEncoder
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
 from django.db.models import Q
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
 
-from .models import UniquePatientProfile, VitalsignHourly, ProcedureeventsHourly
+from .models import UniquePatientProfile
 from .cohort import get_cohort_filter
+from .cohort_engine import DEFAULT_COHORT, check_cohort_name, cohort_patients, get_cohort_predicate
+from .columnar import columnar_enabled, get_columnar_source
+from .daystore import (
+    HOURS_PER_DAY, LAB_FIELDS, PATIENT_FIELDS, VITALSIGN_FIELDS,
+    PROCEDURE_FIELDS, get_census_index, get_day_store, load_day_rows, prefetch_day_store,
+    reload_day_store,
+)
+from .delta import DELTA_PROTOCOL_VERSION, build_delta
+from .detailcache import detail_cache
+from .export import EXPORT_FORMATS, aiter_chunks, encode_chunks, export_rows
+from .instrumentation import recording_queries, timed
+from .pagination import KeysetPage, page_request, page_sorted
+from .prepared import prepared
+from .querypool import request_executor
+from .scoring import get_feature_cube
+from .simulation import (
+    MAX_SPAN_DAYS, MAX_STEP_HOURS, SessionNotFound, get_backend, get_simulation, start_simulation,
+)
+from .streaming import get_broadcaster
+from .tickprefetch import tick_prefetcher
+from .timewindow import DEFAULT_SIM_DATE, frames_q, stay_frame, timeline_day
+from .wire import encode_json, wire_response
 
 
 # =============================================================================
-# In-memory simulation state — resets when the server restarts
+# Simulation state lives in the shared session store (see simulation.py)
 # =============================================================================
-_simulation = {
-    'current_hour': -1,  # -1 = not started yet (ICU is empty)
-}
+
+# Fastest auto-play tick accepted from clients, in seconds
+MIN_TICK_INTERVAL = 0.5
+
+# The next day's store starts loading this many hours (or one step, if
+# longer) before midnight, so the tick crossing it is served from memory
+PREFETCH_LEAD_HOURS = 4
+
+# Columns of the detail page's vitals chart, lab table and procedure log
+CHART_VITALSIGN_FIELDS = (
+    'charttime_hour',
+    'heart_rate', 'sbp', 'dbp', 'mbp',
+    'resp_rate', 'temperature', 'spo2', 'glucose',
+)
+LAB_TABLE_FIELDS = LAB_FIELDS[2:]
+PROCEDURE_LOG_FIELDS = (
+    'charttime_hour', 'charttime',
+    'item_label', 'value', 'valueuom',
+    'ordercategoryname', 'statusdescription',
+)
 
 
 # =============================================================================
 # Helper functions
 # =============================================================================
 
-def _display_time(current_hour):
+def _display_time(current_hour, sim_date=DEFAULT_SIM_DATE):
     """
     Frontend display time — offset by +1 so the first click shows 01:00
     instead of staying at 00:00.  The backend data queries still use
     current_hour directly (0, 1, 2, …).
     """
-    display_hour = current_hour + 1
-    if display_hour <= 0:
-        return "March 13, 2025 00:00"
-    elif display_hour >= 24:
-        return "March 14, 2025 00:00"
+    display_hour = max(current_hour + 1, 0)
+    sim_date += datetime.timedelta(days=display_hour // HOURS_PER_DAY)
+    display_hour %= HOURS_PER_DAY
+    return f"{sim_date:%B} {sim_date.day}, {sim_date.year} {display_hour:02d}:00"
+
+
+def _hour_label(hour):
+    """Chart / log label of a timeline hour: "05:00", then "Day 2 05:00"."""
+    day, hour = divmod(hour, HOURS_PER_DAY)
+    return f"Day {day + 1} {hour:02d}:00" if day else f"{hour:02d}:00"
+
+
+def _get_cohort_patients(sim=None):
+    """
+    Get the base queryset of cohort patients admitted on any day of the
+    session's timeline (any year); see cohort_engine.cohort_patients.
+    """
+    if sim is None:
+        return cohort_patients()
+    return cohort_patients(sim.cohort, sim.sim_dates)
+
+
+def _get_census(sim):
+    """The census index of the session's cohort and timeline (see census.py)."""
+    cohort_patients = None if columnar_enabled() else _get_cohort_patients(sim)
+    return get_census_index(cohort_patients, sim.sim_date, sim.cohort, sim.span_days)
+
+
+def _get_day_store(sim, day_index=None):
+    """
+    The shared in-memory store for the session's cohort and current day of
+    its timeline (or day_index). With a columnar export configured the store
+    reads local files, not the ORM.
+    """
+    if day_index is None:
+        day_index = sim.day_index
+    cohort_patients = None if columnar_enabled() else _get_cohort_patients(sim)
+    return get_day_store(cohort_patients, sim.sim_date, sim.cohort, day_index, sim.span_days)
+
+
+def _prefetch_next_day(sim):
+    """Start loading the timeline's next day in the background when midnight is near."""
+    day_index = sim.day_index + 1
+    if day_index >= sim.span_days or columnar_enabled():
+        return
+    if sim.hour_of_day + max(PREFETCH_LEAD_HOURS, sim.step_hours) >= HOURS_PER_DAY:
+        prefetch_day_store(_get_cohort_patients(sim), sim.sim_date, sim.cohort, day_index, sim.span_days)
+
+
+def _get_feature_cube(sim, store=None, day_index=None):
+    """
+    The feature cube of the session's current day (or day_index), its
+    rolling state carried over from the day before (see scoring.py).
+    """
+    if day_index is None:
+        day_index = sim.day_index
+    store = store or _get_day_store(sim, day_index)
+    previous = (lambda: _get_feature_cube(sim, day_index=day_index - 1)) if day_index else None
+    return get_feature_cube(store, previous)
+
+
+def _get_risk_scores(sim, store=None):
+    """Risk scores of every stay in the ICU at the session's hour (see scoring.py)."""
+    return _get_feature_cube(sim, store).scores_at(sim.hour_of_day)
+
+
+def _advance_clock(key):
+    """
+    Advance a session's clock by one step and build the tick payload.
+    Shared by the +1 button and auto-play; every tick is also published to
+    the session's streams. Returns (payload, http_status, payload JSON).
+    """
+    # --- Advance the clock (atomic compare-and-set in the shared store) ---
+    previous, sim = get_backend().advance(key)
+    if sim is None:
+        return {
+            'error': 'Cannot advance past the end of the simulated timeline',
+            'current_hour': previous.current_hour,
+            'current_time': _display_time(previous.current_hour, previous.sim_date),
+        }, 400, None
+
+    # --- The tick was most likely built in the background after the last one ---
+    prefetched = tick_prefetcher.take(previous, sim)
+    if prefetched is not None:
+        payload, data = prefetched
     else:
-        return f"March 13, 2025 {display_hour:02d}:00"
+        payload = _tick_payload(sim, since_hour=previous.current_hour)
+        with timed('serialize'):
+            data = encode_json(payload)
+    get_broadcaster(key).publish(payload, data=data)
+    tick_prefetcher.schedule(sim, _prefetch_tick)
+    return payload, 200, data
 
 
-def _get_cohort_patients():
+def _prefetch_tick(sim, since_hour):
+    """A tick's payload and its JSON, encoded once for the response and the streams."""
+    payload = _tick_payload(sim, since_hour=since_hour)
+    return payload, encode_json(payload)
+
+
+def _tick_payload(sim, since_hour=None):
     """
-    Get the base queryset of cohort patients admitted on March 13 (any year).
+    Tick payload for the session's current hour, answered from memory.
+    Admissions, discharges, labs and procedures cover every hour after
+    since_hour (default: one step back), which may reach into the previous
+    day's store; vitals and risk are the current hour's.
     """
-    patients = UniquePatientProfile.objects.all()
+    current_hour = sim.current_hour
+    if since_hour is None:
+        since_hour = current_hour - sim.step_hours
+    since_hour = max(since_hour, -1)
 
-    cohort = get_cohort_filter()
-    if cohort:
-        if cohort['type'] == 'subject_ids':
-            patients = patients.filter(subject_id__in=cohort['values'])
-        elif cohort['type'] == 'tuples':
-            conditions = Q()
-            for subject_id, stay_id, hadm_id in cohort['values']:
-                conditions |= Q(subject_id=subject_id, stay_id=stay_id, hadm_id=hadm_id)
-            patients = patients.filter(conditions)
+    # --- Each simulated day is loaded once, on its first tick ---
+    store = _get_day_store(sim)
+    census = _get_census(sim)
 
-    # Only patients admitted on March 13 (ignore year)
-    patients = patients.filter(intime__month=3, intime__day=13)
-    return patients
+    # Admissions and discharges of the step: two bisections in the census index
+    new_patients_data = _profiles(census, census.admitted(since_hour + 1, current_hour))
+    discharged_data = _profiles(census, census.discharged(since_hour + 1, current_hour))
 
+    labs_data = []
+    procedures_data = []
+    for hour in range(since_hour + 1, current_hour + 1):
+        day_index, hour_of_day = divmod(hour, HOURS_PER_DAY)
+        day_store = store if day_index == sim.day_index else _get_day_store(sim, day_index)
+        labs_data += day_store.labs_at(hour_of_day)
+        procedures_data += day_store.procedureevents_at(hour_of_day)
+    vitalsigns_data = store.vitalsigns_at(sim.hour_of_day)
+    risk = _get_risk_scores(sim, store)
+    _prefetch_next_day(sim)
+
+    return {
+        'current_hour': current_hour,
+        'current_time': _display_time(current_hour, sim.sim_date),
+        'version': sim.version,
+        'new_patients': new_patients_data,
+        'new_patients_count': len(new_patients_data),
+        'discharged': discharged_data,
+        'discharged_count': len(discharged_data),
+        'total_admitted': store.total_admitted(sim.hour_of_day),
+        'census': census.census(current_hour),
+        'vitalsigns': vitalsigns_data,
+        'vitalsigns_count': len(vitalsigns_data),
+        'labs': labs_data,
+        'labs_count': len(labs_data),
+        'procedureevents': procedures_data,
+        'procedureevents_count': len(procedures_data),
+        'risk': risk.as_columns(),
+        'risk_summary': risk.summary(),
+    }
 
-def _get_admitted_patients(current_hour):
+
+def _seek_payload(sim):
     """
-    Get patients whose admission hour is <= current_hour on March 13.
-    Returns an empty queryset if simulation hasn't started (hour < 0).
+    Payload of a seek to the session's hour, built without replaying the
+    hours before it: the counts come from the census index, the latest
+    vitals from the nearest checkpoint of the feature cube (see
+    scoring.py), and the events are the target hour's own.
     """
+    current_hour = sim.current_hour
+    counts = _get_census(sim).counts(current_hour)
     if current_hour < 0:
-        return UniquePatientProfile.objects.none()
+        return {
+            'current_hour': current_hour,
+            'current_time': _display_time(current_hour, sim.sim_date),
+            'version': sim.version,
+            'seek': True,
+            'admitted_so_far': 0,
+            'discharged_so_far': 0,
+            'census': 0,
+        }
+
+    payload = _tick_payload(sim, since_hour=current_hour - 1)
+    store = _get_day_store(sim)
+    payload.update({
+        'seek': True,
+        'admitted_so_far': counts['admitted'],
+        'discharged_so_far': counts['discharged'],
+        'latest_vitals': _get_feature_cube(sim, store).latest_at(sim.hour_of_day),
+    })
+    return payload
+
+
+def _profiles(census, stay_ids):
+    return [dict(zip(PATIENT_FIELDS, census.profiles[stay_id])) for stay_id in stay_ids]
+
+
+def _refresh_stream(broadcaster):
+    """
+    Publish the session's latest tick if its clock was moved by another
+    worker process since this process last published one: a tick covering
+    the hours since then when it moved forward, a seek payload otherwise.
+    """
+    sim = get_backend().get(broadcaster.key)
+    if sim is None:
+        return
+    if broadcaster.last_version is not None and sim.version <= broadcaster.last_version:
+        return
+    if broadcaster.last_hour is None:
+        if sim.current_hour >= 0:
+            broadcaster.publish(_tick_payload(sim))
+    elif sim.current_hour > broadcaster.last_hour:
+        broadcaster.publish(_tick_payload(sim, since_hour=broadcaster.last_hour))
+    else:
+        broadcaster.publish(_seek_payload(sim))
 
-    return _get_cohort_patients().filter(intime__hour__lte=current_hour)
+
+def _off_loop(body):
+    """
+    A sync view body as an awaitable for the async views. Django runs sync
+    code under ASGI on one shared thread, so concurrent ticks and detail
+    pages would queue behind each other; the body runs on a thread of the
+    request pool instead (see querypool.request_executor), releasing that
+    thread's connection as a request thread would and recording its
+    queries into the request's instrumentation.
+    """
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            with recording_queries():
+                return body(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False, executor=request_executor())
 
 
 # =============================================================================
@@ -83,173 +313,509 @@ def patient_list(request):
     Display a paginated list of patients currently admitted in the simulation.
     URL: /patients/
     """
-    current_hour = _simulation['current_hour']
-    patients = _get_admitted_patients(current_hour).order_by('subject_id')
+    sim = get_simulation(request)
+    current_hour = sim.current_hour
+    broadcaster = get_broadcaster(sim.key)
+    after, before, last = page_request(request.GET)
+
+    # Census and page from the day store (already loaded for the ticks), no query
+    page_obj = KeysetPage([], False, False)
+    total_patients = new_patients = 0
+    risk_summary = None
+    if current_hour >= 0:
+        store = _get_day_store(sim)
+        total_patients = store.census(sim.hour_of_day)
+        new_patients = store.admitted_at(sim.hour_of_day)
+
+        # One page, 25 patients, addressed by (subject_id, stay_id) keyset
+        page_obj = page_sorted(
+            store.census_keys(sim.hour_of_day),
+            lambda key: SimpleNamespace(**dict(zip(PATIENT_FIELDS, store.profiles[key[1]]))),
+            after, before, last,
+        )
 
-    # Pagination - 25 patients per page
-    paginator = Paginator(patients, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        # Attach each listed stay's risk score (one batched pass for the whole ICU)
+        risk = _get_risk_scores(sim, store)
+        risk_by_stay = risk.by_stay()
+        risk_summary = risk.summary()
+        for patient in page_obj:
+            patient.risk = risk_by_stay.get(patient.stay_id)
 
     context = {
         'page_obj': page_obj,
-        'total_patients': patients.count(),
-        'cohort_active': get_cohort_filter() is not None,
+        'total_patients': total_patients,
+        'new_patients': new_patients,
+        'cohort_active': sim.cohort != DEFAULT_COHORT or get_cohort_filter() is not None,
+        'risk_summary': risk_summary,
         'current_hour': current_hour,
-        'current_time_display': _display_time(current_hour),
+        'current_time_display': _display_time(current_hour, sim.sim_date),
+        'simulation': sim,
+        'max_span_days': MAX_SPAN_DAYS,
+        'max_step_hours': MAX_STEP_HOURS,
+        'autoplay': broadcaster.autoplaying,
+        'tick_interval': broadcaster.autoplay_interval or settings.SIMULATION_TICK_INTERVAL,
     }
-    return render(request, 'patients/index.html', context)
+    with timed('render'):
+        return render(request, 'patients/index.html', context)
 
 
-def patient_detail(request, subject_id, stay_id, hadm_id):
+async def patient_detail(request, subject_id, stay_id, hadm_id):
     """
     Display details for a specific patient stay, including vitalsign chart
     and procedure events log up to the current simulation hour.
 
+    The chart payload and the rendered log are the same for every viewer of
+    a stay at a given hour, so they come from the detail cache (see
+    detailcache.py) and are only built on a miss, with the vitals, labs and
+    procedure queries side by side (see daystore.load_day_rows).
+
     URL: /patients/<subject_id>/<stay_id>/<hadm_id>/
     """
-    patient = get_object_or_404(
-        UniquePatientProfile,
-        subject_id=subject_id,
-        stay_id=stay_id,
-        hadm_id=hadm_id
-    )
+    return await _off_loop(_patient_detail)(request, subject_id, stay_id, hadm_id)
 
-    current_hour = _simulation['current_hour']
-    vitalsigns_json = '[]'
-    procedures = []
 
-    if current_hour >= 0:
-        # --- Vitalsigns for Plotly chart ---
-        vitalsigns_qs = VitalsignHourly.objects.filter(
-            subject_id=subject_id,
-            stay_id=stay_id,
-            charttime_hour__month=3,
-            charttime_hour__day=13,
-            charttime_hour__hour__lte=current_hour,
-        ).order_by('charttime_hour')
-
-        vitalsigns_list = []
-        for row in vitalsigns_qs.values(
-            'charttime_hour',
-            'heart_rate', 'sbp', 'dbp', 'mbp',
-            'resp_rate', 'temperature', 'spo2', 'glucose',
-        ):
-            # Add a clean hour label for the Plotly x-axis
-            row['hour_label'] = f"{row['charttime_hour'].hour:02d}:00"
-            vitalsigns_list.append(row)
-
-        vitalsigns_json = json.dumps(vitalsigns_list, cls=DjangoJSONEncoder)
-
-        # --- Procedure events for the log ---
-        procedures = list(ProcedureeventsHourly.objects.filter(
-            subject_id=subject_id,
-            stay_id=stay_id,
-            charttime_hour__month=3,
-            charttime_hour__day=13,
-            charttime_hour__hour__lte=current_hour,
-        ).order_by('charttime_hour').values(
-            'charttime_hour', 'charttime',
-            'item_label', 'value', 'valueuom',
-            'ordercategoryname', 'statusdescription',
-        ))
+def _patient_detail(request, subject_id, stay_id, hadm_id):
+    sim = get_simulation(request)
+    current_hour = sim.current_hour
+
+    if columnar_enabled():
+        patient = _patient_from_store(sim, subject_id, stay_id, hadm_id)
+    else:
+        patient = _patient_from_database(sim, subject_id, stay_id, hadm_id)
+
+    # Sessions with other spans may place (or not place) the stay on another
+    # day of their timeline, and so build it another frame
+    day_index = timeline_day(patient.intime, sim.sim_dates)
+    cache_key = (sim.cohort, sim.sim_date, day_index, subject_id, stay_id, hadm_id, current_hour)
+    detail = detail_cache.get_or_build(cache_key, lambda: _build_detail(sim, patient))
 
     context = {
         'patient': patient,
+        **detail,
+        'current_hour': current_hour,
+        'current_time_display': _display_time(current_hour, sim.sim_date),
+        'simulation': sim,
+    }
+    with timed('render'):
+        return render(request, 'patients/show.html', context)
+
+
+def _build_detail(sim, patient):
+    """The cacheable part of the detail page: chart payload and procedure log."""
+    frame = _patient_frame(sim, patient)
+    if frame is None:
+        vitalsigns_list, labs, procedures = [], [], []
+    elif columnar_enabled():
+        vitalsigns_list, labs, procedures = _detail_rows_from_store(sim, patient)
+    else:
+        vitalsigns_list, labs, procedures = _detail_rows_from_database(sim, patient, frame)
+
+    # Add a clean hour label for the Plotly x-axis, the lab table and the log
+    for row in (*vitalsigns_list, *labs, *procedures):
+        row['hour_label'] = _hour_label((row['charttime_hour'] - frame) // datetime.timedelta(hours=1))
+
+    # Columnar, as the chart plots it: each key once, not once per hour
+    chart_columns = {
+        key: [row[key] for row in vitalsigns_list]
+        for key in ('hour_label', *CHART_VITALSIGN_FIELDS[1:])
+    }
+    with timed('serialize'):
+        vitalsigns_json = json.dumps(chart_columns, cls=DjangoJSONEncoder, separators=(',', ':'))
+    with timed('render'):
+        procedure_log_html = render_to_string('patients/_procedure_log.html', {
+            'procedures': procedures,
+            'current_hour': sim.current_hour,
+        })
+        lab_table_html = render_to_string('patients/_lab_table.html', {
+            'labs': labs,
+            'current_hour': sim.current_hour,
+        })
+    return {
         'vitalsigns_json': vitalsigns_json,
-        'procedures': procedures,
+        'procedure_log_html': procedure_log_html,
         'procedures_count': len(procedures),
-        'current_hour': current_hour,
-        'current_time_display': _display_time(current_hour),
+        'lab_table_html': lab_table_html,
+        'labs_count': len(labs),
     }
-    return render(request, 'patients/show.html', context)
 
 
-@require_POST
-def advance_time(request):
+def _patient_from_database(sim, subject_id, stay_id, hadm_id):
+    """The cohort stay shown on the detail page, from the views."""
+    with prepared():
+        return get_object_or_404(
+            get_cohort_predicate(sim.cohort).apply(UniquePatientProfile.objects.all()),
+            subject_id=subject_id,
+            stay_id=stay_id,
+            hadm_id=hadm_id
+        )
+
+
+def _patient_frame(sim, patient):
     """
-    API endpoint: advance the simulation clock by 1 hour.
+    Midnight starting the session's timeline in the stay's own shifted
+    year, or None if the stay is not admitted on any day of the timeline.
+    """
+    admitted_on = timeline_day(patient.intime, sim.sim_dates)
+    return None if admitted_on is None else stay_frame(patient.intime, admitted_on)
+
+
+def _detail_rows_from_database(sim, patient, frame):
+    """(vitals rows, lab rows, procedure rows) for the detail page, from the views."""
+    if sim.current_hour < 0:
+        return [], [], []
+
+    # Hours 0..current_hour of the timeline in this stay's own year, as a
+    # plain timestamp range on the (stay_id, charttime_hour) index
+    time_window = frames_q({frame: [patient.stay_id]}, 0, sim.current_hour) & Q(subject_id=patient.subject_id)
+
+    # --- Vitalsigns for the Plotly chart, labs for the table, procedures for the log ---
+    # (one stay, one frame: the same statements for every stay and hour)
+    vitalsigns, labs, procedures = load_day_rows(time_window, prepare=True)
+    return (
+        _hour_ordered(vitalsigns, VITALSIGN_FIELDS, CHART_VITALSIGN_FIELDS),
+        _hour_ordered(labs, LAB_FIELDS, LAB_TABLE_FIELDS),
+        _hour_ordered(procedures, PROCEDURE_FIELDS, PROCEDURE_LOG_FIELDS),
+    )
 
-    Returns JSON with:
-      - current_hour
-      - new_patients admitted at this hour
-      - vitalsigns for ALL admitted patients at this hour (may be empty)
-      - procedureevents for ALL admitted patients at this hour (may be empty)
+
+def _hour_ordered(rows, fields, keys):
+    """Row tuples in `fields` order as dicts of `keys`, by charttime_hour."""
+    hour_idx = fields.index('charttime_hour')
+    return [
+        {key: row[fields.index(key)] for key in keys}
+        for row in sorted(rows, key=lambda row: row[hour_idx])
+    ]
+
+
+def _patient_from_store(sim, subject_id, stay_id, hadm_id):
+    """The same stay, from the day store (database-free runs)."""
+    profile = _get_day_store(sim).profiles.get(stay_id)
+    patient = SimpleNamespace(**dict(zip(PATIENT_FIELDS, profile))) if profile else None
+    if patient is None or (patient.subject_id, patient.hadm_id) != (subject_id, hadm_id):
+        raise Http404('No such patient stay in this simulation.')
+    return patient
+
+
+def _detail_rows_from_store(sim, patient):
+    """The same rows, from the day store."""
+    if sim.current_hour < 0:
+        return [], [], []
+
+    store = _get_day_store(sim)
+    vitalsigns_list = [
+        {key: row[key] for key in CHART_VITALSIGN_FIELDS}
+        for row in store.stay_vitalsigns(patient.stay_id, sim.hour_of_day)
+    ]
+    labs_list = [
+        {key: row[key] for key in LAB_TABLE_FIELDS}
+        for row in store.stay_labs(patient.stay_id, sim.hour_of_day)
+    ]
+    procedures = [
+        {key: row[key] for key in PROCEDURE_LOG_FIELDS}
+        for row in store.stay_procedureevents(patient.stay_id, sim.hour_of_day)
+    ]
+    return vitalsigns_list, labs_list, procedures
+
+
+async def advance_time(request):
+    """
+    API endpoint: advance this session's simulation clock by one step
+    (1 hour unless the session was started with another step_hours).
+
+    Ticks are served from the in-memory day stores (see daystore.py); each
+    day of the timeline is loaded once, the next one in the background as
+    midnight approaches, and ticks are pushed to every dashboard subscribed
+    to the tick stream. Each tick's payload is built in the background
+    right after the previous one (see tickprefetch.py).
+
+    Returns JSON (or, by the Accept header, a compact binary encoding; see
+    wire.py) with:
+      - current_hour, counted from the timeline's first midnight
+      - new_patients admitted and discharged stays during the step
+      - total_admitted today so far, and census: stays in the ICU now
+      - vitalsigns for ALL patients in the ICU at this hour (may be empty)
+      - labs: chemistry and coagulation draws during the step (may be empty)
+      - procedureevents for ALL patients during the step (may be empty)
+      - risk: columnar sepsis risk scores for ALL admitted patients, and
+        risk_summary with the number of stays per risk level
 
     POST /patients/advance-time/
     """
-    # --- Advance the clock ---
-    _simulation['current_hour'] += 1
-    current_hour = _simulation['current_hour']
-
-    # Cap at hour 23
-    if current_hour > 23:
-        _simulation['current_hour'] = 23
-        return JsonResponse({
-            'error': 'Cannot advance past 23:00',
-            'current_hour': 23,
-            'current_time': _display_time(23),
-        }, status=400)
-
-    # --- 1. New patients admitted at this exact hour ---
-    new_patients_qs = _get_cohort_patients().filter(intime__hour=current_hour)
-
-    new_patients_data = list(new_patients_qs.values(
-        'subject_id', 'stay_id', 'hadm_id',
-        'anchor_age', 'gender', 'race',
-        'first_careunit', 'intime', 'outtime', 'los',
-    ))
-
-    # --- 2. All currently admitted patient stay_ids ---
-    admitted_qs = _get_admitted_patients(current_hour)
-    admitted_stay_ids = list(admitted_qs.values_list('stay_id', flat=True))
-
-    # --- 3. Vitalsigns at this hour for admitted patients ---
-    vitalsigns_data = []
-    if admitted_stay_ids:
-        vitalsigns_qs = VitalsignHourly.objects.filter(
-            stay_id__in=admitted_stay_ids,
-            charttime_hour__month=3,
-            charttime_hour__day=13,
-            charttime_hour__hour=current_hour,
-        )
-        vitalsigns_data = list(vitalsigns_qs.values(
-            'subject_id', 'stay_id', 'charttime_hour',
-            'heart_rate', 'sbp', 'dbp', 'mbp',
-            'sbp_ni', 'dbp_ni', 'mbp_ni',
-            'resp_rate', 'temperature', 'temperature_site',
-            'spo2', 'glucose',
-        ))
-
-    # --- 4. Procedure events at this hour for admitted patients ---
-    procedures_data = []
-    if admitted_stay_ids:
-        procedures_qs = ProcedureeventsHourly.objects.filter(
-            stay_id__in=admitted_stay_ids,
-            charttime_hour__month=3,
-            charttime_hour__day=13,
-            charttime_hour__hour=current_hour,
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    return await _off_loop(_advance_time)(request)
+
+
+def _advance_time(request):
+    sim = get_simulation(request)
+    try:
+        response_data, status, data = _advance_clock(sim.key)
+    except SessionNotFound:
+        # Pruned between the lookup and the advance
+        return JsonResponse({'error': 'Simulation session not found'}, status=404)
+    with timed('serialize'):
+        return wire_response(request, response_data, status=status, data=data)
+
+
+async def seek_time(request):
+    """
+    API endpoint: jump this session's clock to any hour of its timeline,
+    forward or back, in one request.
+
+    Nothing before the target hour is replayed: the census and cumulative
+    counts are bisections in the census index, and the latest vitals come
+    from the feature cube's nearest checkpoint (at most CHECKPOINT_EVERY - 1
+    hours rolled forward). The payload is the target hour's tick plus:
+      - seek: true
+      - admitted_so_far, discharged_so_far since the timeline started
+      - latest_vitals: last charted vitals of every stay in the ICU, columnar
+
+    Clients fetch the rows of the stays they show with one delta request.
+
+    Form params:
+      - hour: timeline hour, -1 (not started) to the last hour
+
+    POST /patients/seek/
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    return await _off_loop(_seek_time)(request)
+
+
+def _seek_time(request):
+    sim = get_simulation(request)
+    try:
+        hour = int(request.POST['hour'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'hour must be an integer'}, status=400)
+    try:
+        previous, sim = get_backend().seek(sim.key, hour)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    except SessionNotFound:
+        return JsonResponse({'error': 'Simulation session not found'}, status=404)
+    if sim.version != previous.version:
+        # Ticks prefetched from the old hour can never be taken
+        tick_prefetcher.discard(sim.key)
+
+    payload = _seek_payload(sim)
+    with timed('serialize'):
+        data = encode_json(payload)
+        get_broadcaster(sim.key).publish(payload, data=data)
+        response = wire_response(request, payload, data=data)
+    tick_prefetcher.schedule(sim, _prefetch_tick)
+    return response
+
+
+@require_GET
+def tick_delta(request):
+    """
+    API endpoint: incremental rows since the last hour the client has.
+
+    Query params:
+      - since: last timeline hour the client already rendered (-1 = none)
+      - stay:  stay_id in view (repeatable)
+
+    Returns a columnar delta (see delta.py) with only rows after `since`,
+    encoded as the Accept header asks (see wire.py).
+
+    GET /patients/api/v1/delta/?since=4&stay=35475449
+    """
+    try:
+        since_hour = int(request.GET.get('since', -1))
+        stay_ids = [int(stay_id) for stay_id in request.GET.getlist('stay')]
+    except ValueError:
+        return JsonResponse({'error': 'since and stay must be integers'}, status=400)
+
+    sim = get_simulation(request)
+    current_hour = sim.current_hour
+    if current_hour < 0 or since_hour >= current_hour or not stay_ids:
+        response_data = {
+            'version': DELTA_PROTOCOL_VERSION,
+            'since': since_hour,
+            'current_hour': current_hour,
+            'patients': {},
+            'vitalsigns': {},
+            'labs': {},
+            'procedureevents': {},
+        }
+    else:
+        response_data = build_delta(
+            lambda day_index: _get_day_store(sim, day_index), stay_ids, since_hour, current_hour,
         )
-        procedures_data = list(procedures_qs.values(
-            'subject_id', 'stay_id', 'charttime_hour', 'charttime',
-            'itemid', 'item_label', 'item_unitname',
-            'value', 'valueuom',
-            'location', 'locationcategory',
-            'ordercategoryname', 'ordercategorydescription',
-            'statusdescription', 'originalamount', 'originalrate',
-        ))
-
-    # --- Build response ---
-    response_data = {
-        'current_hour': current_hour,
-        'current_time': _display_time(current_hour),
-        'new_patients': new_patients_data,
-        'new_patients_count': len(new_patients_data),
-        'total_admitted': len(admitted_stay_ids),
-        'vitalsigns': vitalsigns_data,
-        'vitalsigns_count': len(vitalsigns_data),
-        'procedureevents': procedures_data,
-        'procedureevents_count': len(procedures_data),
-    }
 
-    return JsonResponse(response_data)
+    response_data['current_time'] = _display_time(current_hour, sim.sim_date)
+    with timed('serialize'):
+        return wire_response(request, response_data)
+
+
+@require_GET
+def bulk_export(request):
+    """
+    API endpoint: stream a cohort's stays with their vitals and procedure
+    rows for a range of hours, as NDJSON (see export.py).
+
+    Query params:
+      - cohort: cohort name (default: the cohort in cohort.py)
+      - date:   simulated day as YYYY-MM-DD (default March 13)
+      - from:   first hour, 0-23 (default 0)
+      - to:     last hour, 0-23 (default 23); stays admitted by then are exported
+      - format: "ndjson" (one row per line, default) or "columnar" (column chunks)
+
+    GET /patients/api/v1/export/?from=0&to=11&format=columnar
+    """
+    try:
+        sim_date = datetime.date.fromisoformat(request.GET.get('date', DEFAULT_SIM_DATE.isoformat()))
+        first_hour = int(request.GET.get('from', 0))
+        last_hour = int(request.GET.get('to', 23))
+    except ValueError:
+        return JsonResponse({'error': 'date must be YYYY-MM-DD, from and to integers'}, status=400)
+    if not 0 <= first_hour <= last_hour <= 23:
+        return JsonResponse({'error': 'hours must satisfy 0 <= from <= to <= 23'}, status=400)
+
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f'format must be one of {", ".join(EXPORT_FORMATS)}'}, status=400)
+    try:
+        predicate = get_cohort_predicate(request.GET.get('cohort', DEFAULT_COHORT))
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    chunks = encode_chunks(export_rows(predicate, sim_date, first_hour, last_hour), export_format)
+    if isinstance(request, ASGIRequest):
+        # A sync iterator would be read whole before the first byte is sent
+        chunks = aiter_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type='application/x-ndjson')
+    response['Content-Disposition'] = (
+        f'attachment; filename="export-{sim_date:%m-%d}-{first_hour:02d}-{last_hour:02d}.ndjson"'
+    )
+    return response
+
+
+async def tick_stream(request):
+    """
+    Server-Sent Events stream of a session's ticks. Every tick — from any
+    tab's +1, any worker process, or auto-play — is pushed to all dashboards
+    connected to the session.
+    Requires the ASGI entry point (config/asgi.py); under WSGI it answers
+    204 so browsers fall back to the +1 button alone.
+
+    GET /patients/stream/
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would block forever; 204 tells EventSource to stop
+        return HttpResponse(status=204)
+
+    sim = await sync_to_async(get_simulation)(request)
+    broadcaster = get_broadcaster(sim.key)
+    response = StreamingHttpResponse(
+        broadcaster.stream(refresh=_refresh_stream), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+    return response
+
+
+@require_POST
+def autoplay(request):
+    """
+    API endpoint: start or stop auto-play for this session.
+
+    The ticker thread runs in the worker process that receives this request;
+    other workers pick its ticks up through the shared session store.
+
+    Form params:
+      - enabled:  "1" to start, "0" to stop
+      - interval: seconds between ticks (default SIMULATION_TICK_INTERVAL)
+
+    POST /patients/autoplay/
+    """
+    sim = get_simulation(request)
+    broadcaster = get_broadcaster(sim.key)
+    enabled = request.POST.get('enabled', '1') == '1'
+    if enabled:
+        try:
+            interval = float(request.POST.get('interval', settings.SIMULATION_TICK_INTERVAL))
+        except ValueError:
+            return JsonResponse({'error': 'interval must be a number'}, status=400)
+        if interval < MIN_TICK_INTERVAL:
+            return JsonResponse({'error': f'interval must be at least {MIN_TICK_INTERVAL}s'}, status=400)
+        broadcaster.start_autoplay(interval, lambda: _advance_clock(sim.key))
+    else:
+        broadcaster.stop_autoplay()
+
+    state = {'autoplay': broadcaster.autoplaying, 'interval': broadcaster.autoplay_interval}
+    broadcaster.publish(state, event='autoplay')
+    return JsonResponse(state)
+
+
+@require_POST
+def reload_data(request):
+    """
+    API endpoint: reload the in-memory day stores after the materialized
+    views have been refreshed, or a new columnar export was written (every
+    cached day and cached detail page is dropped; this session's day is
+    rebuilt right away).
+
+    POST /patients/reload-data/
+    """
+    sim = get_simulation(request)
+    reload_day_store()
+    detail_cache.invalidate()
+    tick_prefetcher.clear()
+    store = _get_day_store(sim)
+    return JsonResponse({
+        'reloaded': True,
+        'total_patients': store.total_admitted(HOURS_PER_DAY - 1),
+    })
+
+
+@require_POST
+def new_simulation(request):
+    """
+    API endpoint: start a fresh simulation session for this browser.
+
+    Form params:
+      - cohort:     cohort name, from `manage.py buildcohort` (default: cohort.py)
+      - sim_date:   first simulated day as YYYY-MM-DD (default March 13)
+      - span_days:  days in the timeline, 1-14 (default 1)
+      - step_hours: hours per advance, 1-24 (default 1)
+
+    POST /patients/simulations/new/
+    """
+    try:
+        sim_date = datetime.date.fromisoformat(request.POST.get('sim_date', DEFAULT_SIM_DATE.isoformat()))
+        span_days = int(request.POST.get('span_days', 1))
+        step_hours = int(request.POST.get('step_hours', 1))
+    except ValueError:
+        return JsonResponse({'error': 'sim_date must be YYYY-MM-DD, span_days and step_hours integers'}, status=400)
+    if not 1 <= span_days <= MAX_SPAN_DAYS:
+        return JsonResponse({'error': f'span_days must be between 1 and {MAX_SPAN_DAYS}'}, status=400)
+    if not 1 <= step_hours <= MAX_STEP_HOURS:
+        return JsonResponse({'error': f'step_hours must be between 1 and {MAX_STEP_HOURS}'}, status=400)
+    if span_days > 1 and columnar_enabled():
+        return JsonResponse({'error': 'columnar exports replay single days only'}, status=400)
+    cohort = request.POST.get('cohort') or DEFAULT_COHORT
+    try:
+        check_cohort_name(cohort)
+        if columnar_enabled():
+            if not get_columnar_source().has_day(cohort, sim_date):
+                raise ValueError(f'No columnar export of cohort {cohort!r} for {sim_date:%m-%d}')
+        else:
+            get_cohort_predicate(cohort)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+
+    sim = start_simulation(request, cohort, sim_date, span_days, step_hours)
+    tick_prefetcher.schedule(sim, _prefetch_tick)
+    return JsonResponse({
+        'key': sim.key,
+        'cohort': sim.cohort,
+        'sim_date': sim.sim_date,
+        'span_days': sim.span_days,
+        'step_hours': sim.step_hours,
+        'current_hour': sim.current_hour,
+        'current_time': _display_time(sim.current_hour, sim.sim_date),
+    })
@@ -0,0 +1,269 @@
+"""
+Compact encodings of the tick, seek and delta payloads.
+
+As JSON, every row of a tick repeats its keys (subject_id, stay_id,
+charttime_hour and a dozen values), and every number is text to parse. The
+API endpoints negotiate the body from the request's Accept header:
+
+    application/json                   the default
+    application/vnd.sepsis.columnar    typed columns in one binary body (below)
+    application/msgpack                the same columns as MessagePack, with
+                                       msgpack installed
+
+and compress any body of MIN_COMPRESS_BYTES or more with brotli (when
+installed) or gzip, as the Accept-Encoding header allows.
+
+The columnar body is
+
+    b'SPC1' | header length (uint32 LE) | header (UTF-8 JSON) | buffers
+
+with the buffers starting, and each one aligned, on 8 bytes so a client can
+view them as typed arrays in place. The header is the payload itself, in
+which every list of row objects became a table and every list of values a
+column pointing into the buffers:
+
+    "vitalsigns": {"$rows": 120, "columns": {
+        "heart_rate": {"$col": "f4", "n": 120, "at": 0, "nulls": 480},
+        ...}}
+    "risk": {"score": {"$col": "f4", "n": 311, "at": 4096, "nulls": null}, ...}
+
+Column types:
+
+    f4    float32 (vital signs and risk scores: FLOAT32_COLUMNS)
+    i4    int32 (ids, hours, counts)
+    f8    float64 (every other measurement, e.g. procedure amounts and
+          rates, and integers beyond 32 bits)
+    time  float64 milliseconds since the epoch, UTC
+    dict  uint16 (or uint32, "codes": 4) indexes into the column's
+          "dict" list of labels (item_label, ordercategoryname, ...)
+
+"nulls", when not null, is a validity bitmap (bit i set: row i has a value,
+least significant bit first). Lists of anything else (booleans, mixed
+values, nested lists) stay in the header as JSON. templates/patients/
+_wire.html decodes the body back to the JSON shape.
+"""
+
+import datetime
+import json
+import struct
+from decimal import Decimal
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .daystore import VITALSIGN_FIELDS
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+JSON_TYPE = 'application/json'
+COLUMNAR_TYPE = 'application/vnd.sepsis.columnar'
+MSGPACK_TYPE = 'application/msgpack'
+
+COLUMNAR_MAGIC = b'SPC1'
+
+# Smaller bodies are sent as they are
+MIN_COMPRESS_BYTES = 1024
+
+ALIGNMENT = 8
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Columns whose values fit float32's ~7 significant digits: vital signs
+# (also the risk trends and rolling means keyed by them) and risk scores
+FLOAT32_COLUMNS = frozenset(VITALSIGN_FIELDS[3:]) | {'score'}
+
+
+def wire_formats():
+    """Media types the API can answer with, the default first."""
+    formats = [JSON_TYPE, COLUMNAR_TYPE]
+    if msgpack is not None:
+        formats.append(MSGPACK_TYPE)
+    return formats
+
+
+def negotiate(request):
+    """The first media type of the Accept header the API supports (default JSON)."""
+    supported = wire_formats()
+    for item in request.headers.get('Accept', '').split(','):
+        media_type, _, params = item.strip().partition(';')
+        if media_type.strip() in supported and params.replace(' ', '') != 'q=0':
+            return media_type.strip()
+    return JSON_TYPE
+
+
+def encode_json(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def wire_response(request, payload, status=200, data=None):
+    """
+    payload in the negotiated encoding, compressed if the client accepts
+    it. data is the payload's encode_json(), when already encoded.
+    """
+    content_type = negotiate(request)
+    if content_type == COLUMNAR_TYPE:
+        body = encode_columnar(payload)
+    elif content_type == MSGPACK_TYPE:
+        body = encode_msgpack(payload)
+    else:
+        body = (data if data is not None else encode_json(payload)).encode()
+
+    response = HttpResponse(body, content_type=content_type, status=status)
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    if len(body) >= MIN_COMPRESS_BYTES:
+        _compress(request, response)
+    return response
+
+
+def _compress(request, response):
+    accepted = {
+        item.strip().partition(';')[0].strip()
+        for item in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    if brotli is not None and 'br' in accepted:
+        response.content = brotli.compress(response.content)
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accepted:
+        response.content = compress_string(response.content)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return
+    response.headers['Content-Length'] = str(len(response.content))
+
+
+# =============================================================================
+# Columnar
+# =============================================================================
+
+def encode_columnar(payload):
+    buffers = _Buffers()
+    header = json.dumps(_columns_of(payload, buffers), cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    prefix = COLUMNAR_MAGIC + struct.pack('<I', len(header)) + header
+    return prefix + b'\0' * _padding(len(prefix)) + buffers.getvalue()
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+class _Buffers:
+    """The body's buffers, each starting on ALIGNMENT bytes."""
+
+    def __init__(self):
+        self._parts = []
+        self._size = 0
+
+    def add(self, data):
+        offset = self._size
+        self._parts.append(data)
+        self._parts.append(b'\0' * _padding(len(data)))
+        self._size += len(data) + _padding(len(data))
+        return offset
+
+    def getvalue(self):
+        return b''.join(self._parts)
+
+
+def _columns_of(value, buffers, name=None):
+    """value (under key name) with its tables and columns replaced by references into buffers."""
+    if isinstance(value, dict):
+        return {key: _columns_of(item, buffers, key) for key, item in value.items()}
+    if not isinstance(value, list) or not value:
+        return value
+    if all(isinstance(row, dict) for row in value):
+        keys = list(value[0])
+        if all(list(row) == keys for row in value):
+            return {
+                '$rows': len(value),
+                'columns': {key: _column([row[key] for row in value], buffers, key) for key in keys},
+            }
+        return value
+    return _column(value, buffers, name)
+
+
+def _column(values, buffers, name=None):
+    """A typed column reference for the column name's values, or values themselves if untyped."""
+    present = [value for value in values if value is not None]
+    if not present:
+        kind = 'f4'
+    elif all(isinstance(value, str) for value in present):
+        kind = 'dict'
+    elif all(isinstance(value, datetime.datetime) for value in present):
+        kind = 'time'
+    elif any(isinstance(value, bool) for value in present):
+        return values
+    elif all(isinstance(value, int) for value in present):
+        kind = 'i4' if INT32_MIN <= min(present) and max(present) <= INT32_MAX else 'f8'
+    elif all(isinstance(value, (int, float, Decimal)) for value in present):
+        kind = 'f4' if name in FLOAT32_COLUMNS else 'f8'
+    else:
+        return values
+
+    spec = {'$col': kind, 'n': len(values)}
+    if kind == 'dict':
+        labels = {}
+        codes = [labels.setdefault(value, len(labels)) if value is not None else 0 for value in values]
+        dtype = '<u2' if len(labels) <= 0xFFFF else '<u4'
+        data = np.array(codes, dtype=dtype)
+        spec['dict'] = list(labels)
+        spec['codes'] = data.itemsize
+    elif kind == 'time':
+        data = np.array([np.nan if value is None else _epoch_ms(value) for value in values], dtype='<f8')
+    else:
+        dtype = {'f4': '<f4', 'i4': '<i4', 'f8': '<f8'}[kind]
+        fill = 0 if kind == 'i4' else np.nan
+        data = np.array([fill if value is None else value for value in values], dtype=dtype)
+
+    spec['at'] = buffers.add(data.tobytes())
+    spec['nulls'] = None
+    if len(present) < len(values):
+        valid = np.array([value is not None for value in values], dtype=bool)
+        spec['nulls'] = buffers.add(np.packbits(valid, bitorder='little').tobytes())
+    return spec
+
+
+def _epoch_ms(moment):
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return (moment - EPOCH) / datetime.timedelta(milliseconds=1)
+
+
+# =============================================================================
+# MessagePack
+# =============================================================================
+
+def encode_msgpack(payload):
+    """The payload with its tables as columns, floats as float32."""
+    return msgpack.packb(_tables_of(payload), use_single_float=True, default=_msgpack_default)
+
+
+def _tables_of(value):
+    if isinstance(value, dict):
+        return {key: _tables_of(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(row, dict) for row in value):
+        keys = list(value[0])
+        if all(list(row) == keys for row in value):
+            return {'$rows': len(value), 'columns': {key: [row[key] for row in value] for key in keys}}
+    return value
+
+
+def _msgpack_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value).__name__}')
@@ -30,5 +30,6 @@ CREATE MATERIALIZED VIEW first_icu_stay AS (
   WHERE rn = 1
 );
 
-CREATE INDEX idx_first_icu_stay_subject_id ON first_icu_stay (subject_id);
+-- Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY (manage.py refreshviews)
+CREATE UNIQUE INDEX idx_first_icu_stay_subject_id ON first_icu_stay (subject_id);
 CREATE INDEX idx_first_icu_stay_stay_id ON first_icu_stay (stay_id);
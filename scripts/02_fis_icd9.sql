@@ -31,6 +31,8 @@ CREATE MATERIALIZED VIEW fis_icd9 AS (
   WHERE d.icd_version = 9
 );
 
+-- Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY (manage.py refreshviews)
+CREATE UNIQUE INDEX idx_fis_icd9_stay_diagnosis ON fis_icd9 (stay_id, seq_num, icd_code, icd_version);
 CREATE INDEX idx_fis_icd9_subject_id ON fis_icd9 (subject_id);
 CREATE INDEX idx_fis_icd9_stay_id ON fis_icd9 (stay_id);
 CREATE INDEX idx_fis_icd9_icd_code ON fis_icd9 (icd_code);
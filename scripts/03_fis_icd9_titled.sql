@@ -23,5 +23,7 @@ CREATE MATERIALIZED VIEW fis_icd9_titled AS (
    AND f.icd_version = d.icd_version
 );
 
+-- Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY (manage.py refreshviews)
+CREATE UNIQUE INDEX idx_fis_icd9_titled_stay_diagnosis ON fis_icd9_titled (stay_id, seq_num, icd_code, icd_version);
 CREATE INDEX idx_fis_icd9_titled_subject_id ON fis_icd9_titled (subject_id);
 CREATE INDEX idx_fis_icd9_titled_stay_id ON fis_icd9_titled (stay_id);
@@ -28,5 +28,7 @@ CREATE MATERIALIZED VIEW fisi9t_profile AS (
     ON id.stay_id = f.stay_id
 );
 
+-- Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY (manage.py refreshviews)
+CREATE UNIQUE INDEX idx_fisi9t_profile_stay_diagnosis ON fisi9t_profile (stay_id, seq_num, icd_code, icd_version);
 CREATE INDEX idx_fisi9t_profile_subject_id ON fisi9t_profile (subject_id);
 CREATE INDEX idx_fisi9t_profile_stay_id ON fisi9t_profile (stay_id);
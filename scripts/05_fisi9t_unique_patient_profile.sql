@@ -19,5 +19,14 @@ CREATE MATERIALIZED VIEW fisi9t_unique_patient_profile AS (
   FROM fisi9t_profile p
 );
 
+-- Unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY (manage.py refreshviews)
 CREATE UNIQUE INDEX idx_fisi9t_unique_profile_subject_id ON fisi9t_unique_patient_profile (subject_id);
 CREATE INDEX idx_fisi9t_unique_profile_stay_id ON fisi9t_unique_patient_profile (stay_id);
+
+-- Calendar day (month * 100 + day) and hour of admission, ignoring the
+-- per-patient shifted year. Must match patients/timewindow.py CalendarDay /
+-- CalendarHour exactly for the planner to use it.
+CREATE INDEX idx_fisi9t_unique_profile_intime_day_hour ON fisi9t_unique_patient_profile (
+  ((EXTRACT(MONTH FROM intime) * 100 + EXTRACT(DAY FROM intime))::integer),
+  (EXTRACT(HOUR FROM intime)::integer)
+);
@@ -154,5 +154,7 @@ CREATE MATERIALIZED VIEW fisi9t_vitalsign_hourly AS (
   ORDER BY g.stay_id, g.hour_ts
 );
 
-CREATE INDEX idx_fisi9t_vitals_stay_id_time ON fisi9t_vitalsign_hourly (stay_id, charttime_hour);
+-- One row per stay and hour; unique so REFRESH MATERIALIZED VIEW CONCURRENTLY
+-- (manage.py refreshviews) can rebuild it while the dashboard reads
+CREATE UNIQUE INDEX idx_fisi9t_vitals_stay_id_time ON fisi9t_vitalsign_hourly (stay_id, charttime_hour);
 CREATE INDEX idx_fisi9t_vitals_subject_id ON fisi9t_vitalsign_hourly (subject_id);
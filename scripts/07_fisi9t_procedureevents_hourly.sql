@@ -96,7 +96,13 @@ CREATE MATERIALIZED VIEW fisi9t_procedureevents_hourly AS (
     e.continueinnextdept,
     e.statusdescription,
     e.originalamount,
-    e.originalrate
+    e.originalrate,
+    -- Position of the event within its hour (1 for a NULL-padded hour);
+    -- with stay_id and charttime_hour it is the view's unique key
+    row_number() OVER (
+      PARTITION BY g.stay_id, g.hour_ts
+      ORDER BY e.charttime, e.itemid, e.orderid
+    ) AS event_seq
   FROM hour_grid g
   LEFT JOIN events e
     ON e.stay_id = g.stay_id
@@ -104,5 +110,7 @@ CREATE MATERIALIZED VIEW fisi9t_procedureevents_hourly AS (
   ORDER BY g.stay_id, g.hour_ts, e.charttime, e.itemid, e.orderid
 );
 
-CREATE INDEX idx_fisi9t_proc_stay_id_time ON fisi9t_procedureevents_hourly (stay_id, charttime_hour);
+-- Unique so REFRESH MATERIALIZED VIEW CONCURRENTLY (manage.py refreshviews) can
+-- rebuild it while the dashboard reads; also serves (stay_id, charttime_hour) scans
+CREATE UNIQUE INDEX idx_fisi9t_proc_stay_id_time ON fisi9t_procedureevents_hourly (stay_id, charttime_hour, event_seq);
 CREATE INDEX idx_fisi9t_proc_subject_id ON fisi9t_procedureevents_hourly (subject_id);
@@ -80,5 +80,7 @@ CREATE MATERIALIZED VIEW fisi9t_coagulation_hourly AS (
   ORDER BY g.stay_id, g.hour_ts
 );
 
-CREATE INDEX idx_fisi9t_coag_stay_id_time ON fisi9t_coagulation_hourly (stay_id, charttime_hour);
+-- One row per stay and hour; unique so REFRESH MATERIALIZED VIEW CONCURRENTLY
+-- (manage.py refreshviews) can rebuild it while the dashboard reads
+CREATE UNIQUE INDEX idx_fisi9t_coag_stay_id_time ON fisi9t_coagulation_hourly (stay_id, charttime_hour);
 CREATE INDEX idx_fisi9t_coag_subject_id ON fisi9t_coagulation_hourly (subject_id);
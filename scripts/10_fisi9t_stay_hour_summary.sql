@@ -0,0 +1,73 @@
+-- 10_fisi9t_stay_hour_summary.sql
+-- Materialized view: packed per-stay hourly summary for the dashboard.
+--
+-- One row per (stay_id, charttime_hour) on the vitals' hour grid: the vitals
+-- the dashboard shows, the number of procedure events that hour, and the
+-- events themselves as one JSON array (only real events; the NULL-padded
+-- hours of fisi9t_procedureevents_hourly become an empty array). Read with
+-- SIMULATION_HOUR_SUMMARY=1, one narrow index scan replaces the vitals and
+-- procedure queries of a day-store load.
+
+DROP MATERIALIZED VIEW IF EXISTS fisi9t_stay_hour_summary CASCADE;
+
+CREATE MATERIALIZED VIEW fisi9t_stay_hour_summary AS (
+  WITH procedures AS (
+    SELECT
+      p.stay_id,
+      p.charttime_hour,
+      count(*) AS procedure_count,
+      jsonb_agg(
+        jsonb_build_object(
+          'charttime', p.charttime,
+          'itemid', p.itemid,
+          'item_label', p.item_label,
+          'item_unitname', p.item_unitname,
+          'value', p.value,
+          'valueuom', p.valueuom,
+          'location', p.location,
+          'locationcategory', p.locationcategory,
+          'ordercategoryname', p.ordercategoryname,
+          'ordercategorydescription', p.ordercategorydescription,
+          'statusdescription', p.statusdescription,
+          'originalamount', p.originalamount,
+          'originalrate', p.originalrate
+        )
+        ORDER BY p.event_seq
+      ) AS procedure_events
+    FROM fisi9t_procedureevents_hourly p
+    WHERE p.charttime IS NOT NULL
+    GROUP BY p.stay_id, p.charttime_hour
+  )
+  SELECT
+    v.subject_id,
+    v.stay_id,
+    v.charttime_hour,
+    v.heart_rate,
+    v.sbp,
+    v.dbp,
+    v.mbp,
+    v.sbp_ni,
+    v.dbp_ni,
+    v.mbp_ni,
+    v.resp_rate,
+    v.temperature,
+    v.temperature_site,
+    v.spo2,
+    v.glucose,
+    coalesce(p.procedure_count, 0)::integer AS procedure_count,
+    coalesce(p.procedure_events, '[]'::jsonb) AS procedure_events
+  FROM fisi9t_vitalsign_hourly v
+  LEFT JOIN procedures p
+    ON p.stay_id = v.stay_id
+   AND p.charttime_hour = v.charttime_hour
+  ORDER BY v.stay_id, v.charttime_hour
+);
+
+-- One row per stay and hour; unique so REFRESH MATERIALIZED VIEW CONCURRENTLY
+-- (manage.py refreshviews) can rebuild it while the dashboard reads. It also
+-- covers the vitals and the event count, so the scan of an hour range reads
+-- the index alone when procedure_events is not selected.
+CREATE UNIQUE INDEX idx_fisi9t_summary_stay_id_time ON fisi9t_stay_hour_summary (stay_id, charttime_hour)
+  INCLUDE (subject_id, heart_rate, sbp, dbp, mbp, sbp_ni, dbp_ni, mbp_ni,
+           resp_rate, temperature, temperature_site, spo2, glucose, procedure_count);
+CREATE INDEX idx_fisi9t_summary_subject_id ON fisi9t_stay_hour_summary (subject_id);